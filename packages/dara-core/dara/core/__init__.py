@@ -42,6 +42,7 @@ from dara.core.interactivity import (
     Variable,
     action,
 )
+from dara.core.internal.pool import TaskPriority
 from dara.core.visual.components import Fallback, For
 from dara.core.visual.dynamic_component import py_component
 from dara.core.visual.progress_updater import ProgressUpdater, track_progress
@@ -60,6 +61,7 @@ __all__ = [
     'UrlVariable',
     'Cache',
     'CacheType',
+    'TaskPriority',
     'Variable',
     'py_component',
     'DownloadVariable',
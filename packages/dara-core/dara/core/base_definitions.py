@@ -150,6 +150,20 @@ class TTLCachePolicy(BaseCachePolicy):
     ttl: int
 
 
+class MaxBytesCachePolicy(BaseCachePolicy):
+    """
+    Size-aware cache policy.
+    Evicts the least recently used items when adding a new item to the cache if the estimated size of the items
+    exceeds max_bytes. Items larger than max_bytes on their own are not kept.
+
+    :param max_bytes: maximum estimated size in bytes of the items kept in the cache - globally or per user/session,
+        depending on `cache_type` set in the policy
+    """
+
+    policy: str = Field(const=True, default='max-bytes')
+    max_bytes: int
+
+
 class Cache:
     """
     Convenience class aggregating all available cache policies and types
@@ -166,6 +180,7 @@ class Cache:
         MostRecent = MostRecentCachePolicy
         KeepAll = KeepAllCachePolicy
         TTL = TTLCachePolicy
+        MaxBytes = MaxBytesCachePolicy
 
         @classmethod
         def from_arg(cls, arg: CacheArgType) -> BaseCachePolicy:
@@ -205,6 +220,8 @@ class Cache:
                 return KeepAllCachePolicy(**arg)
             elif policy_name == 'ttl':
                 return TTLCachePolicy(**arg)
+            elif policy_name == 'max-bytes':
+                return MaxBytesCachePolicy(**arg)
             else:
                 raise ValueError(f'Invalid cache policy: {arg}')
 
@@ -221,6 +238,9 @@ class CachedRegistryEntry(BaseModel):
     cache: Optional[BaseCachePolicy]
     uid: str
 
+    evictable: ClassVar[bool] = False
+    """Whether cached values can be recomputed on demand, so the memory governor of the store may evict them"""
+
     def to_store_key(self):
         """
         Returns a unique store key for this entry.
@@ -246,6 +266,10 @@ class TaskResult(BaseTaskMessage):
     reg_entry: Optional[CachedRegistryEntry]
 
 
+class TaskPartialResult(BaseTaskMessage):
+    result: Any
+
+
 class TaskError(BaseTaskMessage):
     error: BaseException
     cache_key: Optional[str]
@@ -255,7 +279,7 @@ class TaskError(BaseTaskMessage):
         arbitrary_types_allowed = True
 
 
-TaskMessage = Union[TaskProgressUpdate, TaskResult, TaskError]
+TaskMessage = Union[TaskProgressUpdate, TaskPartialResult, TaskResult, TaskError]
 
 
 class BaseTask(abc.ABC):
@@ -176,6 +176,8 @@ def start(
         log_config=logging_config,
         limit_max_requests=limit_max_requests,
         lifespan='on',
+        # Compress websocket messages when the client supports it
+        ws_per_message_deflate=True,
     )
 
 
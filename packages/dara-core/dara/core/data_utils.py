@@ -17,14 +17,20 @@ limitations under the License.
 
 import io
 import os
-from typing import List, Optional, Union
-
-import pandas
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple, Union
+
+import pyarrow
+import pyarrow.feather
+import pyarrow.ipc
+import pyarrow.parquet
 from pandas import DataFrame
 from pydantic import BaseModel
 
 from dara.core.base_definitions import CacheType
 from dara.core.interactivity import (
+    DataVariable,
     DerivedDataVariable,
     DerivedVariable,
     DownloadContent,
@@ -32,7 +38,134 @@ from dara.core.interactivity import (
     SideEffect,
     Variable,
 )
+from dara.core.interactivity.filtering import (
+    FilterQuery,
+    filter_arrow_table,
+    get_query_columns,
+    to_arrow_expression,
+)
+from dara.core.internal.hashing import hash_object
+from dara.core.internal.pandas_utils import ARROW_EXTENSIONS
 from dara.core.internal.utils import get_cache_scope
+from dara.core.metrics.cache import (
+    CACHE_METRICS_TRACKER,
+    dataset_cache_evictions,
+    dataset_cache_hits,
+    dataset_cache_misses,
+)
+from dara.core.metrics.sizing import estimate_size
+
+
+def get_dataset_filename(name: str) -> str:
+    """
+    Get the filename a dataset is stored under.
+    Datasets named with a Feather/Arrow extension are stored as such, any other name is stored as Parquet.
+
+    :param name: name of the dataset
+    """
+    name_clean, ext = os.path.splitext(name)
+
+    if ext in ARROW_EXTENSIONS:
+        return name
+
+    return name_clean + '.parquet'
+
+
+DatasetCacheKey = Tuple[str, int, int, Hashable]
+"""Key of a dataset in the DatasetCache - (path, modification time in ns, size in bytes, read options)"""
+
+
+class DatasetCache:
+    """
+    Process-wide LRU cache of datasets read from disk, bounded by the estimated memory used by the cached DataFrames.
+
+    Entries are keyed by the path of the file as well as its modification time and size,
+    so a dataset modified on disk is read again rather than served stale.
+
+    Cached DataFrames are shared and must not be modified, callers handing them out should return a shallow copy.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: maximum memory used by cached datasets in bytes
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict[DatasetCacheKey, Tuple[DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pop(self, key: DatasetCacheKey):
+        _, size = self.entries.pop(key)
+        self.size -= size
+
+    def get(self, key: DatasetCacheKey) -> Optional[DataFrame]:
+        """
+        Get a cached dataset, marking it as recently used.
+
+        :param key: key of the dataset
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                dataset_cache_misses.inc()
+                return None
+
+            self.entries.move_to_end(key)
+            dataset_cache_hits.inc()
+            return entry[0]
+
+    def set(self, key: DatasetCacheKey, dataset: DataFrame):
+        """
+        Cache a dataset, evicting the least recently used datasets to stay within the budget.
+        Datasets larger than the whole budget are not cached.
+
+        :param key: key of the dataset
+        :param dataset: dataset to cache
+        """
+        size = estimate_size(dataset)
+
+        with self._lock:
+            if key in self.entries:
+                self._pop(key)
+
+            if size <= self.max_bytes:
+                self.entries[key] = (dataset, size)
+                self.size += size
+
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+                dataset_cache_evictions.inc()
+
+            CACHE_METRICS_TRACKER.update_datasets(self.size)
+
+    def invalidate(self, path: str):
+        """
+        Drop all cached versions of a dataset at a given path.
+
+        :param path: path to the dataset
+        """
+        with self._lock:
+            for key in [key for key in self.entries if key[0] == path]:
+                self._pop(key)
+
+            CACHE_METRICS_TRACKER.update_datasets(self.size)
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self._lock:
+            self.entries = OrderedDict()
+            self.size = 0
+            CACHE_METRICS_TRACKER.update_datasets(self.size)
+
+
+DATASET_CACHE = DatasetCache(max_bytes=int(os.environ.get('DARA_DATASET_CACHE_SIZE', 512 * 1024 * 1024)))
+"""
+Datasets read by variables created with `DataFactory.read_dataset_var`, shared between all sessions of the process.
+The budget in bytes can be configured with the `DARA_DATASET_CACHE_SIZE` environment variable, 0 disables the cache.
+"""
 
 
 class FileStore(BaseModel):
@@ -198,7 +331,8 @@ class DataFactory(BaseModel):
         Can be used e.g. as a resolver for UploadDropzone or in a SideEffect to create an arbitrary dataset.
 
         :param dataset: DataFrame to write to disk
-        :param name: name to use for the dataset
+        :param name: name to use for the dataset, names with a `.feather` or `.arrow` extension are stored as
+            uncompressed Arrow IPC files which can be memory-mapped without copies, otherwise as Parquet
         :param cache: cache type to get the list of datasets for
 
         Upload example
@@ -246,13 +380,17 @@ class DataFactory(BaseModel):
 
         ```
         """
-        name_clean, _ext = os.path.splitext(name)
-        name = name_clean + '.parquet'
+        name = get_dataset_filename(name)
 
         writer = self.file_store.write_file(cache, name)
-        dataset.to_parquet(writer)
+        if name.endswith(ARROW_EXTENSIONS):
+            dataset.to_feather(writer, compression='uncompressed')
+        else:
+            dataset.to_parquet(writer)
         writer.close()
 
+        DATASET_CACHE.invalidate(self.get_dataset_path(name, cache))
+
     def get_dataset_path(self, name: str, cache: CacheType = CacheType.GLOBAL) -> str:
         """
         Get path to a dataset on disk
@@ -263,35 +401,119 @@ class DataFactory(BaseModel):
         """
         return os.path.join(self.file_store.get_scoped_path(cache), name)
 
-    def read_dataset(self, name: str, cache: CacheType = CacheType.GLOBAL) -> Optional[DataFrame]:
+    def read_dataset(
+        self,
+        name: str,
+        cache: CacheType = CacheType.GLOBAL,
+        columns: Optional[List[str]] = None,
+        filters: Optional[FilterQuery] = None,
+        memory_map: bool = False,
+    ) -> Optional[DataFrame]:
         """
         Read a dataset from disk to a DataFrame.
 
+        With `memory_map=True` the file is memory-mapped rather than read into private memory, and columns
+        are converted to pandas without copies where possible. Columns of uncompressed Arrow (Feather) datasets
+        without missing values then point directly at the mapped file, so processes reading the same dataset
+        share the OS page cache. Such columns are read-only and cannot be modified in place.
+
         :param name: name of the dataset
         :param cache: cache type to get dataset for
+        :param columns: optional list of columns to read, all columns are read by default
+        :param filters: optional filters to apply while reading; for Parquet datasets row groups which cannot
+            match the filters are skipped
+        :param memory_map: whether to memory-map the file and avoid copying columns
         :returns: DataFrame or None if the dataset does not exist
         """
         if name is None:
             return None
 
-        # Assume we're reading a parquet file
-        name_clean, _ext = os.path.splitext(name)
-        name = name_clean + '.parquet'
+        name = get_dataset_filename(name)
+
+        if not self.file_store.file_exists(cache, name):
+            return None
+
+        path = self.get_dataset_path(name, cache)
+
+        if name.endswith(ARROW_EXTENSIONS):
+            # Only the footer is read, the file is opened again to read the table
+            with pyarrow.OSFile(path) as source:
+                schema = pyarrow.ipc.open_file(source).schema
+        else:
+            schema = pyarrow.parquet.read_schema(path, memory_map=memory_map)
+
+        # Filter and index columns have to be read as well as the requested columns
+        pandas_metadata = schema.pandas_metadata or {}
+        index_columns = [col for col in pandas_metadata.get('index_columns', []) if isinstance(col, str)]
+        read_columns = columns
+        if columns is not None:
+            extra_columns = set(index_columns) if filters is None else get_query_columns(filters) | set(index_columns)
+            read_columns = columns + sorted(extra_columns - set(columns))
+
+        if name.endswith(ARROW_EXTENSIONS):
+            table = pyarrow.feather.read_table(path, columns=read_columns, memory_map=memory_map)
+        else:
+            expression = None if filters is None else to_arrow_expression(filters, schema)
+            table = pyarrow.parquet.read_table(path, columns=read_columns, filters=expression, memory_map=memory_map)
+
+        table = filter_arrow_table(table, filters)
+
+        if columns is not None:
+            # Drop the filter columns which were not requested
+            table = table.select([col for col in table.column_names if col in columns or col in index_columns])
 
-        reader = self.file_store.get_file(cache, name)
+        # Keep each column in its own block so they can point at the mapped buffers rather than being consolidated
+        return table.to_pandas(split_blocks=memory_map)
 
-        if reader is None:
+    def _read_dataset_cached(
+        self,
+        name: str,
+        cache: CacheType,
+        columns: Optional[List[str]],
+        filters: Optional[FilterQuery],
+        memory_map: bool,
+    ) -> Optional[DataFrame]:
+        """
+        Read a dataset through the shared DATASET_CACHE, only reading it from disk if the file changed
+        since it was last read with the same options.
+
+        Returns a shallow copy of the cached dataset, so that adding, removing or replacing columns in one session
+        does not affect the dataset served to other sessions.
+        """
+        if name is None:
             return None
 
-        df = pandas.read_parquet(reader)
-        reader.close()
-        return df
+        path = self.get_dataset_path(get_dataset_filename(name), cache)
+
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size, (columns and tuple(columns), hash_object(filters), memory_map))
+        except FileNotFoundError:
+            return None
+        except TypeError:
+            # Filter values are not serializable, skip the cache
+            return self.read_dataset(name, cache, columns=columns, filters=filters, memory_map=memory_map)
+
+        dataset = DATASET_CACHE.get(key)
+
+        if dataset is None:
+            dataset = self.read_dataset(name, cache, columns=columns, filters=filters, memory_map=memory_map)
+
+            if dataset is None:
+                return None
+
+            DATASET_CACHE.set(key, dataset)
+
+        return dataset.copy(deep=False)
 
     def read_dataset_var(
         self,
         name: Union[str, NonDataVariable],
         cache: Union[CacheType, NonDataVariable] = CacheType.GLOBAL,
         polling_interval: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[FilterQuery] = None,
+        memory_map: bool = False,
     ) -> DerivedDataVariable:
         """
         Create a DerivedDataVariable which reads a specific dataset from disk
@@ -299,17 +521,37 @@ class DataFactory(BaseModel):
         :param name: name of the dataset
         :param cache: cache to get the dataset for
         :param polling_interval: optional polling interval in seconds for the derived variable
+        :param columns: optional list of columns to read, all columns are read by default
+        :param filters: optional filters to apply while reading the dataset
+        :param memory_map: whether to memory-map the file and avoid copying columns, see `read_dataset`
+
+        Datasets are read through a cache shared by all variables in the process, so sessions reading the same
+        unchanged dataset with the same options do not read and parse the file again, see `DATASET_CACHE`.
         """
         name_var = name if isinstance(name, NonDataVariable) else Variable(name)
         cache_var = cache if isinstance(cache, NonDataVariable) else Variable(cache)
 
         return DerivedDataVariable(
-            self.read_dataset,
+            lambda ds_name, sel_cache: self._read_dataset_cached(
+                ds_name, sel_cache, columns=columns, filters=filters, memory_map=memory_map
+            ),
             variables=[name_var, cache_var],
             cache=CacheType.SESSION,
             polling_interval=polling_interval,
         )
 
+    def disk_dataset_var(self, name: str) -> DataVariable:
+        """
+        Create a DataVariable serving a global dataset directly from disk.
+
+        Unlike `read_dataset_var`, the dataset is never loaded into memory as a whole - filters and pagination
+        are applied to the file, reading only the row groups (or record batches of Arrow datasets) and columns
+        required for the requested rows. Useful for datasets larger than the available memory.
+
+        :param name: name of the dataset
+        """
+        return DataVariable(path=self.get_dataset_path(get_dataset_filename(name)))
+
     def delete_dataset(self, name: str, cache: CacheType = CacheType.GLOBAL) -> None:
         """
         Delete a dataset from disk
@@ -318,6 +560,7 @@ class DataFactory(BaseModel):
         :param cache: cache to remove the dataset for
         """
         self.file_store.delete_file(cache, name)
+        DATASET_CACHE.invalidate(self.get_dataset_path(name, cache))
 
     def delete_dataset_action(
         self, name: Union[str, NonDataVariable], cache: Union[CacheType, NonDataVariable] = CacheType.GLOBAL
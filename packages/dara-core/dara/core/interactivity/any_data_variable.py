@@ -18,7 +18,7 @@ limitations under the License.
 import abc
 import io
 import os
-from typing import Any, Awaitable, Callable, Literal, Optional, cast
+from typing import Any, Awaitable, Callable, List, Literal, Optional, cast
 
 import pandas
 from fastapi import UploadFile
@@ -61,6 +61,9 @@ class DataVariableRegistryEntry(CachedRegistryEntry):
     get_total_count: Callable[..., Awaitable[int]]
     """Handler to get the total number of rows in the data variable. Defaults to DataVariable.get_total_count for type=plain, and DerivedDataVariable.get_total_count for type=derived"""
 
+    index_columns: Optional[List[str]] = None
+    """Columns to build inverted indexes for whenever the data is updated, only used for type=plain"""
+
     class Config:
         extra = 'forbid'
         arbitrary_types_allowed = True
@@ -17,11 +17,12 @@ limitations under the License.
 
 from __future__ import annotations
 
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from anyio.abc import TaskGroup
 from pandas import DataFrame
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 from dara.core.base_definitions import BaseCachePolicy, Cache, CacheArgType
 from dara.core.interactivity.any_data_variable import (
@@ -32,7 +33,10 @@ from dara.core.interactivity.filtering import (
     FilterQuery,
     Pagination,
     apply_filters,
+    apply_filters_to_parquet,
+    build_column_indexes,
     coerce_to_filter_query,
+    invalidate_filter_caches,
 )
 from dara.core.internal.cache_store import CacheStore
 from dara.core.internal.hashing import hash_object
@@ -59,6 +63,9 @@ class DataVariable(AnyDataVariable):
     Session-specific data, cannot be provided upfront (top-level code does not have a session context)
     >>> session_data = DataVariable(cache='session')
     >>> UpdateVariable(func=some_data_transformation, variable=session_data)
+
+    Global data stored on disk as Parquet, filtered and paginated without loading it into memory
+    >>> disk_data = DataVariable(path='./data_root/global/dataset.parquet')
     """
 
     uid: str
@@ -75,6 +82,8 @@ class DataVariable(AnyDataVariable):
         data: Optional[DataFrame] = None,
         cache: CacheArgType = Cache.Type.GLOBAL,
         uid: Optional[str] = None,
+        index_columns: Optional[List[str]] = None,
+        path: Optional[str] = None,
         **kwargs,
     ) -> None:
         """
@@ -84,10 +93,18 @@ class DataVariable(AnyDataVariable):
         :param uid: the unique identifier for this variable; if not provided a random one is generated
         :param filters: a dictionary of filters to apply to the data
         :param cache: how to cache the result; 'user' per user, 'session' per session, 'global' for all users
+        :param index_columns: optional list of columns to build inverted indexes for whenever the data is updated,
+            speeds up equality and `isin` filters on these columns at the cost of extra memory
+        :param path: optional path to a Parquet file, a directory of Parquet files or a `.feather`/`.arrow` file
+            to serve the data from; the data is filtered and paginated on disk so only the requested rows are
+            loaded into memory
         """
         cache = Cache.Policy.from_arg(cache)
 
-        if data is not None and cache.cache_type is not Cache.Type.GLOBAL:
+        if data is not None and path is not None:
+            raise ValueError('DataVariable can either hold data or a path to data on disk, not both')
+
+        if (data is not None or path is not None) and cache.cache_type is not Cache.Type.GLOBAL:
             raise ValueError('Data cannot be cached per session or per user if provided upfront')
 
         super().__init__(cache=cache, uid=uid, **kwargs)
@@ -101,6 +118,7 @@ class DataVariable(AnyDataVariable):
             type='plain',
             get_data=DataVariable.get_value,
             get_total_count=DataVariable.get_total_count,
+            index_columns=index_columns,
         )
         data_variable_registry.register(
             str(self.uid),
@@ -109,11 +127,15 @@ class DataVariable(AnyDataVariable):
 
         # Put the data entry into the store if not empty (so cache='global')
         # We don't create an entry in a different case since session key will be global anyway at this point
-        if data is not None:
+        if data is not None or path is not None:
             from dara.core.internal.registries import utils_registry
 
             store: CacheStore = utils_registry.get('Store')
-            call_async(self._update, var_entry, store, data)
+
+            if data is not None:
+                call_async(self._update, var_entry, store, data)
+            else:
+                call_async(store.set, var_entry, self._get_cache_key(var_entry.uid), DataStoreEntry(path=path))
 
     @staticmethod
     def _get_cache_key(uid: str) -> str:
@@ -135,7 +157,20 @@ class DataVariable(AnyDataVariable):
 
         TODO: for now data is always kept in store, in the future depending on the size data might be cached on disk
         """
-        await store.set(var_entry, key=cls._get_cache_key(var_entry.uid), value=DataStoreEntry(data=append_index(data)))
+        cache_key = cls._get_cache_key(var_entry.uid)
+
+        # Drop cached filter results for the previous data, the new data could be the same object mutated in place
+        prev_entry = await store.get(var_entry, key=cache_key)
+        if isinstance(prev_entry, DataStoreEntry):
+            invalidate_filter_caches(prev_entry.data)
+        invalidate_filter_caches(data)
+
+        data = append_index(data)
+        await store.set(var_entry, key=cache_key, value=DataStoreEntry(data=data))
+
+        # Filters fall back to scanning the columns until the indexes are built
+        if data is not None and var_entry.index_columns:
+            await run_in_threadpool(build_column_indexes, data, var_entry.index_columns)
 
     @classmethod
     def update_value(cls, var_entry: DataVariableRegistryEntry, store: CacheStore, data: Optional[DataFrame]):
@@ -185,7 +220,10 @@ class DataVariable(AnyDataVariable):
         eng_logger.debug(
             f'Data Variable {_uid_short}',
             'retrieved from cache',
-            {'uid': var_entry.uid, 'size': len(entry.data.index) if entry is not None else 0},
+            {
+                'uid': var_entry.uid,
+                'size': len(entry.data.index) if entry is not None and entry.data is not None else 0,
+            },
         )
 
         if entry is None:
@@ -199,13 +237,15 @@ class DataVariable(AnyDataVariable):
             data = filtered_data
             # Store count for given filters
             await store.set(var_entry, key=cls._get_count_cache_key(var_entry.uid, filters), value=count, pin=True)
+        elif entry.path is not None:
+            # Filter and paginate on disk, only loading the requested rows
+            data, count = await run_in_threadpool(
+                apply_filters_to_parquet, entry.path, coerce_to_filter_query(filters), pagination
+            )
+            await store.set(var_entry, key=cls._get_count_cache_key(var_entry.uid, filters), value=count, pin=True)
         else:
             await store.set(var_entry, key=cls._get_count_cache_key(var_entry.uid, filters), value=0, pin=True)
 
-        # TODO: once path is supported, stream&filter from disk
-        if entry.path:
-            raise NotImplementedError('DataVariable.get_value() does not support disk caching yet')
-
         eng_logger.info(
             f'Data Variable {_uid_short} returning filtered data',
             {'uid': var_entry.uid, 'size': len(data.index) if data is not None else 0},
@@ -47,7 +47,8 @@ from dara.core.interactivity.filtering import (
 )
 from dara.core.internal.cache_store import CacheStore
 from dara.core.internal.hashing import hash_object
-from dara.core.internal.pandas_utils import append_index
+from dara.core.internal.pandas_utils import INDEX, append_index
+from dara.core.internal.pool import TaskPriority
 from dara.core.internal.tasks import MetaTask, Task, TaskManager
 from dara.core.logging import eng_logger
 
@@ -81,6 +82,7 @@ class DerivedDataVariable(AnyDataVariable, DerivedVariable):
         polling_interval: Optional[int] = None,
         deps: Optional[List[AnyVariable]] = None,
         uid: Optional[str] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
     ) -> None:
         """
         DerivedDataVariable represents a variable designed to hold datasets computed
@@ -103,6 +105,7 @@ class DerivedDataVariable(AnyDataVariable, DerivedVariable):
         - `deps = []` - `func` is ran once on initial startup,
         - `deps = [var1, var2]` - `func` is ran whenever one of these vars changes
         :param uid: the unique identifier for this variable; if not provided a random one is generated
+        :param priority: priority of the task in the task pool when `run_as_task=True`, defaults to interactive
         """
         cache = Cache.Policy.from_arg(cache)
 
@@ -115,6 +118,7 @@ class DerivedDataVariable(AnyDataVariable, DerivedVariable):
             polling_interval=polling_interval,
             deps=deps,
             run_as_task=run_as_task,
+            priority=priority,
             _get_value=DerivedDataVariable.get_value,
         )
 
@@ -270,6 +274,12 @@ class DerivedDataVariable(AnyDataVariable, DerivedVariable):
                 task_id=task_id,
             )
 
+        # Store the value with the index column appended so subsequent pages filter the same DataFrame
+        # and can reuse cached filter results rather than re-indexing a fresh copy each time
+        if isinstance(data, DataFrame) and INDEX not in data.columns:
+            data = append_index(data)
+            await store.set(dv_entry, key=cache_key, value=data)
+
         # Run the filtering
         data = await cls._filter_data(data, count_cache_key, data_entry, store, filters, pagination)
 
@@ -24,6 +24,7 @@ from typing import (
     Any,
     Awaitable,
     Callable,
+    ClassVar,
     Dict,
     Generic,
     List,
@@ -49,6 +50,7 @@ from dara.core.interactivity.any_variable import AnyVariable
 from dara.core.interactivity.non_data_variable import NonDataVariable
 from dara.core.internal.cache_store import CacheStore
 from dara.core.internal.encoder_registry import deserialize
+from dara.core.internal.pool import TaskPriority
 from dara.core.internal.tasks import MetaTask, Task, TaskManager
 from dara.core.internal.utils import get_cache_scope, run_user_handler
 from dara.core.logging import dev_logger, eng_logger
@@ -93,6 +95,7 @@ class DerivedVariable(NonDataVariable, Generic[VariableType]):
         polling_interval: Optional[int] = None,
         deps: Optional[List[AnyVariable]] = None,
         uid: Optional[str] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
         _get_value: Optional[Callable[..., Awaitable[Any]]] = None,
     ):
         """
@@ -119,6 +122,9 @@ class DerivedVariable(NonDataVariable, Generic[VariableType]):
         - `deps = [var1, var2]` - `func` is ran whenever one of these vars changes
         - `deps = [var1.get('nested_property')]` - `func` is ran only when the nested property changes, other changes to the variable are ignored
         :param uid: the unique identifier for this variable; if not provided a random one is generated
+        :param priority: priority of the task in the task pool when `run_as_task=True`, defaults to interactive.
+                         Tasks with background priority, e.g. precomputing data no user is waiting on yet, only run
+                         once no interactive task is waiting for a worker
         """
         if cache is not None:
             cache = Cache.Policy.from_arg(cache)
@@ -157,6 +163,7 @@ class DerivedVariable(NonDataVariable, Generic[VariableType]):
                 func=func,
                 polling_interval=polling_interval,
                 run_as_task=run_as_task,
+                priority=priority,
                 uid=str(self.uid),
                 variables=variables,
                 deps=deps_indexes,
@@ -413,6 +420,7 @@ class DerivedVariable(NonDataVariable, Generic[VariableType]):
                         parsed_args,
                         notify_channels=list(set(extra_notify_channels)),
                         process_as_task=var_entry.run_as_task,
+                        priority=var_entry.priority,
                         cache_key=cache_key,
                         task_id=task_id,
                         reg_entry=var_entry,  # task results are set as the DV result
@@ -432,6 +440,7 @@ class DerivedVariable(NonDataVariable, Generic[VariableType]):
                     parsed_args,
                     cache_key=cache_key,
                     task_id=task_id,
+                    priority=var_entry.priority,
                     reg_entry=var_entry,  # task results are set as the DV result
                 )
                 return {'cache_key': cache_key, 'value': task}
@@ -488,11 +497,14 @@ class DerivedVariableRegistryEntry(CachedRegistryEntry):
     deps: Optional[List[int]]
     func: Optional[Callable[..., Any]]
     run_as_task: bool
+    priority: TaskPriority = TaskPriority.INTERACTIVE
     variables: List[AnyVariable]
     polling_interval: Optional[int]
     get_value: Callable[..., Awaitable[Any]]
     """Handler to get the value of the derived variable. Defaults to DerivedVariable.get_value, should match the signature"""
 
+    evictable: ClassVar[bool] = True
+
     class Config:
         extra = 'forbid'
 
@@ -17,15 +17,29 @@ limitations under the License.
 
 from __future__ import annotations
 
+import functools
+import os
+import threading
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple, Union
 
 import numpy
-from pandas import DataFrame, Series  # pylint: disable=unused-import
+import pandas
+import pyarrow
+import pyarrow.dataset
+import pyarrow.ipc
+from pandas import DataFrame, Index, Series, factorize, isna
+from pandas.api.types import is_scalar
 from pydantic import BaseModel
 
+from dara.core.internal.hashing import hash_object
+from dara.core.internal.pandas_utils import ARROW_EXTENSIONS, INDEX
 from dara.core.logging import dev_logger
+from dara.core.metrics import CACHE_METRICS_TRACKER
 
 
 class Pagination(BaseModel):
@@ -154,129 +168,1240 @@ def infer_column_type(series: Series) -> ColumnType:
         return ColumnType.CATEGORICAL
 
 
-def _filter_to_series(data: DataFrame, column: str, operator: QueryOperator, value: Any) -> Optional['Series[bool]']:
+CacheKey = Tuple[int, Hashable]
+
+
+class DataFrameCache:
     """
-    Convert a single filter to a Series[bool] for filtering
+    LRU cache of values computed for a given DataFrame, i.e. resolved row positions or string-cast columns.
+
+    Entries are tied to the identity of the DataFrame they were computed for and are dropped when the
+    DataFrame is garbage collected or explicitly invalidated.
+
+    A DataFrame can be garbage collected while the cache is locked, i.e. by a cyclic GC run triggered in `size_of`,
+    so collected DataFrames are queued without locking and their entries dropped once the lock is free.
     """
-    series = data[column]
+
+    def __init__(
+        self,
+        max_size: Optional[int],
+        size_of: Optional[Callable[[Any], int]] = None,
+        on_resize: Optional[Callable[[int], None]] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        """
+        :param max_size: maximum number of entries to keep across all DataFrames, None for no limit
+        :param size_of: optional function to compute the size of a value in bytes
+        :param on_resize: optional callback invoked with the new total size whenever it changes
+        :param max_bytes: optional maximum total size of the entries in bytes, requires `size_of`
+        """
+        if max_bytes is not None and size_of is None:
+            raise ValueError('max_bytes requires size_of to be provided')
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.size_of = size_of
+        self.on_resize = on_resize
+        self.entries: OrderedDict[CacheKey, Any] = OrderedDict()
+        self._sizes: Dict[CacheKey, int] = {}
+        self._keys_by_data: Dict[int, Set[CacheKey]] = {}
+        self._refs: Dict[int, weakref.ref] = {}
+        self._collected: Deque[Tuple[int, weakref.ref]] = deque()
+        self._lock = threading.Lock()
+
+    def _resize(self, delta: int):
+        if delta == 0:
+            return
+
+        self.size += delta
+        if self.on_resize is not None:
+            self.on_resize(self.size)
+
+    def _pop_entry(self, key: CacheKey):
+        self.entries.pop(key, None)
+        self._resize(-self._sizes.pop(key, 0))
+
+    def _is_tracked(self, data: DataFrame) -> bool:
+        ref = self._refs.get(id(data))
+        return ref is not None and ref() is data
+
+    def _drop_data(self, data_id: int):
+        for key in self._keys_by_data.pop(data_id, set()):
+            self._pop_entry(key)
+        self._refs.pop(data_id, None)
+
+    def _drain_collected(self):
+        """
+        Drop entries of DataFrames collected since the last call, must be called with the lock held.
+        """
+        while len(self._collected) > 0:
+            data_id, ref = self._collected.popleft()
+
+            # The id might have been re-used by a new DataFrame in the meantime
+            if self._refs.get(data_id) is ref:
+                self._drop_data(data_id)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            self._drain_collected()
+            yield
+            self._drain_collected()
+
+    def _on_collected(self, data_id: int, ref: weakref.ref):
+        self._collected.append((data_id, ref))
+
+        # Never wait for the lock, the collection might have been triggered while it is held by this thread.
+        # Whoever holds it drops the entries once done, otherwise they are dropped on the next call.
+        if self._lock.acquire(blocking=False):
+            try:
+                self._drain_collected()
+            finally:
+                self._lock.release()
+
+    def _evict_key(self, evicted_key: CacheKey):
+        self._pop_entry(evicted_key)
+        evicted_keys = self._keys_by_data.get(evicted_key[0])
+
+        if evicted_keys is not None:
+            evicted_keys.discard(evicted_key)
+            if len(evicted_keys) == 0:
+                self._keys_by_data.pop(evicted_key[0], None)
+                self._refs.pop(evicted_key[0], None)
+
+    def _is_full(self) -> bool:
+        if self.max_size is not None and len(self.entries) > self.max_size:
+            return True
+
+        return self.max_bytes is not None and self.size > self.max_bytes
+
+    def get(self, data: DataFrame, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Get a cached value for given data.
+
+        Returns a tuple of (hit, value) as None can be a valid cached value.
+
+        :param data: DataFrame the value was computed for
+        :param key: key of the value
+        """
+        entry_key = (id(data), key)
+
+        with self._locked():
+            if not self._is_tracked(data) or entry_key not in self.entries:
+                return False, None
+
+            self.entries.move_to_end(entry_key)
+            return True, self.entries[entry_key]
+
+    def set(self, data: DataFrame, key: Hashable, value: Any):
+        """
+        Store a value for given data, evicting the least recently used entries if required.
+
+        :param data: DataFrame the value was computed for
+        :param key: key of the value
+        :param value: value to store
+        """
+        if self.max_size is not None and self.max_size <= 0:
+            return
+
+        data_id = id(data)
+        entry_key = (data_id, key)
+
+        with self._locked():
+            # Different (or no longer alive) DataFrame under the same id, clear stale entries
+            if not self._is_tracked(data):
+                self._drop_data(data_id)
+                self._refs[data_id] = weakref.ref(data, lambda ref, data_id=data_id: self._on_collected(data_id, ref))
+
+            self._pop_entry(entry_key)
+            self.entries[entry_key] = value
+            self._keys_by_data.setdefault(data_id, set()).add(entry_key)
+
+            if self.size_of is not None:
+                self._sizes[entry_key] = self.size_of(value)
+                self._resize(self._sizes[entry_key])
+
+            # Values larger than the whole budget are not kept either
+            while len(self.entries) > 0 and self._is_full():
+                self._evict_key(next(iter(self.entries)))
+
+    def invalidate(self, data: Optional[DataFrame]):
+        """
+        Drop all entries computed for a given DataFrame.
+
+        :param data: DataFrame to invalidate entries for
+        """
+        if data is None:
+            return
+
+        with self._locked():
+            if self._is_tracked(data):
+                self._drop_data(id(data))
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self._locked():
+            self.entries = OrderedDict()
+            self._sizes = {}
+            self._keys_by_data = {}
+            self._refs = {}
+            self._resize(-self.size)
+
+
+FILTER_INDEX_CACHE = DataFrameCache(
+    max_size=int(os.environ.get('DARA_FILTER_CACHE_SIZE', 32)),
+    size_of=lambda positions: 0 if positions is None else positions.nbytes,
+    max_bytes=int(os.environ.get('DARA_FILTER_CACHE_BYTES', 256 * 1024 * 1024)),
+)
+"""
+Positions of rows matching (filters, orderBy), so that paginating through the same view only requires taking
+`limit` rows rather than re-evaluating the filters and re-sorting the whole dataset on every page.
+Each entry holds up to 8 bytes per row of the dataset, so the cache is bounded by bytes as well as by entries.
+"""
+
+STRING_COLUMN_CACHE = DataFrameCache(max_size=int(os.environ.get('DARA_FILTER_STRING_CACHE_SIZE', 16)))
+"""Upper-cased string representations of columns used by CONTAINS filters"""
+
+
+class ColumnIndex:
+    """
+    Inverted index of a single column, mapping each distinct value to the positions of rows holding it.
+
+    Positions are grouped by value so that an equality or `isin` lookup only touches the matching rows
+    rather than scanning the whole column.
+    """
+
+    def __init__(self, column: Series):
+        """
+        :param column: column to index
+        """
+        # Missing values are coded as -1, shift by one so they are grouped in the first slot
+        codes, uniques = factorize(column)
+        codes = codes + 1
+
+        self.length = len(codes)
+        self.uniques = Index(uniques)
+        self.positions = numpy.argsort(codes, kind='stable')
+        if self.length < numpy.iinfo(numpy.int32).max:
+            self.positions = self.positions.astype(numpy.int32)
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(codes, minlength=len(self.uniques) + 1))))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index"""
+        return int(self.positions.nbytes + self.offsets.nbytes + self.uniques.memory_usage(deep=True))
+
+    def _mask(self, slots: numpy.ndarray) -> numpy.ndarray:
+        mask = numpy.zeros(self.length, dtype=bool)
+
+        if len(slots) == 1:
+            mask[self.positions[self.offsets[slots[0]] : self.offsets[slots[0] + 1]]] = True
+        elif len(slots) > 1:
+            mask[
+                numpy.concatenate([self.positions[self.offsets[slot] : self.offsets[slot + 1]] for slot in slots])
+            ] = True
+
+        return mask
+
+    def equals(self, value: Any) -> numpy.ndarray:
+        """
+        Get a mask of rows equal to a value, missing values never match.
+
+        :param value: value to look up
+        """
+        code = self.uniques.get_indexer([value])[0]
+
+        if code == -1:
+            return numpy.zeros(self.length, dtype=bool)
+
+        return self._mask(numpy.array([code + 1]))
+
+    def isin(self, values: List[Any]) -> numpy.ndarray:
+        """
+        Get a mask of rows matching any of the values, missing values never match.
+
+        :param values: values to look up
+        """
+        return self._mask(numpy.flatnonzero(self.uniques.isin(values)) + 1)
+
+
+COLUMN_INDEXES = DataFrameCache(
+    max_size=None, size_of=lambda index: index.nbytes, on_resize=CACHE_METRICS_TRACKER.update_indexes
+)
+"""Inverted indexes of columns explicitly marked for indexing, i.e. via DataVariable(index_columns=[...])"""
+
+
+def build_column_indexes(data: DataFrame, columns: List[str]):
+    """
+    Build inverted indexes of given columns of a DataFrame.
+    The indexes are used by equality and `isin` filters evaluated against the same DataFrame object.
+
+    :param data: DataFrame to index
+    :param columns: columns to index, columns not present in the data are skipped
+    """
+    for column in columns:
+        if column not in data.columns:
+            dev_logger.warning(f'Column {column} cannot be indexed as it is not present in the data')
+            continue
+
+        COLUMN_INDEXES.set(data, column, ColumnIndex(data[column]))
+
+
+def invalidate_filter_caches(data: Optional[DataFrame]):
+    """
+    Drop all cached filtering results and column indexes computed for a given DataFrame.
+
+    :param data: DataFrame to invalidate entries for
+    """
+    FILTER_INDEX_CACHE.invalidate(data)
+    STRING_COLUMN_CACHE.invalidate(data)
+    COLUMN_INDEXES.invalidate(data)
+
+
+COMPILED_FILTER_CACHE_SIZE = 128
+"""Maximum number of compiled filter plans to keep"""
+
+CompiledFilter = Callable[[DataFrame], Optional[numpy.ndarray]]
+"""Compiled single filter, evaluates to a boolean mask or None if the filter should not be applied"""
+
+PlanNode = Union[int, Tuple[QueryCombinator, List[Any]]]
+"""Node of a FilterPlan - either an index of a filter in the plan, or a (combinator, child nodes) tuple"""
+
+
+def _get_string_column(data: DataFrame, column: str) -> 'Series[str]':
+    """
+    Get an upper-cased string representation of a column, cached per DataFrame.
+    Comparing against an upper-cased pattern is equivalent to a case insensitive `str.contains`.
+    """
+    hit, series = STRING_COLUMN_CACHE.get(data, column)
+
+    if not hit:
+        series = data[column].astype(str).str.upper()
+        STRING_COLUMN_CACHE.set(data, column, series)
+
+    return series
+
+
+def _coerce_number(value: Any) -> Union[int, float]:
+    """
+    Coerce a value sent from the frontend to a number.
+    """
+    return float(value) if '.' in str(value) else int(value)
+
+
+def _guard_filter(compiled: CompiledFilter, query: ValueQuery) -> CompiledFilter:
+    """
+    Wrap a compiled filter so that errors when comparing result in the filter not being applied.
+    """
+
+    def _guarded(data: DataFrame) -> Optional[numpy.ndarray]:
+        try:
+            return compiled(data)
+        except Exception as e:
+            # If any error occurred when doing the comparison just don't filter at all
+            dev_logger.debug(
+                'Filter Error',
+                extra={'err': e, 'column': query.column, 'value': query.value, 'operator': query.operator},
+            )
+            return None
+
+    return _guarded
+
+
+def _with_column_index(
+    column: str, scan: CompiledFilter, lookup: Callable[[ColumnIndex], numpy.ndarray]
+) -> CompiledFilter:
+    """
+    Use the column index to evaluate a filter if the data has one for the column, otherwise scan the column.
+
+    :param column: column the filter applies to
+    :param scan: filter scanning the column
+    :param lookup: filter using the column index
+    """
+
+    def _filter(data: DataFrame) -> Optional[numpy.ndarray]:
+        hit, index = COLUMN_INDEXES.get(data, column)
+
+        if hit:
+            return lookup(index)
+
+        return scan(data)
+
+    return _filter
+
+
+def _compile_value_query(
+    query: ValueQuery, column_types: Dict[str, Tuple[ColumnType, bool]]
+) -> Optional[CompiledFilter]:
+    """
+    Compile a single filter to a function returning a boolean mask.
+    The value is coerced to the column type once, at compile time.
+
+    :param query: filter to compile
+    :param column_types: (type, is numpy-backed) for each column the query refers to
+    """
+    column = query.column
+    operator = query.operator
 
     # Contains is a special case, we always treat the column as a string
     if operator == QueryOperator.CONTAINS:
-        return series.astype(str).str.contains(str(value), case=False, regex=False)
+        pattern = str(query.value).upper()
+        return lambda data: _get_string_column(data, column).str.contains(pattern, regex=False).to_numpy(dtype=bool)
+
+    col_type, is_numpy = column_types[column]
+    value = query.value
+
+    # In the case of categorical filter we get a List for value
+    if isinstance(value, List):
+        values = value
+        scan_isin = lambda data: data[column].isin(values).to_numpy(dtype=bool, na_value=False)
 
-    col_type = infer_column_type(series)
+        # Whether missing values match depends on the column dtype, leave these to pandas
+        if any(is_scalar(v) and isna(v) for v in values):
+            return _guard_filter(scan_isin, query)
+
+        return _guard_filter(
+            _with_column_index(column, scan_isin, lambda index: index.isin(values)),
+            query,
+        )
 
     try:
-        # In the case of categorical filter we get a List for value
-        if isinstance(value, List):
-            return series.isin(value)
         # Converts date passed from frontend to the right format to compare with pandas
         if col_type == ColumnType.DATETIME:
-            if isinstance(value, List):
-                value = [parseISO(value[0]), parseISO(value[1])]
-            else:
-                value = parseISO(value)
+            value = parseISO(value)
         elif col_type == ColumnType.CATEGORICAL:
             value = str(value)
         else:
-            if isinstance(value, List):
-                lower_bound = float(value[0]) if '.' in str(value[0]) else int(value[0])
-                upper_bound = float(value[1]) if '.' in str(value[1]) else int(value[1])
-                value = [lower_bound, upper_bound]
-            else:
-                value = float(value) if '.' in str(value) else int(value)
+            value = _coerce_number(value)
+    except Exception as e:
+        # If any error occurred when converting types just don't filter at all
+        dev_logger.debug('Filter Error', extra={'err': e, 'column': column, 'value': value, 'operator': operator})
+        return None
+
+    compare: Callable[[Any], Any]
+    if operator == QueryOperator.GT:
+        compare = lambda values: values > value
+    elif operator == QueryOperator.LT:
+        compare = lambda values: values < value
+    elif operator == QueryOperator.NE:
+        compare = lambda values: values != value
+    elif operator == QueryOperator.BT:
+        compare = lambda values: (values >= value[0]) & (values <= value[1])
+    else:
+        compare = lambda values: values == value
 
-        if operator == QueryOperator.GT:
-            return series > value
+    # Compare raw numpy arrays of numbers and dates to skip index alignment,
+    # otherwise let pandas handle object and extension types
+    scan: CompiledFilter
+    if is_numpy and col_type != ColumnType.CATEGORICAL:
+        scan = lambda data: numpy.asarray(compare(data[column].to_numpy()), dtype=bool)
+    else:
+        scan = lambda data: compare(data[column]).to_numpy(dtype=bool, na_value=False)
 
-        if operator == QueryOperator.LT:
-            return series < value
+    if operator == QueryOperator.EQ:
+        return _guard_filter(_with_column_index(column, scan, lambda index: index.equals(value)), query)
 
-        if operator == QueryOperator.NE:
-            return series != value
+    if operator == QueryOperator.NE:
+        return _guard_filter(_with_column_index(column, scan, lambda index: ~index.equals(value)), query)
 
-        if operator == QueryOperator.BT:
-            return series.between(value[0], value[1])
+    return _guard_filter(scan, query)
 
-        return series == value
-    except Exception as e:
-        # If any error occurred either when converting types or doing the comparison just don't filter at all
-        dev_logger.debug('Filter Error', extra={'err': e, 'column': str, 'value': value, 'operator': operator})
-        return None
+
+class FilterPlan:
+    """
+    A FilterQuery compiled against a set of column types.
+
+    Holds each distinct filter of the query once, with values already coerced to the column types, and the tree
+    combining them. When evaluated each filter runs at most once and masks are combined with numpy.
+    """
+
+    def __init__(self, filters: List[CompiledFilter], root: PlanNode):
+        """
+        :param filters: distinct compiled filters
+        :param root: root node of the combination tree
+        """
+        self.filters = filters
+        self.root = root
+
+    def _evaluate(
+        self, node: PlanNode, data: DataFrame, masks: Dict[int, Optional[numpy.ndarray]]
+    ) -> Optional[numpy.ndarray]:
+        if isinstance(node, int):
+            if node not in masks:
+                masks[node] = self.filters[node](data)
+            return masks[node]
+
+        combinator, children = node
+        child_masks = [mask for mask in (self._evaluate(child, data, masks) for child in children) if mask is not None]
+
+        if len(child_masks) == 0:
+            return None
+
+        if len(child_masks) == 1:
+            return child_masks[0]
+
+        if combinator == QueryCombinator.AND:
+            return numpy.logical_and.reduce(child_masks)
+
+        return numpy.logical_or.reduce(child_masks)
+
+    def __call__(self, data: DataFrame) -> Optional[numpy.ndarray]:
+        """
+        Evaluate the plan against a DataFrame, returns None if no filters could be applied.
+
+        :param data: data to evaluate against, must have the column types the plan was compiled for
+        """
+        return self._evaluate(self.root, data, {})
+
+
+def _compile_query(
+    query: FilterQuery,
+    column_types: Dict[str, Tuple[ColumnType, bool]],
+    filters: List[CompiledFilter],
+    filter_indexes: Dict[Tuple[str, QueryOperator, str], int],
+) -> Optional[PlanNode]:
+    """
+    Compile a FilterQuery tree into a plan node, adding its filters to the plan.
+    Filters which cannot be applied are dropped, identical filters are only compiled once.
+
+    :param query: query to compile
+    :param column_types: (type, is numpy-backed) for each column the query refers to
+    :param filters: list of compiled filters in the plan
+    :param filter_indexes: index of each distinct (column, operator, value) filter in `filters`
+    """
+    if isinstance(query, ValueQuery):
+        key = (query.column, query.operator, repr(query.value))
+
+        if key not in filter_indexes:
+            compiled = _compile_value_query(query, column_types)
+
+            if compiled is None:
+                return None
+
+            filter_indexes[key] = len(filters)
+            filters.append(compiled)
+
+        return filter_indexes[key]
+    elif isinstance(query, ClauseQuery):
+        if query.combinator not in (QueryCombinator.AND, QueryCombinator.OR):
+            raise ValueError(f'Unknown combinator {query.combinator}')
+
+        children = [
+            node
+            for node in (_compile_query(clause, column_types, filters, filter_indexes) for clause in query.clauses)
+            if node is not None
+        ]
+
+        if len(children) == 0:
+            return None
+
+        if len(children) == 1:
+            return children[0]
+
+        return (query.combinator, children)
+    else:
+        raise ValueError(f'Unknown query type {type(query)}')
 
 
-def _resolve_filter_query(data: DataFrame, query: FilterQuery) -> 'Optional[Series[bool]]':
+def get_query_columns(query: FilterQuery) -> Set[str]:
     """
-    Resolve a FilterQuery to a Series[bool] for filtering
+    Get the set of columns a query refers to.
     """
     if isinstance(query, ValueQuery):
-        return _filter_to_series(data, query.column, query.operator, query.value)
+        return {query.column}
     elif isinstance(query, ClauseQuery):
-        filters = None
-
-        for clause in query.clauses:
-            resolved_clause = _resolve_filter_query(data, clause)
-
-            if resolved_clause is not None:
-                if query.combinator == QueryCombinator.AND:
-                    if filters is None:
-                        filters = resolved_clause
-                    else:
-                        filters = filters & resolved_clause
-                elif query.combinator == QueryCombinator.OR:
-                    if filters is None:
-                        filters = resolved_clause
-                    else:
-                        filters = filters | resolved_clause
-                else:
-                    raise ValueError(f'Unknown combinator {query.combinator}')
-
-        return filters
+        return set().union(*(get_query_columns(clause) for clause in query.clauses))
     else:
         raise ValueError(f'Unknown query type {type(query)}')
 
 
+_compiled_filters: OrderedDict[Hashable, Optional[FilterPlan]] = OrderedDict()
+_compiled_filters_lock = threading.Lock()
+
+
+def compile_filter_query(
+    data: DataFrame, query: FilterQuery, filters_hash: Optional[str] = None
+) -> Optional[FilterPlan]:
+    """
+    Compile a FilterQuery into a filter plan for DataFrames with the same column types as `data`.
+
+    Plans are cached per (filters, column types) so the type of each column is only inferred and each value
+    only coerced once, rather than for every clause on every request.
+
+    :param data: data the plan will be evaluated against
+    :param query: query to compile
+    :param filters_hash: optional precomputed hash of the query, if not provided the plan is not cached
+    """
+    columns = sorted(get_query_columns(query))
+    # Accessing a missing column raises a KeyError, same as when filtering
+    dtypes = tuple((column, str(data[column].dtype)) for column in columns)
+
+    plan_key = (filters_hash, dtypes)
+    if filters_hash is not None:
+        with _compiled_filters_lock:
+            if plan_key in _compiled_filters:
+                _compiled_filters.move_to_end(plan_key)
+                return _compiled_filters[plan_key]
+
+    column_types = {
+        column: (infer_column_type(data[column]), isinstance(data[column].dtype, numpy.dtype)) for column in columns
+    }
+    filters: List[CompiledFilter] = []
+    root = _compile_query(query, column_types, filters, {})
+    compiled = FilterPlan(filters, root) if root is not None else None
+
+    if filters_hash is not None:
+        with _compiled_filters_lock:
+            _compiled_filters[plan_key] = compiled
+            while len(_compiled_filters) > COMPILED_FILTER_CACHE_SIZE:
+                _compiled_filters.popitem(last=False)
+
+    return compiled
+
+
+TOP_K_MIN_ROWS = 10_000
+"""Minimum number of rows for which a sorted page is selected with a partial sort rather than a full sort"""
+
+TOP_K_MAX_FRACTION = 0.1
+"""Maximum distance of the page from either end of the sorted view, as a fraction of rows, to use a partial sort"""
+
+
+def _hash_filters(filters: Optional[FilterQuery]) -> Optional[str]:
+    """
+    Hash filters to use as part of a cache key, returns None if the filters cannot be hashed.
+    """
+    try:
+        return hash_object(filters)
+    except TypeError:
+        # Filter values are not serializable, skip the cache
+        return None
+
+
+def _parse_order_by(order_by: str) -> Tuple[str, bool]:
+    """
+    Parse an orderBy string into a (column, ascending) tuple.
+    """
+    # Minus indicates its descending order
+    if order_by.startswith('-'):
+        return order_by[1:], False
+
+    return order_by, True
+
+
+def _resolve_filter_positions(
+    data: DataFrame, filters: FilterQuery, filters_hash: Optional[str]
+) -> Optional[numpy.ndarray]:
+    """
+    Resolve positions of rows matching the filters.
+    Returns None if the filters could not be applied, i.e. all rows should be returned.
+
+    :param data: data to filter
+    :param filters: filters to apply
+    :param filters_hash: hash of the filters, used to cache the compiled filter plan
+    """
+    compiled = compile_filter_query(data, filters, filters_hash)
+
+    if compiled is None:
+        return None
+
+    mask = compiled(data)
+
+    if mask is None:
+        return None
+
+    return numpy.flatnonzero(mask)
+
+
+def _sort_positions(data: DataFrame, positions: Optional[numpy.ndarray], order_by: str) -> numpy.ndarray:
+    """
+    Order row positions by a given column.
+
+    :param data: data the positions refer to
+    :param positions: positions of rows to sort, None means all rows
+    :param order_by: column to order by, prefixed with '-' for descending order
+    """
+    column, ascending = _parse_order_by(order_by)
+    series = data[column] if positions is None else data[column].take(positions)
+    order = series.reset_index(drop=True).sort_values(ascending=ascending, kind='stable').index.to_numpy()
+    return order if positions is None else positions[order]
+
+
+def _stable_argsort(values: numpy.ndarray, ascending: bool) -> numpy.ndarray:
+    """
+    Stable argsort in either direction; ties keep their original order in both directions, same as pandas.
+    """
+    if ascending:
+        return numpy.argsort(values, kind='stable')
+
+    reversed_order = numpy.argsort(values[::-1], kind='stable')
+    return (len(values) - 1 - reversed_order)[::-1]
+
+
+def _stable_head(values: numpy.ndarray, k: int, ascending: bool) -> numpy.ndarray:
+    """
+    Get indices of the first k values of a stable sort of values without NaNs, in order.
+
+    Selects the k-th value with a partition, then only sorts values before it; ties on the k-th value
+    are taken in their original order to keep the result identical to a full stable sort.
+    """
+    n_values = len(values)
+
+    if k <= 0:
+        return numpy.empty(0, dtype=numpy.intp)
+
+    if k >= n_values:
+        return _stable_argsort(values, ascending)
+
+    if ascending:
+        kth = numpy.partition(values, k - 1)[k - 1]
+        strictly_before = numpy.flatnonzero(values < kth)
+    else:
+        kth = numpy.partition(values, n_values - k)[n_values - k]
+        strictly_before = numpy.flatnonzero(values > kth)
+
+    ties = numpy.flatnonzero(values == kth)[: k - len(strictly_before)]
+    selected = numpy.sort(numpy.concatenate([strictly_before, ties]))
+    return selected[_stable_argsort(values[selected], ascending)]
+
+
+def _split_nans(values: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Split values into positions of valid and NaN/NaT values.
+    """
+    if values.dtype.kind in 'fmM':
+        nan_mask = numpy.isnan(values)
+        if nan_mask.any():
+            return numpy.flatnonzero(~nan_mask), numpy.flatnonzero(nan_mask)
+
+    return numpy.arange(len(values)), numpy.empty(0, dtype=numpy.intp)
+
+
+def _top_k_window(
+    data: DataFrame, positions: Optional[numpy.ndarray], order_by: str, start: int, stop: int, total_count: int
+) -> Optional[numpy.ndarray]:
+    """
+    Resolve positions of rows in the [start:stop] window of the sorted view with a partial sort.
+
+    Only applies to large numerical and datetime columns when the window is near either end of the view,
+    otherwise returns None and the view should be fully sorted. NaNs are placed last, same as a full sort.
+
+    :param data: data the positions refer to
+    :param positions: positions of filtered rows, None means all rows
+    :param order_by: column to order by, prefixed with '-' for descending order
+    :param start: start of the window
+    :param stop: end of the window
+    :param total_count: number of rows in the view
+    """
+    if total_count < TOP_K_MIN_ROWS:
+        return None
+
+    column, ascending = _parse_order_by(order_by)
+    series = data[column]
+
+    if not isinstance(series.dtype, numpy.dtype) or series.dtype.kind not in 'iufmM':
+        return None
+
+    start = min(max(start, 0), total_count)
+    stop = min(max(stop, start), total_count)
+    threshold = int(total_count * TOP_K_MAX_FRACTION)
+
+    values = series.to_numpy()
+    if positions is not None:
+        values = values[positions]
+
+    valid, nans = _split_nans(values)
+    valid_values = values[valid]
+
+    if stop <= threshold:
+        # Head of the view: first `stop` valid values followed by NaNs
+        head = valid[_stable_head(valid_values, stop, ascending)]
+        window = numpy.concatenate([head, nans[: stop - len(head)]])[start:stop]
+    elif start >= total_count - threshold:
+        # Tail of the view: NaNs come last, the rest are the last valid values in order.
+        # The end of the sorted valid values is the reversed head of the reversed values sorted the other way.
+        n_tail = total_count - start
+        n_valid_tail = max(n_tail - len(nans), 0)
+        reversed_head = _stable_head(valid_values[::-1], n_valid_tail, not ascending)
+        tail = valid[(len(valid_values) - 1 - reversed_head)[::-1]]
+        window = numpy.concatenate([tail, nans[len(nans) - min(n_tail, len(nans)) :]])[: stop - start]
+    else:
+        return None
+
+    return window if positions is None else positions[window]
+
+
 def apply_filters(
     data: Optional[DataFrame], filters: Optional[FilterQuery] = None, pagination: Optional[Pagination] = None
 ) -> Tuple[Optional[DataFrame], int]:
     """
     Apply filtering and pagination to a DataFrame.
+
+    The positions of the filtered and sorted rows are cached per (data, filters, orderBy),
+    so subsequent pages of the same view only take the requested rows.
+    Pages near either end of a large sorted view are selected with a partial sort instead.
     """
     if data is None:
         return None, 0
 
-    new_data = data
+    filters_hash = _hash_filters(filters)
+
+    # A specific row is fetched without sorting
+    order_by = None
+    if pagination is not None and pagination.index is None:
+        order_by = pagination.orderBy
+
+    # Check for a cached sorted view first
+    is_sorted = False
+    positions = None
+    if order_by is not None and filters_hash is not None:
+        is_sorted, positions = FILTER_INDEX_CACHE.get(data, (filters_hash, order_by))
 
     # FILTER
-    if filters is not None:
-        resolved_query = _resolve_filter_query(data, filters)
-        if resolved_query is not None:
-            new_data = new_data[resolved_query]
+    if not is_sorted and filters is not None:
+        hit = False
+        if filters_hash is not None:
+            hit, positions = FILTER_INDEX_CACHE.get(data, (filters_hash, None))
+
+        if not hit:
+            positions = _resolve_filter_positions(data, filters, filters_hash)
+
+            if filters_hash is not None:
+                FILTER_INDEX_CACHE.set(data, (filters_hash, None), positions)
 
     # Count before paginating
-    total_count = len(new_data.index)
+    total_count = len(data.index) if positions is None else len(positions)
+
+    if pagination is None:
+        return (data if positions is None else data.take(positions)), total_count
+
+    # ON FETCHING SPECIFIC ROW
+    if pagination.index is not None:
+        return data[int(pagination.index) : int(pagination.index) + 1], total_count
+
+    start_index = pagination.offset if pagination.offset is not None else 0
+    stop_index = start_index + pagination.limit if pagination.limit is not None else total_count
+
+    # SORT
+    if order_by is not None and not is_sorted:
+        window = _top_k_window(data, positions, order_by, start_index, stop_index, total_count)
+
+        if window is not None:
+            return data.take(window), total_count
+
+        positions = _sort_positions(data, positions, order_by)
+
+        if filters_hash is not None:
+            FILTER_INDEX_CACHE.set(data, (filters_hash, order_by), positions)
+
+    # PAGINATE
+    if positions is None:
+        return data[start_index:stop_index], total_count
+
+    return data.take(positions[start_index:stop_index]), total_count
+
+
+RowGroup = Tuple[Union['pyarrow.dataset.ParquetFileFragment', 'pyarrow.RecordBatch'], int, int]
+"""
+Row group of a dataset - (row group fragment, or record batch of an Arrow dataset, position of its first row
+in the dataset, number of rows)
+"""
+
+PARQUET_FILTER_CACHE_SIZE = int(os.environ.get('DARA_PARQUET_FILTER_CACHE_SIZE', 32))
+"""Maximum number of (dataset, filters, orderBy) views of Parquet datasets to keep the matching positions of"""
+
+ParquetCacheKey = Tuple[str, Tuple[Tuple[str, int], ...], str, Optional[str]]
+"""(path, (file, mtime) of each file of the dataset, filters hash, orderBy)"""
+
+_parquet_positions: OrderedDict[ParquetCacheKey, Optional[numpy.ndarray]] = OrderedDict()
+_parquet_positions_lock = threading.Lock()
+
+
+def _get_parquet_positions(key: ParquetCacheKey) -> Tuple[bool, Optional[numpy.ndarray]]:
+    """
+    Get cached positions of rows of a Parquet dataset matching (filters, orderBy).
+    """
+    with _parquet_positions_lock:
+        if key not in _parquet_positions:
+            return False, None
+
+        _parquet_positions.move_to_end(key)
+        return True, _parquet_positions[key]
+
+
+def _set_parquet_positions(key: ParquetCacheKey, positions: Optional[numpy.ndarray]):
+    """
+    Cache positions of rows of a Parquet dataset matching (filters, orderBy).
+    """
+    with _parquet_positions_lock:
+        _parquet_positions[key] = positions
+        _parquet_positions.move_to_end(key)
+        while len(_parquet_positions) > PARQUET_FILTER_CACHE_SIZE:
+            _parquet_positions.popitem(last=False)
+
+
+def _get_dataset_version(dataset: 'pyarrow.dataset.FileSystemDataset') -> Tuple[Tuple[str, int], ...]:
+    """
+    Get the (file, mtime) of each file of a dataset, so that cached positions are not reused once it is rewritten.
+    """
+    return tuple((file, os.stat(file).st_mtime_ns) for file in dataset.files)
+
+
+def _get_pushdown_column_types(schema: 'pyarrow.Schema') -> Dict[str, ColumnType]:
+    """
+    Get the columns of a Parquet dataset whose filters can be pushed down to row group statistics, with the type
+    the filter plan infers for them.
+
+    Only columns the filter plan compares the same way as Arrow are included: numbers, strings and timezone-naive
+    timestamps. Other columns, i.e. dates which pandas reads as objects or timezone-aware timestamps, are always
+    filtered by the plan alone.
+
+    :param schema: schema of the dataset
+    """
+    # Infer types from the DataFrame the plan is evaluated against, pandas metadata can change the dtypes
+    data = schema.empty_table().to_pandas()
+    column_types: Dict[str, ColumnType] = {}
+
+    for field in schema:
+        if field.name not in data.columns:
+            continue
+
+        series = data[field.name]
+        col_type = infer_column_type(series)
+        is_numpy = isinstance(series.dtype, numpy.dtype)
+        arrow_type = field.type
+
+        if col_type == ColumnType.NUMERICAL and is_numpy:
+            if pyarrow.types.is_integer(arrow_type) or pyarrow.types.is_floating(arrow_type):
+                column_types[field.name] = col_type
+        elif col_type == ColumnType.DATETIME and is_numpy:
+            if pyarrow.types.is_timestamp(arrow_type) and arrow_type.tz is None:
+                column_types[field.name] = col_type
+        elif pyarrow.types.is_string(arrow_type) or pyarrow.types.is_large_string(arrow_type):
+            column_types[field.name] = col_type
+
+    return column_types
+
+
+def _coerce_arrow_value(value: Any, col_type: ColumnType, arrow_type: 'pyarrow.DataType') -> Any:
+    """
+    Coerce a filter value to a given Arrow type, same as `_compile_value_query` coerces it to the column type.
+    """
+    if col_type == ColumnType.DATETIME:
+        return pyarrow.scalar(parseISO(value)).cast(arrow_type)
+
+    if col_type == ColumnType.CATEGORICAL:
+        return str(value)
+
+    return _coerce_number(value)
+
+
+def _is_pushdown_isin_value(value: Any, col_type: ColumnType) -> bool:
+    """
+    Check whether a value of an `isin` filter matches the same rows in Arrow as in pandas, values are not coerced.
+    """
+    if col_type == ColumnType.NUMERICAL:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and not isna(value)
+
+    if col_type == ColumnType.CATEGORICAL:
+        return isinstance(value, str)
+
+    return False
+
+
+def to_arrow_expression(
+    query: FilterQuery, schema: 'pyarrow.Schema', column_types: Optional[Dict[str, ColumnType]] = None
+) -> Optional['pyarrow.dataset.Expression']:
+    """
+    Translate a FilterQuery into an Arrow expression used to skip row groups based on their statistics.
+
+    The expression only needs to be a superset of the filters - rows are still filtered with the filter plan,
+    so filters which cannot be translated are left out of AND clauses and make OR clauses match everything.
+    Filters are only translated for columns and operators the filter plan compares the same way.
+    Returns None if nothing can be skipped.
+
+    :param query: filters to translate
+    :param schema: schema of the dataset
+    :param column_types: optional precomputed result of `_get_pushdown_column_types` for the schema
+    """
+    if column_types is None:
+        column_types = _get_pushdown_column_types(schema)
+
+    if isinstance(query, ValueQuery):
+        if query.column not in schema.names:
+            raise KeyError(query.column)
+
+        col_type = column_types.get(query.column)
+        if col_type is None:
+            return None
+
+        field = pyarrow.dataset.field(query.column)
+        arrow_type = schema.field(query.column).type
+
+        try:
+            # The plan matches `isin` values as they are sent, without coercing them
+            if isinstance(query.value, List):
+                if not all(_is_pushdown_isin_value(v, col_type) for v in query.value):
+                    return None
+                return field.isin(query.value)
+
+            if query.operator == QueryOperator.BT:
+                return (field >= _coerce_arrow_value(query.value[0], col_type, arrow_type)) & (
+                    field <= _coerce_arrow_value(query.value[1], col_type, arrow_type)
+                )
+
+            if query.operator in (QueryOperator.GT, QueryOperator.LT, QueryOperator.EQ):
+                value = _coerce_arrow_value(query.value, col_type, arrow_type)
+
+                if query.operator == QueryOperator.GT:
+                    return field > value
+                if query.operator == QueryOperator.LT:
+                    return field < value
+                return field == value
+        except Exception:
+            return None
+
+        # NE and CONTAINS cannot be answered from min/max statistics
+        return None
+
+    if isinstance(query, ClauseQuery):
+        expressions = [to_arrow_expression(clause, schema, column_types) for clause in query.clauses]
+
+        if query.combinator == QueryCombinator.AND:
+            expressions = [expression for expression in expressions if expression is not None]
+            if len(expressions) == 0:
+                return None
+            return functools.reduce(lambda left, right: left & right, expressions)
+
+        if len(expressions) == 0 or any(expression is None for expression in expressions):
+            return None
+        return functools.reduce(lambda left, right: left | right, expressions)
+
+    return None
+
+
+def _list_row_groups(
+    dataset: 'pyarrow.dataset.FileSystemDataset', expression: Optional['pyarrow.dataset.Expression'] = None
+) -> List[RowGroup]:
+    """
+    List row groups of a dataset in order, skipping ones which cannot match the expression.
+
+    Arrow IPC files have no row group statistics, their record batches are listed as row groups instead and
+    are never skipped. The files are memory-mapped so only the batches which are read are loaded.
+
+    :param dataset: dataset to list row groups of
+    :param expression: optional expression to prune row groups with
+    """
+    row_groups: List[RowGroup] = []
+    start = 0
+
+    for fragment in dataset.get_fragments():
+        if not isinstance(fragment, pyarrow.dataset.ParquetFileFragment):
+            reader = pyarrow.ipc.open_file(pyarrow.memory_map(fragment.path))
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                row_groups.append((batch, start, batch.num_rows))
+                start += batch.num_rows
+            continue
+
+        metadata = fragment.metadata
+        offsets = numpy.concatenate(
+            ([0], numpy.cumsum([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]))
+        )
+
+        try:
+            fragments = fragment.split_by_row_group(filter=expression, schema=dataset.schema)
+        except (pyarrow.ArrowException, TypeError) as e:
+            # i.e. the value cannot be compared with the column statistics, scan all row groups
+            dev_logger.debug('Row group pruning error', extra={'err': e})
+            fragments = fragment.split_by_row_group(schema=dataset.schema)
+
+        for row_group_fragment in fragments:
+            row_group = row_group_fragment.row_groups[0]
+            row_groups.append((row_group_fragment, start + int(offsets[row_group.id]), row_group.num_rows))
+
+        start += metadata.num_rows
+
+    return row_groups
+
+
+def _read_row_group(row_group: RowGroup, columns: Optional[List[str]] = None) -> DataFrame:
+    """
+    Read a row group into a DataFrame indexed by the positions of rows in the dataset.
+
+    :param row_group: row group to read
+    :param columns: optional columns to read, all by default
+    """
+    fragment, start, num_rows = row_group
+
+    if isinstance(fragment, pyarrow.RecordBatch):
+        table = pyarrow.Table.from_batches([fragment])
+        data = (table if columns is None else table.select(columns)).to_pandas()
+    else:
+        data = fragment.to_table(columns=columns).to_pandas()
+
+    data.index = pandas.RangeIndex(start, start + num_rows)
+    return data
+
+
+def _take_rows(schema: 'pyarrow.Schema', row_groups: List[RowGroup], positions: numpy.ndarray) -> DataFrame:
+    """
+    Read rows at given positions of a dataset, only reading row groups containing them.
+
+    :param schema: schema of the dataset
+    :param row_groups: all row groups of the dataset
+    :param positions: positions of rows to read, in the order they should be returned
+    """
+    starts = numpy.array([start for _, start, _ in row_groups], dtype=numpy.int64)
+    # Row group each position belongs to
+    groups = numpy.searchsorted(starts, positions, side='right') - 1
+
+    chunks = []
+    for group in numpy.unique(groups):
+        group_positions = positions[groups == group]
+        data = _read_row_group(row_groups[group])
+        chunks.append(data.take(group_positions - row_groups[group][1]))
+
+    if len(chunks) == 0:
+        result = schema.empty_table().to_pandas()
+    else:
+        result = pandas.concat(chunks).loc[positions]
+
+    if INDEX not in result.columns:
+        result.insert(0, INDEX, result.index)
+
+    return result
+
+
+def apply_filters_to_parquet(
+    path: str, filters: Optional[FilterQuery] = None, pagination: Optional[Pagination] = None
+) -> Tuple[DataFrame, int]:
+    """
+    Apply filtering and pagination to a Parquet or Arrow IPC (Feather) dataset on disk without loading the whole
+    dataset into memory.
+
+    Row groups which cannot match the filters based on their statistics are skipped, and only the columns
+    required to evaluate the filters and ordering are read from the remaining ones. Only the row groups
+    containing rows of the requested page are then read in full. Record batches of Arrow IPC files are read
+    as row groups, see `_list_row_groups`.
+
+    The positions of the filtered and sorted rows are cached per (path, mtime, filters, orderBy), same as
+    `apply_filters` does for DataFrames, so subsequent pages of the same view do not scan the dataset again.
+
+    Returns the same rows as `apply_filters` on the DataFrame stored in the file.
+
+    :param path: path to a Parquet file or a directory of Parquet files, or to a `.feather`/`.arrow` file
+    :param filters: filters to apply
+    :param pagination: pagination to apply
+    """
+    dataset = pyarrow.dataset.dataset(path, format='ipc' if path.endswith(ARROW_EXTENSIONS) else 'parquet')
+    schema = dataset.schema
+    row_groups = _list_row_groups(dataset)
+
+    order_by = None
+    if pagination is not None and pagination.index is None:
+        order_by = pagination.orderBy
+
+    columns = set() if filters is None else get_query_columns(filters)
+    if order_by is not None:
+        columns.add(_parse_order_by(order_by)[0])
+
+    missing_columns = columns - set(schema.names)
+    if len(missing_columns) > 0:
+        raise KeyError(', '.join(sorted(missing_columns)))
+
+    filters_hash = _hash_filters(filters)
+    cache_key = None
+    if filters_hash is not None and (filters is not None or order_by is not None):
+        cache_key = (os.path.abspath(path), _get_dataset_version(dataset), filters_hash, order_by)
+
+    # Check for a cached sorted view first, or cached filtered positions if not sorting
+    hit = False
+    positions: Optional[numpy.ndarray] = None
+    if cache_key is not None:
+        hit, positions = _get_parquet_positions(cache_key)
+        if not hit and order_by is None:
+            hit, positions = _get_parquet_positions(cache_key[:3] + (None,))
+
+    num_rows = sum(row_group[2] for row_group in row_groups)
+    is_sorted = hit and order_by is not None
+    view: Optional[DataFrame] = None
+
+    # FILTER
+    if not hit and (filters is not None or order_by is not None):
+        expression = None if filters is None else to_arrow_expression(filters, schema)
+        matched_positions = []
+        chunks = []
+
+        for row_group in row_groups if expression is None else _list_row_groups(dataset, expression):
+            data = _read_row_group(row_group, sorted(columns))
+            local_positions = None if filters is None else _resolve_filter_positions(data, filters, filters_hash)
+
+            if local_positions is not None:
+                data = data.take(local_positions)
+
+            matched_positions.append(data.index.to_numpy())
+            chunks.append(data)
+
+        if len(chunks) > 0:
+            positions = numpy.concatenate(matched_positions)
+            view = pandas.concat(chunks, ignore_index=True)
+        else:
+            positions = numpy.empty(0, dtype=numpy.int64)
+
+        if cache_key is not None and filters is not None:
+            _set_parquet_positions(cache_key[:3] + (None,), positions)
+
+    total_count = num_rows if positions is None else len(positions)
+
+    if positions is None:
+        positions = numpy.arange(num_rows)
 
     if pagination is not None:
         # ON FETCHING SPECIFIC ROW
         if pagination.index is not None:
-            return data[int(pagination.index) : int(pagination.index) + 1], total_count
+            index = int(pagination.index)
+            return _take_rows(schema, row_groups, numpy.arange(index, min(index + 1, num_rows))), total_count
+
+        start_index = pagination.offset if pagination.offset is not None else 0
+        stop_index = start_index + pagination.limit if pagination.limit is not None else total_count
 
         # SORT
-        if pagination.orderBy is not None:
-            order_by = pagination.orderBy
-            ascending = True
+        if order_by is not None and not is_sorted and view is not None:
+            window = _top_k_window(view, None, order_by, start_index, stop_index, total_count)
 
-            # Minus indicates its descending order
-            if order_by.startswith('-'):
-                order_by = order_by[1:]
-                ascending = False
+            if window is not None:
+                return _take_rows(schema, row_groups, positions[window]), total_count
 
-            new_data = new_data.sort_values(by=order_by, ascending=ascending, inplace=False)
+            positions = positions[_sort_positions(view, None, order_by)]
 
-        # PAGINATE
-        start_index = pagination.offset if pagination.offset is not None else 0
-        stop_index = start_index + pagination.limit if pagination.limit is not None else total_count
+            if cache_key is not None:
+                _set_parquet_positions(cache_key, positions)
+
+        positions = positions[start_index:stop_index]
+
+    return _take_rows(schema, row_groups, positions), total_count
+
+
+def filter_arrow_table(table: 'pyarrow.Table', filters: Optional[FilterQuery]) -> 'pyarrow.Table':
+    """
+    Apply filters to an Arrow table, returning the same rows as `apply_filters` on the equivalent DataFrame.
+
+    Only the columns referenced by the filters are converted to pandas to evaluate the filters,
+    the remaining columns are only copied for the matching rows.
+
+    :param table: table to filter
+    :param filters: filters to apply
+    """
+    if filters is None:
+        return table
+
+    data = table.select(sorted(get_query_columns(filters))).to_pandas()
+    positions = _resolve_filter_positions(data, filters, _hash_filters(filters))
 
-        new_data = new_data[start_index:stop_index]
+    if positions is None:
+        return table
 
-    return new_data, total_count
+    return table.take(positions)
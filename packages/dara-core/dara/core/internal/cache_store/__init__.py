@@ -1,6 +1,8 @@
 from dara.core.internal.cache_store.cache_store import CacheScopeStore, CacheStore
+from dara.core.internal.cache_store.governor import MemoryGovernor
 
 __all__ = [
     'CacheStore',
     'CacheScopeStore',
+    'MemoryGovernor',
 ]
@@ -1,5 +1,5 @@
 import abc
-from typing import Any, Generic, TypeVar
+from typing import Any, Callable, Generic, List, Optional, TypeVar
 
 from dara.core.base_definitions import BaseCachePolicy
 
@@ -7,8 +7,22 @@ PolicyT = TypeVar('PolicyT', bound=BaseCachePolicy)
 
 
 class CacheStoreImpl(abc.ABC, Generic[PolicyT]):
-    def __init__(self, policy: PolicyT):
+    def __init__(self, policy: PolicyT, on_evict: Optional[Callable[[str], None]] = None):
+        """
+        :param policy: The cache policy.
+        :param on_evict: Optional callback invoked with the key of each entry evicted by the policy.
+        """
         self.policy = policy
+        self.on_evict = on_evict
+
+    def _evicted(self, key: str):
+        """
+        Notify the eviction callback of an entry evicted by the policy.
+
+        :param key: The key of the entry evicted.
+        """
+        if self.on_evict is not None:
+            self.on_evict(key)
 
     @abc.abstractmethod
     async def delete(self, key: str) -> Any:
@@ -28,13 +42,23 @@ class CacheStoreImpl(abc.ABC, Generic[PolicyT]):
         """
 
     @abc.abstractmethod
-    async def set(self, key: str, value: Any, pin: bool = False):
+    def is_pinned(self, key: str) -> bool:
+        """
+        Check whether an entry is pinned.
+
+        :param key: The key of the entry to check.
+        :return: Whether the entry exists and is pinned.
+        """
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any, pin: bool = False, size: Optional[int] = None):
         """
         Add an entry to the cache. Depending on the implementation might evict other entries.
 
         :param key: The key of the entry to set.
         :param value: The value of the entry to set.
         :param pin: If true, the entry will not be evicted until read.
+        :param size: Optional estimated size of the value, so that size-aware implementations do not size it again.
         """
 
     @abc.abstractmethod
@@ -42,3 +66,12 @@ class CacheStoreImpl(abc.ABC, Generic[PolicyT]):
         """
         Empty the store.
         """
+
+    async def evict_expired(self) -> List[str]:
+        """
+        Evict expired entries from the cache, for implementations whose entries expire.
+        The eviction callback is not invoked for these entries.
+
+        :return: The keys of the entries evicted.
+        """
+        return []
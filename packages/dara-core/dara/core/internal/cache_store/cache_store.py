@@ -1,9 +1,14 @@
-from typing import Any, Dict, Generic, Optional, cast
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, Optional, Tuple, cast
+
+import anyio
 
 from dara.core.base_definitions import (
     CachedRegistryEntry,
     KeepAllCachePolicy,
     LruCachePolicy,
+    MaxBytesCachePolicy,
     MostRecentCachePolicy,
     PendingTask,
     PendingValue,
@@ -12,23 +17,33 @@ from dara.core.base_definitions import (
 from dara.core.internal.cache_store.base_impl import CacheStoreImpl, PolicyT
 from dara.core.internal.cache_store.keep_all import KeepAllCache
 from dara.core.internal.cache_store.lru import LRUCache
+from dara.core.internal.cache_store.max_bytes import MaxBytesCache
 from dara.core.internal.cache_store.ttl import TTLCache
 from dara.core.internal.utils import CacheScope, get_cache_scope
-from dara.core.metrics import CACHE_METRICS_TRACKER, total_size
+from dara.core.logging import eng_logger
+from dara.core.metrics import CACHE_METRICS_TRACKER, EntrySizes
+
+if TYPE_CHECKING:
+    from dara.core.internal.cache_store.governor import MemoryGovernor
 
 
-def cache_impl_for_policy(policy: PolicyT) -> CacheStoreImpl[PolicyT]:
+def cache_impl_for_policy(policy: PolicyT, on_evict: Optional[Callable[[str], None]] = None) -> CacheStoreImpl[PolicyT]:
     """
     Get a cache implementation depending on the policy
+
+    :param policy: The cache policy.
+    :param on_evict: Optional callback invoked with the key of each entry evicted by the policy.
     """
     impl: Optional[CacheStoreImpl] = None
 
     if isinstance(policy, LruCachePolicy) or isinstance(policy, MostRecentCachePolicy):
-        impl = LRUCache(policy)
+        impl = LRUCache(policy, on_evict)
     elif isinstance(policy, TTLCachePolicy):
-        impl = TTLCache(policy)
+        impl = TTLCache(policy, on_evict)
     elif isinstance(policy, KeepAllCachePolicy):
-        impl = KeepAllCache(policy)
+        impl = KeepAllCache(policy, on_evict)
+    elif isinstance(policy, MaxBytesCachePolicy):
+        impl = MaxBytesCache(policy, on_evict)
 
     if impl is None:
         raise NotImplementedError(f'No cache implementation available for policy: {policy}')
@@ -41,12 +56,35 @@ class CacheScopeStore(Generic[PolicyT]):
     A Cache Scope aware store.
     Depending on the policy will store a different cache implementation per entry.
     Keeps entries scoped to the cache scope of current execution.
+
+    The estimated size and last access time of each entry are kept until the entry is deleted or evicted, so that
+    it is only sized once.
     """
 
-    def __init__(self, policy: PolicyT):
+    def __init__(self, policy: PolicyT, on_resize: Optional[Callable[[int], None]] = None):
+        """
+        :param policy: The cache policy.
+        :param on_resize: Optional callback invoked with the change in the size of the entries whenever it changes.
+        """
         self.caches: Dict[CacheScope, CacheStoreImpl[PolicyT]] = {}
+        self.sizes: EntrySizes[Tuple[CacheScope, str]] = EntrySizes(on_resize)
+        self.accessed: Dict[Tuple[CacheScope, str], float] = {}
         self.policy = policy
 
+    def _forget(self, scope: CacheScope, key: str) -> int:
+        """
+        Drop the size and access time of an entry no longer in the cache.
+
+        :param scope: The scope of the entry.
+        :param key: The key of the entry.
+        :return: The size of the entry.
+        """
+        self.accessed.pop((scope, key), None)
+        return self.sizes.pop((scope, key))
+
+    def _on_evict(self, scope: CacheScope, key: str):
+        self._forget(scope, key)
+
     async def delete(self, key: str) -> Any:
         """
         Delete an entry from the cache.
@@ -60,7 +98,38 @@ class CacheScopeStore(Generic[PolicyT]):
         if cache is None:
             return None
 
-        return await cache.delete(key)
+        value = await cache.delete(key)
+
+        # Pinned entries are not deleted
+        if value is not None:
+            self._forget(scope, key)
+
+        return value
+
+    async def evict(self, scope: CacheScope, key: str) -> int:
+        """
+        Evict an entry of the given scope, unless it is pinned or pending.
+
+        :param scope: The scope of the entry to evict.
+        :param key: The key of the entry to evict.
+        :return: The size of the entry evicted, 0 if it was not evicted.
+        """
+        cache = self.caches.get(scope)
+
+        # No cache for this scope
+        if cache is None:
+            return 0
+
+        # Pending values are awaited by their callers, evicting them would not free anything
+        value = await cache.get(key)
+        if value is None or isinstance(value, (PendingValue, PendingTask)):
+            return 0
+
+        # Pinned entries are read later with unpin=True, not every implementation refuses to delete them
+        if cache.is_pinned(key) or await cache.delete(key) is None:
+            return 0
+
+        return self._forget(scope, key)
 
     async def get(self, key: str, unpin: bool = False) -> Optional[Any]:
         """
@@ -76,7 +145,12 @@ class CacheScopeStore(Generic[PolicyT]):
         if cache is None:
             return None
 
-        return await cache.get(key, unpin=unpin)
+        value = await cache.get(key, unpin=unpin)
+
+        if value is not None:
+            self.accessed[(scope, key)] = time.monotonic()
+
+        return value
 
     async def set(self, key: str, value: Any, pin: bool = False):
         """
@@ -91,13 +165,28 @@ class CacheScopeStore(Generic[PolicyT]):
 
         # No cache for this scope yet, create new
         if cache is None:
-            cache = cache_impl_for_policy(self.policy)
+            cache = cache_impl_for_policy(self.policy, partial(self._on_evict, scope))
             self.caches[scope] = cache
 
-        await cache.set(key, value, pin=pin)
+        # Tracked before setting so that the entry is dropped if the policy evicts it straight away
+        size = self.sizes.set((scope, key), value)
+        self.accessed[(scope, key)] = time.monotonic()
+        await cache.set(key, value, pin=pin, size=size)
 
         return value
 
+    async def evict_expired(self) -> int:
+        """
+        Evict expired entries from the caches of every scope.
+
+        :return: The approximate number of bytes reclaimed.
+        """
+        reclaimed = 0
+        for scope, cache in list(self.caches.items()):
+            for key in await cache.evict_expired():
+                reclaimed += self._forget(scope, key)
+        return reclaimed
+
     async def clear(self):
         """
         Empty the store.
@@ -105,23 +194,34 @@ class CacheScopeStore(Generic[PolicyT]):
         for cache in self.caches.values():
             await cache.clear()
         self.caches = {}
+        self.sizes.clear()
+        self.accessed = {}
 
 
 class CacheStore:
     """
     Key-value store class which stores a separate CacheScopeStore per registry entry.
+
+    Optionally has a memory governor, which bounds the total size of the values stored across all registry stores.
     """
 
     def __init__(self):
         self.registry_stores: Dict[str, CacheScopeStore] = {}
+        self.registry_entries: Dict[str, CachedRegistryEntry] = {}
+        self.governor: Optional['MemoryGovernor'] = None
         # The size is not totally accurate as we only add/subtract values stored, without accounting for keys
         # or extra memory due to hash collisions, internal cache implementation; its a 'good enough' approximation
         # of just the values stored
         self._size = 0
 
-    def _update_size(self, prev_value: Any, new_value: Any):
-        previous_value_size = total_size(prev_value) if prev_value is not None else 0
-        self._size = self._size - previous_value_size + total_size(new_value)
+    def _resize(self, delta: int):
+        """
+        Update the size of the store by the change in size of one of its registry stores.
+
+        :param delta: The change in size.
+        """
+        self._size += delta
+        self._update_metrics()
 
     def _update_metrics(self):
         """
@@ -142,13 +242,7 @@ class CacheStore:
         if registry_store is None:
             return None
 
-        prev_entry = await registry_store.delete(key)
-
-        # Update size
-        self._update_size(prev_entry, None)
-        self._update_metrics()
-
-        return prev_entry
+        return await registry_store.delete(key)
 
     async def get(self, registry_entry: CachedRegistryEntry, key: str, unpin: bool = False) -> Optional[Any]:
         """
@@ -208,8 +302,9 @@ class CacheStore:
 
         # No store for this entry yet, create new
         if registry_store is None:
-            registry_store = CacheScopeStore(registry_entry.cache)
+            registry_store = CacheScopeStore(registry_entry.cache, self._resize)
             self.registry_stores[registry_entry.to_store_key()] = registry_store
+            self.registry_entries[registry_entry.to_store_key()] = registry_entry
 
         prev_value = await registry_store.get(key)
 
@@ -220,14 +315,45 @@ class CacheStore:
             else:
                 prev_value.resolve(value)
 
-        # Update size
-        self._update_size(prev_value, value)
-        self._update_metrics()
-
         await registry_store.set(key, value, pin=pin)
 
+        if self.governor is not None:
+            await self.governor.enforce()
+
         return value
 
+    async def evict_expired(self) -> int:
+        """
+        Evict expired entries across all registry stores and scopes, rather than waiting for the next access to
+        each of them.
+
+        :return: The approximate number of bytes reclaimed.
+        """
+        reclaimed = 0
+        for registry_store in list(self.registry_stores.values()):
+            reclaimed += await registry_store.evict_expired()
+
+        if reclaimed > 0:
+            CACHE_METRICS_TRACKER.record_reclaimed(reclaimed)
+
+        return reclaimed
+
+    async def sweep_expired(self, interval: float):
+        """
+        Periodically evict expired entries until cancelled.
+
+        :param interval: The number of seconds between sweeps.
+        """
+        while True:
+            await anyio.sleep(interval)
+
+            try:
+                reclaimed = await self.evict_expired()
+                if reclaimed > 0:
+                    eng_logger.debug(f'Cache sweeper reclaimed {reclaimed} bytes of expired entries')
+            except Exception as e:
+                eng_logger.error('Failed to evict expired cache entries', error=e)
+
     async def set_pending(self, registry_entry: CachedRegistryEntry, key: str):
         """
         Set a pending value for the given registry entry and cache key.
@@ -244,5 +370,6 @@ class CacheStore:
         for registry_store in self.registry_stores.values():
             await registry_store.clear()
         self.registry_stores = {}
+        self.registry_entries = {}
         self._size = 0
         self._update_metrics()
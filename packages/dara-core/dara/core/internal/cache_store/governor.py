@@ -0,0 +1,157 @@
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import anyio
+
+from dara.core.internal.cache_store.cache_store import CacheScopeStore
+from dara.core.internal.utils import CacheScope
+from dara.core.logging import dev_logger, eng_logger
+from dara.core.metrics import CACHE_METRICS_TRACKER, RUNTIME_METRICS_TRACKER
+
+if TYPE_CHECKING:
+    from dara.core.internal.cache_store.cache_store import CacheStore
+
+DEFAULT_MEMORY_FRACTION = 0.5
+"""Share of the cgroup memory limit used as the memory budget of the cache store by default"""
+
+EVICTION_TARGET = 0.9
+"""Share of the budget the governor evicts down to once over it, so that it does not evict on every write"""
+
+MIN_RECOMPUTE_COST = 0.05
+"""Minimum cost in seconds to recompute a value, assumed for values of derived variables without a recorded runtime"""
+
+
+class MemoryGovernor:
+    """
+    Process-wide memory budget for the values held in a CacheStore.
+
+    Each registry store only enforces its own cache policy, so the governor bounds their total. Once the estimated
+    size of the store exceeds the budget, values are evicted across all registry stores and scopes until the store is
+    back under `EVICTION_TARGET` of the budget.
+
+    Only values of registry entries which can be recomputed on demand (`CachedRegistryEntry.evictable`) are evicted,
+    and never while pinned or pending. Values are evicted by score, largest first: their size multiplied by the time
+    since they were last accessed, divided by the mean runtime of their derived variable recorded by
+    `RUNTIME_METRICS_TRACKER`. Large, stale values which are cheap to recompute go first.
+
+    If the values which cannot be evicted alone exceed the target, the governor does not evict anything and warns
+    instead. After a pass which could not bring the store under the target, it waits for the store to shrink or grow
+    by the margin between the budget and the target before trying again, rather than evicting on every write.
+    """
+
+    def __init__(self, store: 'CacheStore', budget: int):
+        """
+        :param store: the store to govern
+        :param budget: maximum estimated size in bytes of the values held in the store
+        """
+        if budget <= 0:
+            raise ValueError(f'Memory budget must be positive, got {budget}')
+
+        self.store = store
+        self.budget = budget
+        self.lock = anyio.Lock()
+        self._floor: Optional[int] = None
+        """Size of the store after the last pass which could not bring it under the target"""
+
+    def _get_evictable_size(self) -> int:
+        """
+        Get the total size of the values of registry entries which can be evicted, including pinned and pending ones
+        """
+        evictable_size = 0
+
+        for store_key, registry_store in self.store.registry_stores.items():
+            registry_entry = self.store.registry_entries.get(store_key)
+            if registry_entry is not None and registry_entry.evictable:
+                evictable_size += registry_store.sizes.size
+
+        return evictable_size
+
+    def _warn_over_budget(self, evictable_size: int):
+        """
+        Warn that the store cannot be brought under the target, once until it is back under budget
+        """
+        if self._floor is None:
+            dev_logger.warning(
+                'Cache store is over its memory budget but not enough values can be evicted to get back under it, '
+                'consider increasing DARA_CACHE_MEMORY_BUDGET',
+                {'size': self.store._size, 'evictable_size': evictable_size, 'budget': self.budget},
+            )
+        self._floor = self.store._size
+
+    def _get_candidates(self) -> List[Tuple[float, CacheScopeStore, Tuple[CacheScope, str]]]:
+        """
+        Get the entries which can be evicted with their score, highest score first.
+        """
+        runtimes = RUNTIME_METRICS_TRACKER.get_dv_mean_runtimes()
+        now = time.monotonic()
+        candidates = []
+
+        for store_key, registry_store in self.store.registry_stores.items():
+            registry_entry = self.store.registry_entries.get(store_key)
+            if registry_entry is None or not registry_entry.evictable:
+                continue
+
+            cost = max(runtimes.get(RUNTIME_METRICS_TRACKER.clean_name(registry_entry.uid), 0), MIN_RECOMPUTE_COST)
+
+            for entry_key, size in registry_store.sizes.sizes.items():
+                age = now - registry_store.accessed.get(entry_key, now)
+                candidates.append((size * (age + 1) / cost, registry_store, entry_key))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return candidates
+
+    async def enforce(self) -> int:
+        """
+        Evict values until the store is back under budget, if it is over it.
+
+        :return: The approximate number of bytes evicted.
+        """
+        if self.store._size <= self.budget:
+            self._floor = None
+            return 0
+
+        # Only one eviction pass at a time, values written while it runs count towards the size it evicts down to
+        if self.lock.locked():
+            return 0
+
+        target = self.budget * EVICTION_TARGET
+
+        # After a pass which could not get under the target, only try again once enough has been written since or
+        # values were removed
+        if self._floor is not None and 0 <= self.store._size - self._floor < self.budget - target:
+            return 0
+
+        # Values which cannot be evicted are over the target on their own, evicting the rest would not help
+        evictable_size = self._get_evictable_size()
+        if self.store._size - evictable_size > target:
+            self._warn_over_budget(evictable_size)
+            return 0
+
+        async with self.lock:
+            evicted = 0
+            evicted_bytes = 0
+
+            for _, registry_store, (scope, key) in self._get_candidates():
+                if self.store._size <= target:
+                    break
+
+                size = await registry_store.evict(scope, key)
+                if size > 0:
+                    evicted += 1
+                    evicted_bytes += size
+
+            if evicted > 0:
+                CACHE_METRICS_TRACKER.record_governor_evictions(evicted, evicted_bytes)
+                eng_logger.debug(
+                    'Memory governor',
+                    f'Evicted {evicted} cache entries',
+                    {'bytes': evicted_bytes, 'size': self.store._size, 'budget': self.budget},
+                )
+
+            # Whatever is left is pinned or pending
+            if self.store._size > target:
+                self._warn_over_budget(evictable_size - evicted_bytes)
+            else:
+                self._floor = None
+
+            return evicted_bytes
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import anyio
 
@@ -21,8 +21,8 @@ class KeepAllCache(CacheStoreImpl[KeepAllCachePolicy]):
     Keeps all items in the cache indefinitely.
     """
 
-    def __init__(self, policy: KeepAllCachePolicy):
-        super().__init__(policy)
+    def __init__(self, policy: KeepAllCachePolicy, on_evict: Optional[Callable[[str], None]] = None):
+        super().__init__(policy, on_evict)
         self.cache: Dict[str, Any] = {}
         self.lock = anyio.Lock()
 
@@ -42,6 +42,15 @@ class KeepAllCache(CacheStoreImpl[KeepAllCachePolicy]):
             del self.cache[key]
             return entry
 
+    def is_pinned(self, key: str) -> bool:
+        """
+        Check whether an entry is pinned.
+
+        :param key: The key of the entry to check.
+        """
+        entry = self.cache.get(key)
+        return entry is not None and entry.pin
+
     async def get(self, key: str, unpin: bool = False) -> Optional[Any]:
         """
         Retrieve a value from the cache.
@@ -61,13 +70,14 @@ class KeepAllCache(CacheStoreImpl[KeepAllCachePolicy]):
 
             return entry.value
 
-    async def set(self, key: str, value: Any, pin: bool = False) -> None:
+    async def set(self, key: str, value: Any, pin: bool = False, size: Optional[int] = None) -> None:
         """
         Add a key-value pair to the cache, or update the value of an existing key.
 
         :param key: The key to set.
         :param value: The value to associate with the key.
         :param pin: This parameter is ignored in KeepAllCache as entries are never evicted.
+        :param size: This parameter is ignored in KeepAllCache as entries are not sized.
         """
         async with self.lock:
             self.cache[key] = Entry(value, pin)
@@ -1,25 +1,28 @@
-from typing import Any, Dict, Optional
+import abc
+from typing import Any, Callable, Dict, Optional
 
 import anyio
 
 from dara.core.base_definitions import LruCachePolicy
-from dara.core.internal.cache_store.base_impl import CacheStoreImpl
+from dara.core.internal.cache_store.base_impl import CacheStoreImpl, PolicyT
 
 
 class Node:
     """A node in a doubly linked list."""
 
-    def __init__(self, key: str, value: Any, pin: bool = False):
+    def __init__(self, key: str, value: Any, pin: bool = False, size: int = 0):
         """
         Initialize a new node.
 
         :param key: The key associated with this node.
         :param value: The value associated with this node.
         :param pin: If true, the node will not be evicted until read.
+        :param size: The size of the value, for caches evicting by size.
         """
         self.key = key
         self.value = value
         self.pin = pin
+        self.size = size
         self.prev: Optional[Node] = None
         self.next: Optional[Node] = None
 
@@ -27,31 +30,60 @@ class Node:
         return f'Node({self.key}, {self.value}, {self.pin})'
 
 
-class LRUCache(CacheStoreImpl[LruCachePolicy]):
+class BaseLRUCache(CacheStoreImpl[PolicyT]):
     """
-    A Least Recently Used (LRU) Cache.
-    Evicts the least recently used items first.
+    Base for caches evicting the least recently used items first once full.
+    Subclasses define when the cache is full.
+
+    Pinned entries are kept out of the eviction order until they are unpinned, so evicting an entry never has to
+    skip over them.
     """
 
-    def __init__(self, policy: LruCachePolicy):
-        super().__init__(policy)
+    def __init__(self, policy: PolicyT, on_evict: Optional[Callable[[str], None]] = None):
+        super().__init__(policy, on_evict)
         self.cache: Dict[str, Node] = {}
         self.head: Optional[Node] = None  # No sentinel, can be None
         self.tail: Optional[Node] = None  # No sentinel, can be None
+        self.size = 0
         self.lock = anyio.Lock()
 
-    def _move_to_front(self, node: Node):
+    @abc.abstractmethod
+    def _is_full(self) -> bool:
+        """
+        Whether the cache holds more than its policy allows, so entries should be evicted.
         """
-        Move the given node to the front of the list, indicating it was recently accessed.
 
-        :param node: The node to move to the front.
+    def _get_size(self, value: Any) -> int:
+        """
+        Get the size of a value, counted towards the size of the cache.
+
+        :param value: The value to size.
+        """
+        return 0
+
+    def _unlink(self, node: Node):
+        """
+        Remove the given node from the list.
+
+        :param node: The node to remove.
         """
         if node.prev:
             node.prev.next = node.next
         if node.next:
             node.next.prev = node.prev
+        if self.head == node:
+            self.head = node.next
         if self.tail == node:
             self.tail = node.prev
+        node.prev = None
+        node.next = None
+
+    def _push_front(self, node: Node):
+        """
+        Add the given node to the front of the list, indicating it was recently accessed.
+
+        :param node: The node to add.
+        """
         node.next = self.head
         node.prev = None
         if self.head:
@@ -60,6 +92,29 @@ class LRUCache(CacheStoreImpl[LruCachePolicy]):
         if not self.tail:
             self.tail = node
 
+    def _move_to_front(self, node: Node):
+        """
+        Move the given node to the front of the list, indicating it was recently accessed.
+
+        :param node: The node to move to the front.
+        """
+        self._unlink(node)
+        self._push_front(node)
+
+    def _set_pin(self, node: Node, pin: bool):
+        """
+        Pin or unpin the given node, taking it out of or putting it back into the eviction order.
+
+        :param node: The node to update.
+        :param pin: If true, the node will not be evicted until read.
+        """
+        if pin and not node.pin:
+            self._unlink(node)
+        elif not pin and node.pin:
+            self._push_front(node)
+
+        node.pin = pin
+
     async def delete(self, key: str) -> Any:
         """
         Delete an entry from the cache.
@@ -75,19 +130,22 @@ class LRUCache(CacheStoreImpl[LruCachePolicy]):
                 return None  # Entry is pinned, do not delete
 
             # Delete from the doubly linked list
-            if node.prev:
-                node.prev.next = node.next
-            if node.next:
-                node.next.prev = node.prev
-            if self.head == node:
-                self.head = node.next
-            if self.tail == node:
-                self.tail = node.prev
+            self._unlink(node)
 
             # Delete from the dictionary
             del self.cache[key]
+            self.size -= node.size
             return node.value
 
+    def is_pinned(self, key: str) -> bool:
+        """
+        Check whether an entry is pinned.
+
+        :param key: The key of the entry to check.
+        """
+        node = self.cache.get(key)
+        return node is not None and node.pin
+
     async def get(self, key: str, unpin: bool = False) -> Optional[Any]:
         """
         Retrieve a value from the cache.
@@ -99,53 +157,51 @@ class LRUCache(CacheStoreImpl[LruCachePolicy]):
         async with self.lock:
             node = self.cache.get(key)
             if node:
-                if unpin:
-                    node.pin = False
-                self._move_to_front(node)
+                if node.pin:
+                    if unpin:
+                        self._set_pin(node, False)
+                else:
+                    self._move_to_front(node)
                 return node.value
         return None
 
-    async def set(self, key: str, value: Any, pin: bool = False) -> None:
+    async def set(self, key: str, value: Any, pin: bool = False, size: Optional[int] = None) -> None:
         """
         Add a key-value pair to the cache, or update the value of an existing key.
-        If the cache is full, evict the least recently used item.
+        If the cache is full, evict the least recently used items.
 
         :param key: The key to set.
         :param value: The value to associate with the key.
         :param pin: If true, the entry will not be evicted until read.
+        :param size: Optional estimated size of the value, sized with `_get_size` if not provided.
         """
+        if size is None:
+            size = self._get_size(value)
+
         async with self.lock:
             if key in self.cache:
                 node = self.cache[key]
                 node.value = value
-                node.pin = pin
-                self._move_to_front(node)
+                self.size += size - node.size
+                node.size = size
+                if node.pin == pin and not pin:
+                    self._move_to_front(node)
+                else:
+                    self._set_pin(node, pin)
             else:
-                node = Node(key, value, pin)
+                node = Node(key, value, pin, size)
                 self.cache[key] = node
-                if self.head:
-                    self.head.prev = node
-                node.next = self.head
-                self.head = node
-                if not self.tail:
-                    self.tail = node
-
-                # Check and perform eviction
-                while len(self.cache) > self.policy.max_size:
-                    evict_node: Optional[Node] = self.tail
-
-                    # Skip over pinned nodes
-                    while evict_node and evict_node.pin:
-                        evict_node = evict_node.prev
-
-                    if evict_node:
-                        self.tail = evict_node.prev
-                        if self.tail:
-                            self.tail.next = None
-                        del self.cache[evict_node.key]
-                    else:
-                        # all nodes are pinned, can't evict
-                        break
+                self.size += node.size
+                if not pin:
+                    self._push_front(node)
+
+            # Check and perform eviction, pinned nodes are not in the list so the tail can always be evicted
+            while self._is_full() and self.tail:
+                evict_node = self.tail
+                self._unlink(evict_node)
+                del self.cache[evict_node.key]
+                self.size -= evict_node.size
+                self._evicted(evict_node.key)
 
     async def clear(self):
         """
@@ -155,3 +211,14 @@ class LRUCache(CacheStoreImpl[LruCachePolicy]):
             self.cache = {}
             self.head = None
             self.tail = None
+            self.size = 0
+
+
+class LRUCache(BaseLRUCache[LruCachePolicy]):
+    """
+    A Least Recently Used (LRU) Cache.
+    Evicts the least recently used items first once it holds more than `max_size` items.
+    """
+
+    def _is_full(self) -> bool:
+        return len(self.cache) > self.policy.max_size
@@ -0,0 +1,18 @@
+from typing import Any
+
+from dara.core.base_definitions import MaxBytesCachePolicy
+from dara.core.internal.cache_store.lru import BaseLRUCache
+from dara.core.metrics import estimate_size
+
+
+class MaxBytesCache(BaseLRUCache[MaxBytesCachePolicy]):
+    """
+    A size-aware Least Recently Used Cache.
+    Evicts the least recently used items first once the estimated size of its items exceeds `max_bytes`.
+    """
+
+    def _get_size(self, value: Any) -> int:
+        return estimate_size(value)
+
+    def _is_full(self) -> bool:
+        return self.size > self.policy.max_bytes
@@ -1,6 +1,6 @@
 import heapq
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import anyio
 
@@ -26,6 +26,10 @@ class Node:
         self.pin = pin
 
 
+MIN_TOMBSTONES_TO_COMPACT = 64
+"""Minimum number of stale heap records before the expiration heap is compacted"""
+
+
 class TTLCache(CacheStoreImpl[TTLCachePolicy]):
     """
     A Time-to-Live (TTL) Cache implementation that evicts entries after a specified duration.
@@ -34,23 +38,87 @@ class TTLCache(CacheStoreImpl[TTLCachePolicy]):
     The heap ensures that the soonest-to-expire entry is always at the top, enabling quick eviction of expired entries.
     On each set or get operation, the cache checks and evicts expired entries based on the TTL policy.
     Pinned entries are not evicted until they are unpinned, regardless of their TTL.
+
+    Deleting, overwriting or pinning an entry leaves its heap record behind as a tombstone rather than rebuilding
+    the heap. Tombstones are skipped when they reach the top of the heap, and the heap is compacted once they make up
+    more than half of it.
     """
 
-    def __init__(self, policy: TTLCachePolicy):
-        super().__init__(policy)
+    def __init__(self, policy: TTLCachePolicy, on_evict: Optional[Callable[[str], None]] = None):
+        super().__init__(policy, on_evict)
         self.pinned_cache: Dict[str, Node] = {}
         self.unpinned_cache: Dict[str, Node] = {}
         self.expiration_heap: List[Tuple[float, str]] = []  # Stores (expiration_time, key) for unpinned items
+        self.tombstones = 0  # Number of heap records no longer matching an unpinned entry
         self.lock = anyio.Lock()
 
-    async def _cleanup(self):
+    def _is_live(self, expiration_time: float, key: str) -> bool:
+        """
+        Check whether a heap record belongs to the current unpinned entry for its key.
+
+        :param expiration_time: The expiration time of the heap record.
+        :param key: The key of the heap record.
+        """
+        node = self.unpinned_cache.get(key)
+        return node is not None and node.expiration_time == expiration_time
+
+    def _remove_unpinned(self, key: str) -> Optional[Node]:
+        """
+        Remove an unpinned entry, leaving its heap record behind as a tombstone.
+
+        :param key: The key of the entry to remove.
+        """
+        node = self.unpinned_cache.pop(key, None)
+
+        if node is not None:
+            self.tombstones += 1
+
+            # Compact the heap once most of it is tombstones so it does not grow unbounded
+            if self.tombstones > MIN_TOMBSTONES_TO_COMPACT and self.tombstones * 2 > len(self.expiration_heap):
+                self.expiration_heap = [(t, k) for t, k in self.expiration_heap if self._is_live(t, k)]
+                heapq.heapify(self.expiration_heap)
+                self.tombstones = 0
+
+        return node
+
+    async def _cleanup(self, notify: bool = True) -> List[str]:
         """
         Evict expired entries from the cache, unless they are pinned.
+
+        :param notify: If true, the eviction callback is invoked for each entry evicted.
+        :return: The keys of the entries evicted.
         """
+        evicted = []
         now = time.time()
         while self.expiration_heap and self.expiration_heap[0][0] <= now:
-            _, key = heapq.heappop(self.expiration_heap)
-            self.unpinned_cache.pop(key, None)
+            expiration_time, key = heapq.heappop(self.expiration_heap)
+
+            if self._is_live(expiration_time, key):
+                self.unpinned_cache.pop(key)
+                evicted.append(key)
+                if notify:
+                    self._evicted(key)
+            else:
+                self.tombstones = max(self.tombstones - 1, 0)
+
+        return evicted
+
+    async def evict_expired(self) -> List[str]:
+        """
+        Evict expired entries from the cache, unless they are pinned.
+
+        :return: The keys of the entries evicted.
+        """
+        async with self.lock:
+            return await self._cleanup(notify=False)
+
+    def is_pinned(self, key: str) -> bool:
+        """
+        Check whether an entry is pinned.
+
+        :param key: The key of the entry to check.
+        """
+        return key in self.pinned_cache
 
     async def get(self, key: str, unpin: bool = False) -> Any:
         """
@@ -77,28 +145,32 @@ class TTLCache(CacheStoreImpl[TTLCachePolicy]):
 
             return None
 
-    async def set(self, key: str, value: Any, pin: bool = False) -> None:
+    async def set(self, key: str, value: Any, pin: bool = False, size: Optional[int] = None) -> None:
         """
         Add a key-value pair to the cache, or update the value of an existing key.
 
         :param key: The key to set.
         :param value: The value to associate with the key.
         :param pin: If true, the entry will not be evicted until read.
+        :param size: This parameter is ignored in TTLCache as entries are not sized.
         """
         async with self.lock:
             await self._cleanup()
 
             expiration_time = time.time() + self.policy.ttl
             node = Node(value, expiration_time, pin)
+
+            # Any previous unpinned entry for the key is replaced, its heap record becomes a tombstone
+            self._remove_unpinned(key)
+
             if pin:
                 self.pinned_cache[key] = node
-                self.unpinned_cache.pop(key, None)  # Ensure the key is removed from unpinned cache if it exists
             else:
                 self.unpinned_cache[key] = node
                 heapq.heappush(self.expiration_heap, (expiration_time, key))
                 self.pinned_cache.pop(key, None)  # Ensure the key is removed from pinned cache if it exists
 
-    async def delete(self, key: str) -> None:
+    async def delete(self, key: str) -> Any:
         """
         Delete a key-value pair from the cache, if it exists.
 
@@ -107,10 +179,8 @@ class TTLCache(CacheStoreImpl[TTLCachePolicy]):
         async with self.lock:
             await self._cleanup()
 
-            if key in self.unpinned_cache:
-                node = self.unpinned_cache.pop(key)
-                self.expiration_heap = [(t, k) for t, k in self.expiration_heap if k != key]
-                heapq.heapify(self.expiration_heap)
+            node = self._remove_unpinned(key)
+            if node is not None:
                 return node.value
             elif key in self.pinned_cache:
                 node = self.pinned_cache.pop(key)
@@ -124,3 +194,4 @@ class TTLCache(CacheStoreImpl[TTLCachePolicy]):
             self.pinned_cache = {}
             self.unpinned_cache = {}
             self.expiration_heap = []
+            self.tombstones = 0
@@ -19,6 +19,7 @@ from __future__ import annotations
 
 import os
 import sys
+from typing import Optional
 
 from dara.core.logging import dev_logger, eng_logger
 
@@ -26,6 +27,7 @@ CGROUP_V2_INDICATOR_PATH = '/sys/fs/cgroup/cgroup.controllers'   # Used to deter
 
 CGROUP_V1_MEM_PATH = '/sys/fs/cgroup/memory/memory.limit_in_bytes'
 CGROUP_V2_MEM_PATH = '/sys/fs/cgroup/memory.max'
+CGROUP_V1_NO_MEM_LIMIT = 2**62   # cgroupv1 reports no limit as a page-aligned value close to 2^63
 
 CGROUP_V1_CPU_QUOTA_PATH = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
 CGROUP_V1_CPU_PERIOD_PATH = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
@@ -46,25 +48,40 @@ def set_memory_limit():
     # Get current limits
     soft, hard = resource.getrlimit(resource.RLIMIT_AS)
 
+    limit = get_memory_limit()
+    if limit is not None:
+        soft = limit
+        hard = limit
+
+    eng_logger.debug(f'Setting memory limit to {soft}')
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def get_memory_limit() -> Optional[int]:
+    """
+    Get the memory limit defined in the cgroup, in bytes.
+    Works with both cgroupv1 and cgroupv2.
+
+    :return: The memory limit, or None if no limit is set or it could not be read.
+    """
     path = CGROUP_V1_MEM_PATH
 
     # Use cgroupv2 if it's available
     if os.path.isfile(CGROUP_V2_INDICATOR_PATH):
         path = CGROUP_V2_MEM_PATH
 
-    if os.path.isfile(path):
-        eng_logger.debug(f'Found cgroup memory limit configuration at "{path}"')
-        with open(path, encoding='utf-8') as limit:
-            try:
-                new_limit = int(limit.read())
-                soft = new_limit
-                hard = new_limit
-            except BaseException:
-                # Failed to read the limit (i.e. limit was a string 'max'), don't set it
-                pass
+    try:
+        with open(path, encoding='utf-8') as f:
+            limit = int(f.read())
+    except (OSError, ValueError):
+        # Missing configuration or no limit set (i.e. limit was a string 'max')
+        return None
 
-    eng_logger.debug(f'Setting memory limit to {soft}')
-    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    if limit >= CGROUP_V1_NO_MEM_LIMIT:
+        return None
+
+    eng_logger.debug(f'Found cgroup memory limit configuration at "{path}"')
+    return limit
 
 
 def get_cpu_count():
@@ -15,22 +15,37 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from typing import Optional, TypeVar
+import io
+from typing import Iterator, Optional, TypeVar
 
+import pyarrow
+import pyarrow.ipc
 from pandas import DataFrame
 
 INDEX = '__index__'
 
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+"""Media type of the Arrow IPC streaming format, used to negotiate binary DataFrame responses"""
+
+ARROW_EXTENSIONS = ('.feather', '.arrow')
+"""Extensions of datasets stored in the Arrow IPC (Feather) format, other datasets are stored as Parquet"""
+
+ARROW_BATCH_SIZE = 64 * 1024
+"""Maximum number of rows written per Arrow record batch"""
+
 
 def append_index(df: Optional[DataFrame]) -> Optional[DataFrame]:
     """
     Add a numerical index column to the dataframe
+
+    The column is added to a shallow copy, so the returned frame shares the column data of `df`
+    rather than duplicating it, e.g. when `df` is memory-mapped from disk.
     """
     if df is None:
         return None
 
     if INDEX not in df.columns:
-        new_df = df.copy()
+        new_df = df.copy(deep=False)
         new_df.insert(0, INDEX, range(0, len(df.index)))
         return new_df
 
@@ -54,3 +69,59 @@ def remove_index(value: value_type) -> value_type:
 
 def df_to_json(df: DataFrame) -> str:
     return df.to_json(orient='records')
+
+
+def df_to_arrow(df: DataFrame) -> pyarrow.Table:
+    """
+    Convert a DataFrame to an Arrow table, dropping the pandas index.
+
+    Raises pyarrow.ArrowException if a column cannot be represented in Arrow (i.e. mixed object columns),
+    callers should fall back to `df_to_json` in that case.
+
+    Timestamps and durations are cast to milliseconds, the unit `df_to_json` serializes them in, so that clients read
+    the same values from either format.
+    """
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+
+    fields = []
+    for field in table.schema:
+        if pyarrow.types.is_timestamp(field.type) and field.type.unit != 'ms':
+            field = field.with_type(pyarrow.timestamp('ms', tz=field.type.tz))
+        elif pyarrow.types.is_duration(field.type) and field.type.unit != 'ms':
+            field = field.with_type(pyarrow.duration('ms'))
+        fields.append(field)
+
+    schema = pyarrow.schema(fields, metadata=table.schema.metadata)
+    if schema.equals(table.schema):
+        return table
+
+    # Sub-millisecond precision is truncated, as it is in JSON
+    return table.cast(schema, safe=False)
+
+
+def arrow_to_ipc_stream(table: pyarrow.Table, batch_size: int = ARROW_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Serialize an Arrow table into the Arrow IPC streaming format, yielding one chunk per record batch
+    so the response can be streamed without buffering the whole payload.
+
+    :param table: table to serialize
+    :param batch_size: maximum number of rows per record batch
+    """
+    sink = io.BytesIO()
+
+    def _flush() -> bytes:
+        chunk = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return chunk
+
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        # Schema message
+        yield _flush()
+
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_batch(batch)
+            yield _flush()
+
+    # End-of-stream marker written on close
+    yield _flush()
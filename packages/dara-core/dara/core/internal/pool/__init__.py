@@ -15,6 +15,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from dara.core.internal.pool.definitions import TaskPriority
 from dara.core.internal.pool.task_pool import TaskPool
 
-__all__ = ['TaskPool']
+__all__ = ['TaskPool', 'TaskPriority']
@@ -20,15 +20,18 @@ from __future__ import annotations
 import os
 from multiprocessing import Queue, get_context
 from queue import Empty
-from typing import Optional
+from typing import List, Optional, Union
 
 from dara.core.internal.pool.definitions import (
     Acknowledgement,
+    Batch,
     Initialization,
     Log,
+    PartialResult,
     Problem,
     Progress,
     Result,
+    Retirement,
     SubprocessException,
     TaskDefinition,
     WorkerMessage,
@@ -67,6 +70,26 @@ class _PoolAPI:
         except Empty:
             return None
 
+    def get_worker_messages(self, timeout: Optional[float] = None) -> List[WorkerMessage]:
+        """
+        Retrieve all worker messages currently available, waiting for the first one to arrive
+
+        Blocks for up to `timeout` seconds, returns an empty list if no message arrived in that time
+
+        :param timeout: optional number of seconds to wait for a message, waits indefinitely if not specified
+        """
+        try:
+            messages = [self._out_queue.get(timeout=timeout)]
+        except Empty:
+            return []
+
+        # Drain everything else that is already pending so it can be processed in one go
+        while True:
+            try:
+                messages.append(self._out_queue.get_nowait())
+            except Empty:
+                return messages
+
 
 class _WorkerAPI:
     """
@@ -91,6 +114,22 @@ class _WorkerAPI:
         """
         self._out_queue.put(Acknowledgement(task_uid=task_uid, worker_pid=os.getpid()))
 
+    def send_batch(self, messages: List[Union[Log, Progress]]):
+        """
+        Send logs and progress updates to the pool in a single envelope
+
+        :param messages: messages to send
+        """
+        self._out_queue.put(Batch(messages=messages))
+
+    def retire(self, reason: str):
+        """
+        Notify the pool that the worker is exiting after reaching one of its limits
+
+        :param reason: limit which was reached
+        """
+        self._out_queue.put(Retirement(worker_pid=os.getpid(), reason=reason))
+
     def send_result(self, task_uid: str, result: SharedMemoryPointer):
         """
         Send a result of a given task
@@ -100,6 +139,15 @@ class _WorkerAPI:
         """
         self._out_queue.put(Result(task_uid=task_uid, result=result))
 
+    def send_partial_result(self, task_uid: str, partial: SharedMemoryPointer):
+        """
+        Send a partial result of a given task, yielded before the task finished
+
+        :param task_uid: uid of the task to send partial result for
+        :param partial: pointer to shared memory storing the partial result
+        """
+        self._out_queue.put(PartialResult(task_uid=task_uid, partial=partial))
+
     def send_error(self, task_uid: Optional[str], error: BaseException):
         """
         Send an error back to the pool
@@ -131,17 +179,29 @@ class _WorkerAPI:
         """
         self._out_queue.put(Progress(task_uid=task_uid, progress=progress, message=message))
 
-    def get_task(self) -> Optional[WorkerTask]:
+    def get_task(self, timeout: Optional[float] = None) -> Optional[WorkerTask]:
         """
         Retrieve a task definition from the worker queue if there is one available
 
-        Does not block, returns None if no message available
+        Returns None if no message available
+
+        :param timeout: optional number of seconds to wait for a task, does not block if not specified
         """
         try:
-            return self._task_queue.get_nowait()
+            if timeout is None:
+                return self._task_queue.get_nowait()
+            return self._task_queue.get(timeout=timeout)
         except Empty:
             return None
 
+    def return_task(self, task: WorkerTask):
+        """
+        Put a task retrieved from the worker queue back so another worker can pick it up
+
+        :param task: task to return
+        """
+        self._task_queue.put(task)
+
 
 class Channel:
     """
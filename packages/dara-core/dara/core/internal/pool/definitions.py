@@ -17,10 +17,10 @@ limitations under the License.
 
 from datetime import datetime
 from enum import Enum
-from typing import Any, Optional, Union
+from typing import Any, List, Optional, Union
 
 from anyio import Event
-from typing_extensions import TypedDict, TypeGuard
+from typing_extensions import NotRequired, TypedDict, TypeGuard
 
 from dara.core.internal.pool.utils import SharedMemoryPointer, SubprocessException
 
@@ -29,7 +29,10 @@ WORKER_NAME = 'task_pool_worker'
 
 class WorkerParameters(TypedDict):
     task_module: str
-    # TODO: max_jobs
+    max_tasks: NotRequired[Optional[int]]
+    """Number of tasks after which the worker retires"""
+    max_rss: NotRequired[Optional[int]]
+    """Peak resident set size in bytes above which the worker retires once its current task is done"""
 
 
 class PoolStatus(Enum):
@@ -60,10 +63,20 @@ class WorkerStatus(Enum):
     """ Worker executing a job"""
 
 
+class TaskPriority(Enum):
+    INTERACTIVE = 'interactive'
+    """ Task a user is waiting on, picked up before any background task"""
+
+    BACKGROUND = 'background'
+    """ Task no user is actively waiting on"""
+
+
 class TaskPayload(TypedDict):
     function_name: str
     args: tuple
     kwargs: dict
+    map: NotRequired[bool]
+    """Whether args is a chunk of items to call the function with one at a time, returning a list of results"""
 
 
 class TaskDefinition:
@@ -75,7 +88,13 @@ class TaskDefinition:
     event: Event
     result: Any
     payload: TaskPayload
+    priority: TaskPriority
+    user: Optional[str]
+    """Identity of the user or session the task is run for"""
     worker_id: Optional[int] = None
+    submitted_at: datetime
+    dispatched_at: Optional[datetime] = None
+    """When the task was sent to the workers, None while it is waiting for a free worker"""
     started_at: Optional[datetime] = None
     """TODO: can be used for task timeout or metrics/visibility"""
 
@@ -85,11 +104,16 @@ class TaskDefinition:
         payload: TaskPayload,
         worker_id: Optional[int] = None,
         started_at: Optional[datetime] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
+        user: Optional[str] = None,
     ):
         self.uid = uid
         self.payload = payload
         self.worker_id = worker_id
         self.started_at = started_at
+        self.priority = priority
+        self.user = user
+        self.submitted_at = datetime.now()
         self.event = Event()
 
     def __await__(self):
@@ -132,6 +156,14 @@ class Result(TypedDict):
     """Pointer to shared memory storing result"""
 
 
+class PartialResult(TypedDict):
+    """Sent when a task yields a partial result before it finishes"""
+
+    task_uid: str
+    partial: SharedMemoryPointer
+    """Pointer to shared memory storing the partial result"""
+
+
 class Problem(TypedDict):
     """Sent when a worker encounters an issue processing a task"""
 
@@ -154,7 +186,20 @@ class Progress(TypedDict):
     message: str
 
 
-WorkerMessage = Union[Acknowledgement, Result, Problem, Initialization, Log, Progress]
+class Batch(TypedDict):
+    """Envelope of logs and progress updates buffered by a worker, sent together to reduce the number of messages"""
+
+    messages: List[Union[Log, Progress]]
+
+
+class Retirement(TypedDict):
+    """Sent when a worker exits after reaching its task or memory limit"""
+
+    worker_pid: int
+    reason: str
+
+
+WorkerMessage = Union[Acknowledgement, Result, PartialResult, Problem, Initialization, Log, Progress, Batch, Retirement]
 """Union of possible messages sent from worker processes"""
 
 
@@ -166,6 +211,10 @@ def is_result(worker_msg: WorkerMessage) -> TypeGuard[Result]:
     return isinstance(worker_msg, dict) and 'result' in worker_msg and 'task_uid' in worker_msg
 
 
+def is_partial_result(worker_msg: WorkerMessage) -> TypeGuard[PartialResult]:
+    return isinstance(worker_msg, dict) and 'partial' in worker_msg and 'task_uid' in worker_msg
+
+
 def is_problem(worker_msg: WorkerMessage) -> TypeGuard[Problem]:
     return isinstance(worker_msg, dict) and 'error' in worker_msg and 'task_uid' in worker_msg
 
@@ -185,3 +234,11 @@ def is_progress(worker_msg: WorkerMessage) -> TypeGuard[Progress]:
         and 'task_uid' in worker_msg
         and 'message' in worker_msg
     )
+
+
+def is_retirement(worker_msg: WorkerMessage) -> TypeGuard[Retirement]:
+    return isinstance(worker_msg, dict) and 'worker_pid' in worker_msg and 'reason' in worker_msg
+
+
+def is_batch(worker_msg: WorkerMessage) -> TypeGuard[Batch]:
+    return isinstance(worker_msg, dict) and 'messages' in worker_msg
@@ -0,0 +1,133 @@
+"""
+Copyright 2023 Impulse Innovations Limited
+
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Mapping, Optional
+
+from dara.core.internal.pool.definitions import TaskDefinition, TaskPriority
+from dara.core.metrics import POOL_METRICS_TRACKER
+
+
+class TaskScheduler:
+    """
+    Holds tasks submitted to the pool until a worker is free to run them
+
+    Tasks are picked by priority first. Within a priority, users take turns in round-robin order so a user
+    submitting many tasks does not hold up the tasks of other users. Users can also be limited to a number
+    of concurrent tasks, tasks not associated with any user are not limited.
+    """
+
+    def __init__(self, max_tasks_per_user: Optional[int] = None):
+        """
+        :param max_tasks_per_user: optional number of tasks a single user can have running at once
+        """
+        self.max_tasks_per_user = max_tasks_per_user
+        self._queues: Dict[TaskPriority, 'OrderedDict[Optional[str], Deque[TaskDefinition]]'] = {
+            priority: OrderedDict() for priority in TaskPriority
+        }
+
+    def __len__(self) -> int:
+        return sum(self.depth(priority) for priority in TaskPriority)
+
+    def depth(self, priority: TaskPriority) -> int:
+        """
+        Get the number of tasks waiting with a given priority
+
+        :param priority: priority to get the number of tasks for
+        """
+        return sum(len(user_queue) for user_queue in self._queues[priority].values())
+
+    def push(self, task: TaskDefinition):
+        """
+        Add a task to the back of its user's queue
+
+        :param task: task to schedule
+        """
+        queue = self._queues[task.priority]
+
+        # New users join the end of the round
+        if task.user not in queue:
+            queue[task.user] = deque()
+
+        queue[task.user].append(task)
+        self._update_depth(task.priority)
+
+    def remove(self, task: TaskDefinition) -> bool:
+        """
+        Remove a task which has not been picked yet
+
+        :param task: task to remove
+        :return: whether the task was waiting to be picked
+        """
+        queue = self._queues[task.priority]
+        user_queue = queue.get(task.user)
+
+        if user_queue is None or task not in user_queue:
+            return False
+
+        user_queue.remove(task)
+        if len(user_queue) == 0:
+            del queue[task.user]
+
+        self._update_depth(task.priority)
+        return True
+
+    def pop(self, running_tasks_per_user: Mapping[Optional[str], int]) -> Optional[TaskDefinition]:
+        """
+        Pick the next task to run
+
+        :param running_tasks_per_user: number of tasks currently running for each user
+        :return: the next task to run, or None if there are no tasks which can run at this time
+        """
+        for priority, queue in self._queues.items():
+            for user, user_queue in queue.items():
+                if (
+                    self.max_tasks_per_user is not None
+                    and user is not None
+                    and running_tasks_per_user.get(user, 0) >= self.max_tasks_per_user
+                ):
+                    continue
+
+                task = user_queue.popleft()
+
+                # The user had their turn, move them to the end of the round
+                if len(user_queue) == 0:
+                    del queue[user]
+                else:
+                    queue.move_to_end(user)
+
+                self._update_depth(priority)
+                return task
+
+        return None
+
+    def clear(self) -> List[TaskDefinition]:
+        """
+        Remove all the tasks waiting to be picked
+
+        :return: the removed tasks
+        """
+        tasks = [task for queue in self._queues.values() for user_queue in queue.values() for task in user_queue]
+
+        for priority, queue in self._queues.items():
+            queue.clear()
+            self._update_depth(priority)
+
+        return tasks
+
+    def _update_depth(self, priority: TaskPriority):
+        POOL_METRICS_TRACKER.update_queue_depth(priority.value, self.depth(priority))
@@ -16,10 +16,12 @@ limitations under the License.
 """
 
 import atexit
+import math
+from collections import Counter
 from contextlib import contextmanager
 from datetime import datetime
 from multiprocessing import active_children
-from typing import Any, Callable, Coroutine, Dict, Optional, cast
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Optional, cast
 
 import anyio
 from anyio.abc import TaskGroup
@@ -30,15 +32,21 @@ from dara.core.internal.pool.definitions import (
     PoolStatus,
     TaskDefinition,
     TaskPayload,
+    TaskPriority,
+    WorkerMessage,
     WorkerParameters,
     WorkerStatus,
     is_acknowledgement,
+    is_batch,
     is_initialization,
     is_log,
+    is_partial_result,
     is_problem,
     is_progress,
     is_result,
+    is_retirement,
 )
+from dara.core.internal.pool.scheduling import TaskScheduler
 from dara.core.internal.pool.utils import (
     SubprocessException,
     read_from_shared_memory,
@@ -46,8 +54,15 @@ from dara.core.internal.pool.utils import (
     stop_process_async,
     wait_while,
 )
-from dara.core.internal.pool.worker import WorkerProcess
+from dara.core.internal.pool.worker import WorkerProcess, get_worker_context
 from dara.core.logging import dev_logger
+from dara.core.metrics import POOL_METRICS_TRACKER
+
+POOL_WAIT_INTERVAL = 0.1
+"""Maximum number of seconds the pool waits for worker messages before checking on the workers"""
+
+MAP_CHUNKS_PER_WORKER = 4
+"""Number of chunks per worker items of a map are split into by default"""
 
 
 class TaskPool:
@@ -56,6 +71,8 @@ class TaskPool:
     task_group: TaskGroup
     status: PoolStatus
     max_workers: int
+    min_idle_workers: int
+    """Number of idle workers kept ready to pick up new tasks straight away"""
     worker_timeout: float
     """Number of seconds worker is allowed to be idle before it is killed, if there are too many workers alive"""
 
@@ -64,17 +81,48 @@ class TaskPool:
     tasks: Dict[str, TaskDefinition] = {}
 
     def __init__(
-        self, task_group: TaskGroup, worker_parameters: WorkerParameters, max_workers: int, worker_timeout: float = 5
+        self,
+        task_group: TaskGroup,
+        worker_parameters: WorkerParameters,
+        max_workers: int,
+        worker_timeout: float = 5,
+        min_idle_workers: int = 1,
+        max_tasks_per_worker: Optional[int] = None,
+        max_worker_rss: Optional[int] = None,
+        max_tasks_per_user: Optional[int] = None,
     ):
+        """
+        :param task_group: task group to run the pool loop in
+        :param worker_parameters: parameters to start the workers with
+        :param max_workers: maximum number of workers
+        :param worker_timeout: number of seconds an idle worker is kept alive while there are more workers than desired
+        :param min_idle_workers: number of idle workers to keep ready to pick up new tasks
+        :param max_tasks_per_worker: optional number of tasks after which a worker is replaced with a new one
+        :param max_worker_rss: optional peak memory of a worker in bytes, after which it is replaced
+            with a new one once it finishes its current task
+        :param max_tasks_per_user: optional number of tasks a single user can have running at once
+        """
+        if min_idle_workers < 1:
+            raise ValueError(f'min_idle_workers must be at least 1, got {min_idle_workers}')
+
         self.task_group = task_group
         self.status = PoolStatus.CREATED
         self.loop_stopped = anyio.Event()
         self.max_workers = max_workers
-        self.worker_parameters = worker_parameters
+        self.min_idle_workers = min_idle_workers
+        self.worker_parameters = {
+            **worker_parameters,
+            'max_tasks': max_tasks_per_worker,
+            'max_rss': max_worker_rss,
+        }
         self.worker_timeout = worker_timeout
 
         self._channel = Channel()
+        self._scheduler = TaskScheduler(max_tasks_per_user)
+        self._worker_context = get_worker_context(worker_parameters)
         self._progress_subscribers: Dict[str, Callable[[float, str], Coroutine]] = {}
+        self._partial_result_subscribers: Dict[str, Callable[[Any], Coroutine]] = {}
+        self._map_chunks: Dict[str, List[TaskDefinition]] = {}
 
     @property
     def running_tasks(self):
@@ -88,8 +136,11 @@ class TaskPool:
     def desired_workers(self):
         """
         Get the desired number of workers based on the current workload
+
+        Includes a worker for each task submitted, so a burst of tasks starts its workers at once,
+        on top of `min_idle_workers` kept ready for new tasks
         """
-        return min(len(self.running_tasks) + 1, self.max_workers)
+        return min(len(self.tasks) + self.min_idle_workers, self.max_workers)
 
     async def start(self, timeout: float = 5):
         """
@@ -111,14 +162,26 @@ class TaskPool:
         else:
             raise RuntimeError('Pool already started')
 
-    def submit(self, task_uid: str, function_name: str, args: tuple = (), kwargs: dict = {}) -> TaskDefinition:
+    def submit(
+        self,
+        task_uid: str,
+        function_name: str,
+        args: tuple = (),
+        kwargs: dict = {},
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
+        user: Optional[str] = None,
+    ) -> TaskDefinition:
         """
         Submit a new task to the pool
 
+        The task is dispatched as soon as a worker is free to run it, see `TaskScheduler` for the order tasks are run in
+
         :param task_uid: unique identifier of the task
         :param function_name: name of the function within configured task module to run
         :param args: list of arguments to pass to the function
         :param kwargs: dict of kwargs to pass to the function
+        :param priority: priority of the task
+        :param user: optional identity of the user or session the task is run for
         """
         self._check_pool_state()
 
@@ -126,30 +189,110 @@ class TaskPool:
         new_task = TaskDefinition(
             uid=task_uid,
             payload=TaskPayload(function_name=function_name, args=args, kwargs=kwargs),
+            priority=priority,
+            user=user,
         )
-        self.tasks[task_uid] = new_task
-
-        # Dispatch to workers
-        try:
-            self._channel.pool_api.dispatch(new_task)
-        except BaseException as e:
-            # Dispatching could fail due to e.g. pickling issues - resolve the future with the exception raised
-            self._update_task(new_task, e)
-            self.tasks.pop(task_uid)
+        self._schedule(new_task)
 
         return new_task
 
+    async def map(
+        self,
+        task_uid: str,
+        function_name: str,
+        items: Iterable[Any],
+        kwargs: dict = {},
+        chunk_size: Optional[int] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
+        user: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Run a function for each of the items across the workers, returning the list of results in the order of items
+
+        Items are sent to the workers in chunks, each chunk is run as a single task so the overhead of running a task
+        is paid once per chunk rather than per item. Progress of all chunks is reported together under `task_uid`.
+
+        :param task_uid: unique identifier of the whole map
+        :param function_name: name of the function within configured task module to run
+        :param items: items to call the function with, one at a time
+        :param kwargs: dict of kwargs to pass to each call of the function
+        :param chunk_size: number of items per chunk, by default splits the items into a few chunks per worker
+            so the load is balanced between the workers
+        :param priority: priority of the chunks
+        :param user: optional identity of the user or session the map is run for
+        """
+        items = list(items)
+        if len(items) == 0:
+            return []
+
+        if chunk_size is None:
+            chunk_size = math.ceil(len(items) / (self.max_workers * MAP_CHUNKS_PER_WORKER))
+        elif chunk_size < 1:
+            raise ValueError(f'chunk_size must be at least 1, got {chunk_size}')
+
+        chunks = [tuple(items[i : i + chunk_size]) for i in range(0, len(items), chunk_size)]
+        processed_items = [0] * len(chunks)
+
+        def _create_progress_handler(chunk_index: int):
+            async def _on_chunk_progress(progress: float, message: str):
+                processed_items[chunk_index] = round(progress / 100 * len(chunks[chunk_index]))
+
+                if task_uid in self._progress_subscribers:
+                    processed = sum(processed_items)
+                    await self._progress_subscribers[task_uid](
+                        processed / len(items) * 100, f'Processed {processed} of {len(items)} items'
+                    )
+
+            return _on_chunk_progress
+
+        chunk_tasks: List[TaskDefinition] = []
+        self._map_chunks[task_uid] = chunk_tasks
+
+        try:
+            for index, chunk in enumerate(chunks):
+                chunk_task = TaskDefinition(
+                    uid=f'{task_uid}_chunk_{index}',
+                    payload=TaskPayload(function_name=function_name, args=chunk, kwargs=kwargs, map=True),
+                    priority=priority,
+                    user=user,
+                )
+                self._progress_subscribers[chunk_task.uid] = _create_progress_handler(index)
+                chunk_tasks.append(chunk_task)
+                self._schedule(chunk_task)
+
+            results = []
+            for chunk_task in chunk_tasks:
+                results.extend(await chunk_task)
+
+            return results
+        except BaseException:
+            # Stop the remaining chunks, the map already failed
+            for chunk_task in chunk_tasks:
+                await self.cancel(chunk_task.uid)
+            raise
+        finally:
+            self._map_chunks.pop(task_uid, None)
+            for chunk_task in chunk_tasks:
+                self._progress_subscribers.pop(chunk_task.uid, None)
+
     async def cancel(self, task_uid: str):
         """
         Cancel a task
 
-        :param task_uid: uid of the task to cancel
+        :param task_uid: uid of the task, or of a map, to cancel
         """
+        # Cancelling a map cancels all of its chunks
+        if task_uid in self._map_chunks:
+            for chunk_task in self._map_chunks[task_uid]:
+                await self.cancel(chunk_task.uid)
+            return
+
         # Already cancelled
         if task_uid not in self.tasks:
             return
 
         task = self.tasks.pop(task_uid)
+        self._scheduler.remove(task)
         if not task.event.is_set():
             task.result = Exception('Task cancelled')
             task.event.set()
@@ -171,6 +314,18 @@ class TaskPool:
         yield
         self._progress_subscribers.pop(task_uid)
 
+    @contextmanager
+    def on_partial_result(self, task_uid: str, handler: Callable[[Any], Coroutine]):
+        """
+        Subscribe to partial results yielded by a given task
+
+        :param task_uid: uid of the task to subscribe to partial results for
+        :param handler: handler to call with each partial result
+        """
+        self._partial_result_subscribers[task_uid] = handler
+        yield
+        self._partial_result_subscribers.pop(task_uid)
+
     def close(self):
         """
         Prevents any more tasks from being submitted to the pool.
@@ -275,6 +430,50 @@ class TaskPool:
             task.result = result
             task.event.set()
 
+    def _schedule(self, task: TaskDefinition):
+        """
+        Add a task to the pool and dispatch it if a worker is free
+
+        :param task: task to schedule
+        """
+        self.tasks[task.uid] = task
+        self._scheduler.push(task)
+        self._dispatch_tasks()
+
+    def _dispatch_tasks(self):
+        """
+        Dispatch waiting tasks to the workers, as long as there are idle workers to pick them up
+        """
+        idle_workers = sum(1 for worker in self.workers.values() if worker.status == WorkerStatus.IDLE)
+        running_tasks_per_user: Counter[Optional[str]] = Counter()
+        dispatched_tasks = 0
+
+        for task in self.tasks.values():
+            if task.dispatched_at is None:
+                continue
+
+            running_tasks_per_user[task.user] += 1
+
+            # Dispatched tasks not picked up yet will take up one of the idle workers
+            if task.worker_id is None:
+                dispatched_tasks += 1
+
+        for _ in range(idle_workers - dispatched_tasks):
+            task = self._scheduler.pop(running_tasks_per_user)
+
+            if task is None:
+                return
+
+            try:
+                self._channel.pool_api.dispatch(task)
+            except BaseException as e:
+                # Dispatching could fail due to e.g. pickling issues - resolve the future with the exception raised
+                self._update_task(task, e)
+                self.tasks.pop(task.uid)
+            else:
+                task.dispatched_at = datetime.now()
+                running_tasks_per_user[task.user] += 1
+
     def _create_workers(self):
         """
         Creates workers up to the desired worker number
@@ -282,7 +481,7 @@ class TaskPool:
         desired_worker_num = self.desired_workers
 
         for _ in range(desired_worker_num - len(self.workers)):
-            new_worker = WorkerProcess(self.worker_parameters, self._channel)
+            new_worker = WorkerProcess(self.worker_parameters, self._channel, self._worker_context)
             assert new_worker.process.pid is not None, 'Worker failed to create process'
             self.workers[new_worker.process.pid] = new_worker
 
@@ -325,16 +524,25 @@ class TaskPool:
         worker.terminate()
         self._cleanup_worker(worker)
 
-    def _handle_dead_workers(self):
+    async def _handle_dead_workers(self):
         """
         Check if any of the workers are dead
 
-        Cleans up the dead ones
+        Processes the messages they sent before exiting, then cleans up the dead ones
         """
         dead_workers = [w for w in self.workers.values() if not w.process.is_alive()]
 
+        if len(dead_workers) == 0:
+            return
+
+        # A worker reaching its limits exits right after sending the result of its last task and its retirement,
+        # which may not have been processed yet; process them first so the task is not failed as if it crashed
+        for worker_msg in self._channel.pool_api.get_worker_messages(timeout=0):
+            await self._process_worker_message(worker_msg)
+
         for worker in dead_workers:
-            self._cleanup_worker(worker)
+            if worker.process.pid in self.workers:
+                self._cleanup_worker(worker)
 
     def _handle_orphaned_workers(self):
         """
@@ -397,16 +605,12 @@ class TaskPool:
         if self.status != PoolStatus.RUNNING:
             raise RuntimeError('The Pool is not active')
 
-    async def _process_next_worker_message(self):
-        """
-        Processes the next message from a worker if there is one available
+    async def _process_worker_message(self, worker_msg: WorkerMessage):
         """
-        worker_msg = self._channel.pool_api.get_worker_message()
-
-        # No message available at this time, don't block and just return
-        if worker_msg is None:
-            return
+        Processes a message received from a worker
 
+        :param worker_msg: message to process
+        """
         if is_initialization(worker_msg):
             self.workers[worker_msg].update_status(WorkerStatus.IDLE, task_uid=None)
         elif is_acknowledgement(worker_msg):
@@ -415,6 +619,9 @@ class TaskPool:
             if task:
                 task.worker_id = worker_msg['worker_pid']
                 task.started_at = datetime.now()
+                POOL_METRICS_TRACKER.observe_queue_wait(
+                    task.priority.value, (task.started_at - task.submitted_at).total_seconds()
+                )
 
                 self.workers[worker_msg['worker_pid']].update_status(
                     WorkerStatus.WORKING, task_uid=worker_msg['task_uid']
@@ -461,11 +668,33 @@ class TaskPool:
                 dev_logger.error(
                     'Something went wrong with a worker process', cast(Exception, worker_msg['error'].unwrap())
                 )
+        elif is_batch(worker_msg):
+            for batched_msg in worker_msg['messages']:
+                await self._process_worker_message(batched_msg)
         elif is_log(worker_msg):
             dev_logger.info(f'Task: {worker_msg["task_uid"]}', {'logs': worker_msg['log']})
         elif is_progress(worker_msg):
             if worker_msg['task_uid'] in self._progress_subscribers:
                 await self._progress_subscribers[worker_msg['task_uid']](worker_msg['progress'], worker_msg['message'])
+        elif is_partial_result(worker_msg):
+            # Always read the partial result so its shared memory is released, even if no one is subscribed
+            try:
+                partial = read_from_shared_memory(worker_msg['partial'])
+            except BaseException as e:
+                dev_logger.error(f'Failed to read partial result of task {worker_msg["task_uid"]}', cast(Exception, e))
+            else:
+                if worker_msg['task_uid'] in self._partial_result_subscribers:
+                    await self._partial_result_subscribers[worker_msg['task_uid']](partial)
+        elif is_retirement(worker_msg):
+            # Worker finished its last task and is exiting, replace it in the next loop iteration
+            worker = self.workers.pop(worker_msg['worker_pid'], None)
+            POOL_METRICS_TRACKER.record_recycle(worker_msg['reason'])
+            dev_logger.debug(
+                'Recycling task pool worker', {'worker_pid': worker_msg['worker_pid'], 'reason': worker_msg['reason']}
+            )
+
+            if worker is not None:
+                self.task_group.start_soon(stop_process_async, worker.process)
 
     async def _wait_queue_depletion(self, timeout: Optional[float] = None):
         """
@@ -489,15 +718,26 @@ class TaskPool:
         """
         self.status = PoolStatus.RUNNING
 
+        # Waiting for messages occupies a thread for the lifetime of the pool, so use a dedicated limiter
+        # rather than taking up a slot in the default thread pool
+        limiter = anyio.CapacityLimiter(1)
+
         try:
             while self.status not in (PoolStatus.ERROR, PoolStatus.STOPPED):
-                await anyio.sleep(0.1)
-
                 self._handle_excess_workers()
                 self._handle_orphaned_workers()
-                self._handle_dead_workers()
+                await self._handle_dead_workers()
                 self._create_workers()
-                await self._process_next_worker_message()
+
+                # Block until workers send messages, waking up periodically to manage the workers,
+                # then process everything that arrived in one go
+                worker_msgs = await anyio.to_thread.run_sync(
+                    self._channel.pool_api.get_worker_messages, POOL_WAIT_INTERVAL, limiter=limiter
+                )
+                for worker_msg in worker_msgs:
+                    await self._process_worker_message(worker_msg)
+
+                self._dispatch_tasks()
         finally:
             self.loop_stopped.set()
 
@@ -15,16 +15,18 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import copy
 import os
 import pickle
 import signal
 import sys
+import threading
+import weakref
 from multiprocessing.process import BaseProcess
 from multiprocessing.shared_memory import SharedMemory
-from typing import Any, Callable, Optional, Tuple
+from typing import Any, Callable, List, Optional, Tuple
 
 import anyio
+import numpy
 from tblib import Traceback
 
 
@@ -46,61 +48,125 @@ class SubprocessException:
         return self.exception.with_traceback(tb)
 
 
-SharedMemoryPointer = Tuple[str, int]
+SharedMemoryPointer = Tuple[str, int, List[Tuple[int, int]]]
+"""
+Pointer to content stored in shared memory - (shared_memory_name, pickled_size, buffers),
+where buffers are (offset, size) of out-of-band buffers stored after the pickled data
+"""
+
+BUFFER_ALIGNMENT = 64
+"""Alignment of out-of-band buffers in shared memory, so arrays read from them are aligned for vectorized operations"""
 
 
 class PicklingException(Exception):
     """Wraps any pickling errors so they can be distinguished from other errors"""
 
 
+_released_shared_memory: List[SharedMemory] = []
+"""Shared memory read from which is no longer referenced, to be closed once its last buffer export is released"""
+
+_released_shared_memory_lock = threading.Lock()
+
+
+def _release_shared_memory(shared_mem: SharedMemory):
+    with _released_shared_memory_lock:
+        _released_shared_memory.append(shared_mem)
+
+
+def close_released_shared_memory():
+    """
+    Close shared memory whose content is no longer referenced.
+
+    Closing is deferred as the array keeping the shared memory alive still holds its buffer
+    while it is being garbage collected.
+    """
+    with _released_shared_memory_lock:
+        for shared_mem in list(_released_shared_memory):
+            try:
+                shared_mem.close()
+                _released_shared_memory.remove(shared_mem)
+            except BufferError:
+                pass
+
+
+def _align(offset: int) -> int:
+    return -(-offset // BUFFER_ALIGNMENT) * BUFFER_ALIGNMENT
+
+
 def store_in_shared_memory(content: Any) -> SharedMemoryPointer:
     """
     Store content in shared memory
 
-    Returns a tuple of [shared_memory_name, shared_memory_size]
+    Content is pickled with protocol 5, so that large buffers (i.e. of NumPy arrays, pandas DataFrames or Arrow tables)
+    are not copied into the pickled data but written directly after it, to be read back without copies.
+
+    Returns a tuple of [shared_memory_name, pickled_size, buffers]
 
     :param content: content to store in shared memory
     """
+    close_released_shared_memory()
+
     try:
-        pickled_args = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle_buffers: List[pickle.PickleBuffer] = []
+        pickled_args = pickle.dumps(content, protocol=5, buffer_callback=pickle_buffers.append)
         data_size = len(pickled_args)
 
-        shared_mem = SharedMemory(create=True, size=data_size)
+        raw_buffers = [pickle_buffer.raw() for pickle_buffer in pickle_buffers]
+        buffers = []
+        offset = data_size
+        for raw_buffer in raw_buffers:
+            offset = _align(offset)
+            buffers.append((offset, raw_buffer.nbytes))
+            offset += raw_buffer.nbytes
+
+        shared_mem = SharedMemory(create=True, size=offset)
 
         shared_mem.buf[0:data_size] = pickled_args
+        for (buffer_offset, buffer_size), raw_buffer in zip(buffers, raw_buffers):
+            shared_mem.buf[buffer_offset : buffer_offset + buffer_size] = raw_buffer
+            raw_buffer.release()
+
         shared_mem.close()
 
-        return shared_mem.name, data_size
+        return shared_mem.name, data_size, buffers
     except BaseException as e:
         raise PicklingException(*e.args) from e
 
 
 def read_from_shared_memory(pointer: SharedMemoryPointer) -> Any:
     """
-    Read data from a named shared memory of given size
+    Read data from a named shared memory
+
+    Out-of-band buffers are not copied, arrays are reconstructed as views of the shared memory instead.
+    The shared memory is unlinked straight away and unmapped once the last object using it is garbage collected.
 
     :param pointer: pointer to shared memory to read from
     """
+    close_released_shared_memory()
+
     try:
-        shared_mem_name, data_size = pointer
+        shared_mem_name, data_size, buffers = pointer
 
-        # Read from memory
+        # Read from memory, the name can be removed immediately as the mapping stays valid until closed
         shared_mem = SharedMemory(name=shared_mem_name)
-        data = shared_mem.buf[:data_size]
-
-        # Unpickle and deepcopy
-        decoded_payload_shared = pickle.loads(
-            shared_mem.buf
-        )   # nosec B301 # we trust the shared memory pointer passed by the pool
-        decoded_payload = copy.deepcopy(decoded_payload_shared)
-
-        # Cleanup
-        del data
-        del decoded_payload_shared
-        shared_mem.close()
         shared_mem.unlink()
 
-        return decoded_payload
+        try:
+            if len(buffers) == 0:
+                with shared_mem.buf[:data_size] as data:
+                    return pickle.loads(data)   # nosec B301 # we trust the shared memory pointer passed by the pool
+
+            # Views of the shared memory keep this array alive, close the shared memory once they are all released
+            shared_array = numpy.frombuffer(shared_mem.buf, dtype=numpy.uint8)
+            weakref.finalize(shared_array, _release_shared_memory, shared_mem)
+
+            with shared_mem.buf[:data_size] as data:
+                return pickle.loads(  # nosec B301 # we trust the shared memory pointer passed by the pool
+                    data, buffers=[shared_array[offset : offset + size] for offset, size in buffers]
+                )
+        finally:
+            if len(buffers) == 0:
+                shared_mem.close()
     except BaseException as e:
         raise PicklingException(*e.args) from e
 
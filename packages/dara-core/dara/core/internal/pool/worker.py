@@ -21,19 +21,24 @@ import logging
 import os
 import signal
 import sys
+import threading
+import time
 from datetime import datetime
 from importlib import import_module
-from inspect import iscoroutinefunction
-from multiprocessing import get_context
-from multiprocessing.context import SpawnProcess
-from time import sleep
-from typing import Callable, Optional
+from inspect import isasyncgen, iscoroutinefunction, isgenerator
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Union
 
 import anyio
+from pandas import DataFrame, concat
 
 from dara.core.internal.pool.channel import Channel
 from dara.core.internal.pool.definitions import (
     WORKER_NAME,
+    Log,
+    Progress,
     WorkerParameters,
     WorkerStatus,
 )
@@ -43,18 +48,127 @@ from dara.core.internal.pool.utils import (
     store_in_shared_memory,
 )
 
+TASK_WAIT_INTERVAL = 0.1
+"""Maximum number of seconds an idle worker blocks waiting for a task before checking whether it should exit"""
+
+
+MESSAGE_FLUSH_INTERVAL = 0.1
+"""Number of seconds logs and progress updates are buffered for before being sent to the pool"""
+
+MAX_BUFFERED_LOG_SIZE = 64 * 1024
+"""Number of characters of logs buffered for a task after which the buffer is sent straight away"""
+
+
+class MessageBuffer:
+    """
+    Buffers logs and progress updates of tasks and sends them to the pool in batches
+
+    Logs are buffered by line and progress updates are throttled to the latest update of each task. Buffered messages
+    are sent together in a single envelope every `MESSAGE_FLUSH_INTERVAL` seconds by a background thread, so chatty
+    tasks send a handful of messages rather than one per print or update. Results and errors are sent directly
+    rather than through the buffer, so they never wait behind buffered messages.
+    """
+
+    def __init__(self, channel: Channel, interval: float = MESSAGE_FLUSH_INTERVAL):
+        self.channel = channel
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Held while collecting and sending a batch, so a batch collected by one thread is never sent after a
+        # message another thread sends once its own flush returns, i.e. progress updates after the task result
+        self._send_lock = threading.Lock()
+        self._logs: Dict[str, str] = {}
+        self._progress: Dict[str, Progress] = {}
+
+    def start(self):
+        """
+        Start flushing the buffer periodically in a background thread
+        """
+        threading.Thread(target=self._flush_periodically, daemon=True).start()
+
+    def log(self, task_uid: str, text: str):
+        """
+        Buffer text written by a task
+
+        :param task_uid: uid of the task writing the text
+        :param text: text written
+        """
+        with self._lock:
+            self._logs[task_uid] = self._logs.get(task_uid, '') + text
+            is_full = len(self._logs[task_uid]) > MAX_BUFFERED_LOG_SIZE
+
+        if is_full:
+            self.flush()
+
+    def send_progress(self, task_uid: str, progress: float, message: str):
+        """
+        Buffer a progress update, replacing any update of the task not sent yet
+
+        :param task_uid: uid of the task to send progress update for
+        :param progress: progress from 0-100 to send
+        :param message: progress messsage to send
+        """
+        with self._lock:
+            self._progress[task_uid] = Progress(task_uid=task_uid, progress=progress, message=message)
+
+    def flush_progress(self):
+        """
+        Send only the buffered progress updates to the pool
+        """
+        with self._send_lock:
+            with self._lock:
+                messages: List[Union[Log, Progress]] = list(self._progress.values())
+                self._progress.clear()
+
+            if len(messages) > 0:
+                self.channel.worker_api.send_batch(messages)
+
+    def flush(self, final: bool = False):
+        """
+        Send the buffered messages to the pool
+
+        :param final: whether to send incomplete lines of logs too, rather than waiting for the rest of the line
+        """
+        with self._send_lock:
+            messages: List[Union[Log, Progress]] = []
+
+            with self._lock:
+                for task_uid, text in list(self._logs.items()):
+                    # Keep incomplete lines in the buffer until they are finished, unless they would not fit
+                    if final or len(text) > MAX_BUFFERED_LOG_SIZE:
+                        lines, rest = text, ''
+                    else:
+                        lines, _, rest = text.rpartition('\n')
+
+                    if rest:
+                        self._logs[task_uid] = rest
+                    else:
+                        del self._logs[task_uid]
+
+                    lines = '\n'.join(line for line in lines.split('\n') if line)
+                    if lines:
+                        messages.append(Log(task_uid=task_uid, log=lines))
+
+                messages.extend(self._progress.values())
+                self._progress.clear()
+
+            if len(messages) > 0:
+                self.channel.worker_api.send_batch(messages)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
 
 class StdoutLogger:
     """A mock stdout which instead puts logs into channel messages"""
 
-    def __init__(self, task_uid: str, channel: Channel):
+    def __init__(self, task_uid: str, message_buffer: MessageBuffer):
         self.task_uid = task_uid
-        self.channel = channel
+        self.message_buffer = message_buffer
 
     def write(self, msg):
-        # Ignore newline logs
-        if msg != '\n':
-            self.channel.worker_api.log(self.task_uid, msg)
+        self.message_buffer.log(self.task_uid, msg)
 
     def flush(self):
         sys.__stdout__.flush()
@@ -85,9 +199,91 @@ def execute_function(func: Callable, args: tuple, kwargs: dict):
         return SubprocessException(e)
 
 
-def _create_send_update(task_uid: str, channel: Channel):
+def execute_generator(generator: Union[Generator, AsyncGenerator], send_partial: Callable[[Any], None]):
+    """
+    Run a generator returned by a task function to completion, sending each value yielded as a partial result
+
+    The result is the value returned by the generator, if any. Otherwise the values yielded are accumulated,
+    DataFrames are concatenated and any other values are collected into a list.
+
+    :param generator: generator to run
+    :param send_partial: method to send partial results with
+    """
+    partials: List[Any] = []
+    returned = None
+
+    try:
+        if isasyncgen(generator):
+
+            async def _consume():
+                async for value in generator:
+                    send_partial(value)
+                    partials.append(value)
+
+            anyio.run(_consume, backend='asyncio')
+        else:
+            while True:
+                try:
+                    value = next(generator)
+                except StopIteration as e:
+                    returned = e.value
+                    break
+
+                send_partial(value)
+                partials.append(value)
+    except BaseException as e:
+        return SubprocessException(e)
+
+    if returned is not None:
+        return returned
+
+    if len(partials) > 0 and all(isinstance(partial, DataFrame) for partial in partials):
+        return concat(partials)
+
+    return partials
+
+
+def execute_map(func: Callable, items: tuple, kwargs: dict, send_update: Callable[[float, str], None]):
+    """
+    Execute a function for each item of a chunk, reporting progress as items are processed
+
+    :param func: function to execute
+    :param items: items to call the function with, one at a time
+    :param kwargs: keyword arguments to pass to each call
+    :param send_update: method to send progress updates with
+    """
+    # Progress is reported per item, so updates sent by the function itself are dropped
+    if _is_tracking_progress(func):
+        kwargs = {**kwargs, '__send_update': lambda *args: None}
+
+    results = []
+    for index, item in enumerate(items):
+        result = execute_function(func, (item,), kwargs)
+
+        # Fail the whole chunk on the first error
+        if isinstance(result, SubprocessException):
+            return result
+
+        results.append(result)
+        send_update((index + 1) / len(items) * 100, '')
+
+    return results
+
+
+def _is_tracking_progress(func: Callable) -> bool:
+    """Check whether func is decorated with @track_progress"""
+    wrapped_by = getattr(func, '__wrapped_by__', None)
+    return wrapped_by is not None and wrapped_by.__name__ == 'track_progress'
+
+
+def _create_send_partial(task_uid: str, channel: Channel):
+    """Create a method sending partial results of a task to the pool"""
+    return lambda partial: channel.worker_api.send_partial_result(task_uid, store_in_shared_memory(partial))
+
+
+def _create_send_update(task_uid: str, message_buffer: MessageBuffer):
     """Create a __send_update method to inject into the @track_progress-wrapped function"""
-    return lambda *args: channel.worker_api.send_progress(task_uid, *args)
+    return lambda *args: message_buffer.send_progress(task_uid, *args)
 
 
 def _setup_logger() -> logging.Logger:
@@ -107,6 +303,42 @@ def _setup_logger() -> logging.Logger:
     return dev_logger
 
 
+def _get_peak_rss() -> Optional[int]:
+    """
+    Get the peak resident set size of the current process in bytes, if the platform reports it
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in bytes on macOS, kilobytes elsewhere
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _get_retirement_reason(worker_params: WorkerParameters, tasks_completed: int) -> Optional[str]:
+    """
+    Check whether the worker has reached one of its limits and should retire
+
+    :param worker_params: worker parameters
+    :param tasks_completed: number of tasks the worker has completed
+    :return: the limit reached, or None if the worker can keep running
+    """
+    max_tasks = worker_params.get('max_tasks')
+    if max_tasks is not None and tasks_completed >= max_tasks:
+        return 'max_tasks'
+
+    max_rss = worker_params.get('max_rss')
+    if max_rss is not None:
+        peak_rss = _get_peak_rss()
+        if peak_rss is not None and peak_rss > max_rss:
+            return 'max_rss'
+
+    return None
+
+
 def worker_loop(worker_params: WorkerParameters, channel: Channel):
     """
     Main worker loop
@@ -142,18 +374,25 @@ def worker_loop(worker_params: WorkerParameters, channel: Channel):
         worker_api.initialize_worker()
         dev_logger.debug('Worker initialized')
 
-    while True:
-        sleep(0.1)
+    tasks_completed = 0
+    message_buffer = MessageBuffer(channel)
+    message_buffer.start()
 
+    while True:
         # Gracefully exit the loop if SIGTERM received
         if terminate:
             break
 
-        # Check for new tasks to pick up
-        task = worker_api.get_task()
+        # Wait for a new task to pick up, periodically checking whether the worker should exit
+        task = worker_api.get_task(timeout=TASK_WAIT_INTERVAL)
         if task is None:
             continue
 
+        # SIGTERM received while waiting - hand the task over to another worker and exit
+        if terminate:
+            worker_api.return_task(task)
+            break
+
         # Task received - remove graceful sigterm handler so terminate will stop the task in-progress
         signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
@@ -163,7 +402,7 @@ def worker_loop(worker_params: WorkerParameters, channel: Channel):
         dev_logger.debug(f'Worker picked up task {task_uid}')
 
         # Redirect logs via the channel
-        stdout_logger = StdoutLogger(task_uid, channel)
+        stdout_logger = StdoutLogger(task_uid, message_buffer)
         sys.stdout = stdout_logger   # type: ignore
 
         try:
@@ -173,24 +412,66 @@ def worker_loop(worker_params: WorkerParameters, channel: Channel):
             func = getattr(task_module, payload['function_name'])
             kwargs = payload['kwargs']
 
-            # If func is decorated with @track_progress, inject updater method
-            wrapped_by = getattr(func, '__wrapped_by__', None)
-            if wrapped_by is not None and wrapped_by.__name__ == 'track_progress':
-                kwargs = {**kwargs, '__send_update': _create_send_update(task_uid, channel)}
+            if payload.get('map'):
+                result = execute_map(func, payload['args'], kwargs, _create_send_update(task_uid, message_buffer))
+            else:
+                # If func is decorated with @track_progress, inject updater method
+                if _is_tracking_progress(func):
+                    kwargs = {**kwargs, '__send_update': _create_send_update(task_uid, message_buffer)}
 
-            result = execute_function(func, payload['args'], kwargs)
+                result = execute_function(func, payload['args'], kwargs)
+
+                # Stream the values yielded by generator tasks as partial results
+                if isgenerator(result) or isasyncgen(result):
+                    result = execute_generator(result, _create_send_partial(task_uid, channel))
 
             result_pointer = store_in_shared_memory(result)
+
+            # The last progress update should arrive before the result, logs can follow it
+            message_buffer.flush_progress()
             worker_api.send_result(task_uid, result_pointer)
         except BaseException as e:
+            message_buffer.flush_progress()
             worker_api.send_error(task_uid=task_uid, error=e)
         finally:
             # Task finished - restore graceful sigterm handler
             signal.signal(signal.SIGTERM, on_sigterm)
 
+            # Send the rest of the task's logs, after the result so it does not wait for them
+            message_buffer.flush(final=True)
+
+        # Retire the worker once it reaches its limits, the pool replaces it with a fresh one
+        tasks_completed += 1
+        retirement_reason = _get_retirement_reason(worker_params, tasks_completed)
+        if retirement_reason is not None:
+            dev_logger.debug(f'Worker retiring, reached {retirement_reason}')
+            worker_api.retire(retirement_reason)
+            break
+
+
+def get_worker_context(worker_params: WorkerParameters) -> BaseContext:
+    """
+    Get the multiprocessing context to start workers with
+
+    Where available, workers are forked from a fork server which has already imported the worker and the task
+    module, so new workers are ready to pick up tasks without importing the task module themselves.
+    Otherwise workers are spawned as fresh interpreters.
+
+    Note that the fork server is started alongside the first worker, and forked workers inherit its environment.
+
+    :param worker_params: worker parameters
+    """
+    if 'forkserver' not in get_all_start_methods():
+        return get_context('spawn')
+
+    ctx = get_context('forkserver')
+    # Only takes effect if the fork server is not running yet, modules failing to import are skipped
+    ctx.set_forkserver_preload([__name__, worker_params['task_module']])
+    return ctx
+
 
 class WorkerProcess:
-    process: SpawnProcess
+    process: BaseProcess
 
     status: WorkerStatus
 
@@ -202,13 +483,12 @@ class WorkerProcess:
     updated_at: datetime
     """When the worker status has last been updated"""
 
-    def __init__(self, worker_parameters: WorkerParameters, channel: Channel):
-        self._start_process(worker_parameters, channel)
+    def __init__(self, worker_parameters: WorkerParameters, channel: Channel, context: Optional[BaseContext] = None):
+        self._start_process(worker_parameters, channel, context or get_context('spawn'))
         self.update_status(WorkerStatus.CREATED)
         self.channel = channel
 
-    def _start_process(self, worker_params: WorkerParameters, channel: Channel):
-        ctx = get_context('spawn')
+    def _start_process(self, worker_params: WorkerParameters, channel: Channel, ctx: BaseContext):
         self.process = ctx.Process(target=worker_loop, args=(worker_params, channel), name=WORKER_NAME)
         self.process.start()
 
@@ -19,7 +19,7 @@ import copy
 from enum import Enum
 from typing import Generic, MutableMapping, Optional, TypeVar
 
-from dara.core.metrics import CACHE_METRICS_TRACKER, total_size
+from dara.core.metrics import CACHE_METRICS_TRACKER, EntrySizes
 
 T = TypeVar('T')
 
@@ -66,19 +66,25 @@ class Registry(Generic[T]):
         self.name = name
         self.allow_duplicates = allow_duplicates
         self._registry = {}
+        self._size = 0
+        self._sizes: EntrySizes[str] = EntrySizes(self._resize)
         if initial_registry is not None:
             self._registry = copy.deepcopy(initial_registry)
+            for key, value in self._registry.items():
+                self._sizes.set(key, value)
 
-        self._size = total_size(self._registry)
         self._update_metrics()
 
+    def _resize(self, delta: int):
+        self._size += delta
+
     def register(self, key: str, value: T):
         """Register an entity to the registry"""
         if not self.allow_duplicates and key in self._registry:
             raise ValueError(f'Invalid uid value: {key}, is already taken')
 
         self._registry[key] = value
-        self._size += total_size(value)
+        self._sizes.set(key, value)
         self._update_metrics()
 
     def get(self, key: str) -> T:
@@ -91,9 +97,8 @@ class Registry(Generic[T]):
 
     def set(self, key: str, value: T):
         """Set an entity for the registry, if already present overwrites it"""
-        previous_value_size = total_size(self._registry.get(key))
         self._registry[key] = value
-        self._size = self._size - previous_value_size + total_size(value)
+        self._sizes.set(key, value)
         self._update_metrics()
 
     def get_all(self) -> MutableMapping[str, T]:
@@ -110,19 +115,21 @@ class Registry(Generic[T]):
         """
         Remove the key from registry, will raise if it's not found
         """
-        previous_value_size = total_size(self._registry.get(key))
         self._registry.pop(key)
-        self._size = self._size - previous_value_size
+        self._sizes.pop(key)
+        self._update_metrics()
 
     def replace(self, new_registry: MutableMapping[str, T], deepcopy=True):
         """
         Replace the entire registry with a new one
         """
-        self._size = total_size(new_registry)
-
         if deepcopy:
             self._registry = copy.deepcopy(new_registry)
         else:
             self._registry = new_registry
 
+        self._sizes.clear()
+        for key, value in self._registry.items():
+            self._sizes.set(key, value)
+
         self._update_metrics()
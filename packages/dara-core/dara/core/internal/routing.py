@@ -29,12 +29,14 @@ from fastapi import (
     Depends,
     File,
     Form,
+    Header,
     HTTPException,
     Response,
     UploadFile,
 )
 from fastapi.responses import StreamingResponse
 from pandas import DataFrame
+from pyarrow import ArrowException
 from pydantic import BaseModel
 from starlette.background import BackgroundTask
 
@@ -47,7 +49,12 @@ from dara.core.internal.cache_store import CacheStore
 from dara.core.internal.download import DownloadRegistryEntry
 from dara.core.internal.execute_action import CURRENT_ACTION_ID
 from dara.core.internal.normalization import NormalizedPayload, denormalize, normalize
-from dara.core.internal.pandas_utils import df_to_json
+from dara.core.internal.pandas_utils import (
+    ARROW_STREAM_MEDIA_TYPE,
+    arrow_to_ipc_stream,
+    df_to_arrow,
+    df_to_json,
+)
 from dara.core.internal.registries import (
     action_def_registry,
     action_registry,
@@ -64,7 +71,7 @@ from dara.core.internal.registries import (
 from dara.core.internal.registry_lookup import RegistryLookup
 from dara.core.internal.settings import get_settings
 from dara.core.internal.tasks import TaskManager, TaskManagerError
-from dara.core.internal.utils import get_cache_scope
+from dara.core.internal.utils import get_cache_scope, negotiate_media_type
 from dara.core.internal.websocket import WS_CHANNEL, ws_handler
 from dara.core.logging import dev_logger
 from dara.core.persistence import BackendStoreEntry
@@ -302,6 +309,7 @@ def create_router(config: Configuration):
         limit: Optional[int] = None,
         order_by: Optional[str] = None,
         index: Optional[str] = None,
+        accept: Optional[str] = Header(default=None),
     ):   # pylint: disable=unused-variable
         try:
             store: CacheStore = utils_registry.get('Store')
@@ -351,6 +359,22 @@ def create_router(config: Configuration):
             if data is None:
                 return None
 
+            # Stream Arrow IPC record batches if the client negotiated it
+            if (
+                isinstance(data, pandas.DataFrame)
+                and negotiate_media_type(accept, ['application/json', ARROW_STREAM_MEDIA_TYPE])
+                == ARROW_STREAM_MEDIA_TYPE
+            ):
+                try:
+                    table = df_to_arrow(data)
+                    return StreamingResponse(content=arrow_to_ipc_stream(table), media_type=ARROW_STREAM_MEDIA_TYPE)
+                except ArrowException as err:
+                    dev_logger.debug(
+                        f'DataVariable {data_variable_entry.uid[:3]}..{data_variable_entry.uid[-3:]}',
+                        'could not be converted to Arrow, falling back to JSON',
+                        {'error': str(err), 'uid': uid},
+                    )
+
             # Explicitly convert to JSON to avoid implicit serialization;
             # return as records as that makes more sense in a JSON structure
             return Response(
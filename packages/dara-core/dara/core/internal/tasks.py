@@ -16,8 +16,10 @@ limitations under the License.
 """
 
 import inspect
+import json
 import math
-from typing import Any, Callable, Dict, List, Optional, Union
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
 
 from anyio import (
     CancelScope,
@@ -25,11 +27,14 @@ from anyio import (
     create_memory_object_stream,
     create_task_group,
     move_on_after,
+    sleep,
 )
 from anyio.abc import TaskGroup
 from anyio.streams.memory import MemoryObjectSendStream
 from exceptiongroup import ExceptionGroup
+from pandas import DataFrame
 
+from dara.core.auth.definitions import SESSION_ID, USER
 from dara.core.base_definitions import (
     BaseTask,
     Cache,
@@ -37,19 +42,31 @@ from dara.core.base_definitions import (
     PendingTask,
     TaskError,
     TaskMessage,
+    TaskPartialResult,
     TaskProgressUpdate,
     TaskResult,
 )
 from dara.core.internal.cache_store import CacheStore
 from dara.core.internal.devtools import get_error_for_channel
-from dara.core.internal.pandas_utils import remove_index
-from dara.core.internal.pool import TaskPool
+from dara.core.internal.pandas_utils import df_to_json, remove_index
+from dara.core.internal.pool import TaskPool, TaskPriority
 from dara.core.internal.utils import resolve_exception_group, run_user_handler
 from dara.core.internal.websocket import WebsocketManager
 from dara.core.logging import dev_logger, eng_logger
 from dara.core.metrics import RUNTIME_METRICS_TRACKER
 
 
+def _get_task_user() -> Optional[str]:
+    """
+    Get the identity of the user, or the session if there is no user, a task is created for
+    """
+    user = USER.get()
+    if user is not None:
+        return user.identity_id or user.identity_name
+
+    return SESSION_ID.get()
+
+
 class Task(BaseTask):
     """
     The task class represents a task to be executed in a subprocess,
@@ -70,6 +87,7 @@ class Task(BaseTask):
         notify_channels: Optional[List[str]] = None,
         cache_key: Optional[str] = None,
         task_id: Optional[str] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
     ):
         """
         :param func: The function to execute within the process
@@ -80,6 +98,7 @@ class Task(BaseTask):
                                 completion
         :param cache_key: Optional cache key if there is a PendingTask in the store associated with this task
         :param task_id: Optional task_id to set for the task - otherwise the task generates its id automatically
+        :param priority: Priority of the task in the task pool, defaults to interactive
         """
         self._func_name = self._verify_function(func)
         self._args = args if args is not None else []
@@ -87,6 +106,8 @@ class Task(BaseTask):
         self.notify_channels = notify_channels if notify_channels is not None else []
         self.cache_key = cache_key
         self.reg_entry = reg_entry
+        self.priority = priority
+        self.user = _get_task_user()
 
         super().__init__(task_id)
 
@@ -154,6 +175,13 @@ class Task(BaseTask):
                     except ClosedResourceError:
                         pass
 
+            async def on_partial_result(partial: Any):
+                if send_stream is not None:
+                    try:
+                        await send_stream.send(TaskPartialResult(task_id=self.task_id, result=partial))
+                    except ClosedResourceError:
+                        pass
+
             async def on_error(exc: BaseException):
                 if send_stream is not None:
                     try:
@@ -165,11 +193,9 @@ class Task(BaseTask):
                     except ClosedResourceError:
                         pass
 
-            with pool.on_progress(self.task_id, on_progress):
-                pool_task_def = pool.submit(self.task_id, self._func_name, args=tuple(self._args), kwargs=self._kwargs)
-
+            with pool.on_progress(self.task_id, on_progress), pool.on_partial_result(self.task_id, on_partial_result):
                 try:
-                    result = await pool_task_def
+                    result = await self._run_in_pool(pool)
                 except BaseException as e:
                     # Task returned an exception
                     await on_error(e)
@@ -180,6 +206,21 @@ class Task(BaseTask):
 
                 return result
 
+    async def _run_in_pool(self, pool: TaskPool) -> Any:
+        """
+        Submit the task to the pool and wait for its result
+
+        :param pool: the pool to run the task in
+        """
+        return await pool.submit(
+            self.task_id,
+            self._func_name,
+            args=tuple(self._args),
+            kwargs=self._kwargs,
+            priority=self.priority,
+            user=self.user,
+        )
+
     async def cancel(self):
         """
         Cancel the task.
@@ -190,6 +231,69 @@ class Task(BaseTask):
         await pool.cancel(self.task_id)
 
 
+class MapTask(Task):
+    """
+    A MapTask runs a function for each of a list of items in subprocesses, splitting the items into chunks
+    across the workers of the task pool.
+
+    The task results in the list of results of each call, in the order of the items, and reports the progress
+    of all the chunks together. Can be returned from a DerivedVariable like any other task.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        kwargs: Union[Dict[str, Any], None] = None,
+        chunk_size: Optional[int] = None,
+        reg_entry: Optional[CachedRegistryEntry] = None,
+        notify_channels: Optional[List[str]] = None,
+        cache_key: Optional[str] = None,
+        task_id: Optional[str] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
+    ):
+        """
+        :param func: The function to call with each item, within the process
+        :param items: The items to call the function with, one at a time
+        :param kwargs: The keyword arguments to pass to each call of the function
+        :param chunk_size: Optional number of items to send to a worker at once, by default the items are split
+                           into a few chunks per worker
+        :param reg_entry: The associated registry entry for this task
+        :param notify_channels: If this task is run in a TaskManager instance these channels will also be notified on
+                                completion
+        :param cache_key: Optional cache key if there is a PendingTask in the store associated with this task
+        :param task_id: Optional task_id to set for the task - otherwise the task generates its id automatically
+        :param priority: Priority of the task in the task pool, defaults to interactive
+        """
+        self._items = list(items)
+        self._chunk_size = chunk_size
+        super().__init__(
+            func,
+            kwargs=kwargs,
+            reg_entry=reg_entry,
+            notify_channels=notify_channels,
+            cache_key=cache_key,
+            task_id=task_id,
+            priority=priority,
+        )
+
+    async def _run_in_pool(self, pool: TaskPool) -> Any:
+        """
+        Map the function over the items in the pool and wait for the combined result
+
+        :param pool: the pool to run the task in
+        """
+        return await pool.map(
+            self.task_id,
+            self._func_name,
+            self._items,
+            kwargs=self._kwargs,
+            chunk_size=self._chunk_size,
+            priority=self.priority,
+            user=self.user,
+        )
+
+
 class MetaTask(BaseTask):
     """
     A MetaTask represents a task that is dependant on the results of a number of other tasks. It exposes an async
@@ -207,6 +311,7 @@ class MetaTask(BaseTask):
         process_as_task: bool = False,
         cache_key: Optional[str] = None,
         task_id: Optional[str] = None,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
     ):
         """
         :param process result: A function to process the result of the other tasks
@@ -218,12 +323,15 @@ class MetaTask(BaseTask):
         :param process_as_task: Whether to run the process_result function as a task or not, defaults to False
         :param cache_key: Optional cache key if there is a PendingTask in the store associated with this task
         :param task_id: Optional task_id to set for the task - otherwise the task generates its id automatically
+        :param priority: Priority of the processing task in the task pool if process_as_task is set,
+                         defaults to interactive
         """
         self.args = args if args is not None else []
         self.process_result = process_result
         self.kwargs = kwargs if kwargs is not None else {}
         self.notify_channels = notify_channels if notify_channels is not None else []
         self.process_as_task = process_as_task
+        self.priority = priority
         self.cancel_scope: Optional[CancelScope] = None
         self.cache_key = cache_key
         self.reg_entry = reg_entry
@@ -300,7 +408,7 @@ class MetaTask(BaseTask):
         if self.process_as_task:
             eng_logger.debug(f'MetaTask {self.task_id}', 'processing result as Task')
             # Pass through cache_key so the processing task correctly updates the cache store entry
-            task = Task(self.process_result, args, kwargs, cache_key=self.cache_key)
+            task = Task(self.process_result, args, kwargs, cache_key=self.cache_key, priority=self.priority)
             res = await task.run(send_stream)
 
             eng_logger.info(f'MetaTask {self.task_id} returning result', {'result': res})
@@ -336,6 +444,80 @@ class MetaTask(BaseTask):
             self.cancel_scope.cancel()
 
 
+PROGRESS_NOTIFY_INTERVAL = 0.2
+"""Default minimum number of seconds between progress notifications sent for a task"""
+
+
+class ProgressNotifier:
+    """
+    Coalesces the progress notifications of a task, sending at most one per interval.
+
+    The first update is sent straight away; updates arriving within the interval of the last notification replace
+    each other and only the latest is sent once the interval has passed.
+    """
+
+    def __init__(self, notify: Callable[[dict], Awaitable[None]], interval: float):
+        """
+        :param notify: coroutine function sending a notification to the channels
+        :param interval: minimum number of seconds between notifications
+        """
+        self.notify = notify
+        self.interval = interval
+        self._pending: Optional[dict] = None
+        self._last_sent: Optional[float] = None
+        self._flush_scope: Optional[CancelScope] = None
+
+    async def update(self, message: dict, task_group: TaskGroup):
+        """
+        Record a progress update, sending it now or scheduling it to be sent once the interval has passed
+
+        :param message: the progress notification
+        :param task_group: task group to schedule the delayed notification in
+        """
+        self._pending = message
+
+        # A notification is already scheduled and will pick up this update
+        if self._flush_scope is not None:
+            return
+
+        delay = 0.0 if self._last_sent is None else self._last_sent + self.interval - time.monotonic()
+
+        if delay <= 0:
+            await self.flush()
+        else:
+            self._flush_scope = CancelScope()
+            task_group.start_soon(self._flush_after, self._flush_scope, delay)
+
+    async def _flush_after(self, scope: CancelScope, delay: float):
+        with scope:
+            await sleep(delay)
+            self._flush_scope = None
+            await self.flush()
+
+    async def flush(self):
+        """
+        Send the pending progress notification, if any
+        """
+        if self._pending is None:
+            return
+
+        message, self._pending = self._pending, None
+        self._last_sent = time.monotonic()
+        await self.notify(message)
+
+    async def close(self):
+        """
+        Send the pending progress notification straight away and cancel any scheduled one.
+
+        Called before terminal notifications so the latest progress is always sent ahead of them.
+        """
+        if self._flush_scope is not None:
+            self._flush_scope.cancel()
+            self._flush_scope = None
+
+        await self.flush()
+
+
 class TaskManagerError(ValueError):
     pass
 
@@ -353,11 +535,24 @@ class TaskManager:
     When a task is cancelled, it is removed from the tasks dict and the store entry is updated with None.
     """
 
-    def __init__(self, task_group: TaskGroup, ws_manager: WebsocketManager, store: CacheStore):
+    def __init__(
+        self,
+        task_group: TaskGroup,
+        ws_manager: WebsocketManager,
+        store: CacheStore,
+        progress_interval: float = PROGRESS_NOTIFY_INTERVAL,
+    ):
+        """
+        :param task_group: task group to run tasks in
+        :param ws_manager: websocket manager to notify clients of tasks with
+        :param store: store to cache task results in
+        :param progress_interval: minimum number of seconds between progress notifications sent for a task
+        """
         self.tasks: Dict[str, PendingTask] = {}
         self.task_group = task_group
         self.ws_manager = ws_manager
         self.store = store
+        self.progress_interval = progress_interval
 
     async def run_task(self, task: BaseTask, ws_channel: Optional[str] = None):
         """
@@ -415,8 +610,9 @@ class TaskManager:
 
             # Notify any listening channels that the job has been cancelled so that they can handle it correctly
             if notify:
-                for channel in [*task.notify_channels, *task.task_def.notify_channels]:
-                    await self.ws_manager.send_message(channel, {'status': 'CANCELED', 'task_id': task_id})
+                await self.ws_manager.send_message_to_channels(
+                    [*task.notify_channels, *task.task_def.notify_channels], {'status': 'CANCELED', 'task_id': task_id}
+                )
 
             # We're only now cancelling the task to make sure the clients are notified about cancelling
             # and receive the correct status rather than an error
@@ -484,26 +680,36 @@ class TaskManager:
                 if ws_channel:
                     channels_to_notify.append(ws_channel)
 
-                for channel in channels_to_notify:
-                    for message in messages:
-                        await self.ws_manager.send_message(channel, message)
+                for message in messages:
+                    await self.ws_manager.send_message_to_channels(channels_to_notify, message)
+
+            # Progress updates are coalesced, terminal notifications are sent straight away after the latest progress
+            progress_notifier = ProgressNotifier(notify_channels, self.progress_interval)
 
             # Create a memory object stream to capture messages from the tasks
             send_stream, receive_stream = create_memory_object_stream[TaskMessage](math.inf)
 
-            async def handle_messages():
+            async def handle_messages(tg: TaskGroup):
                 async with receive_stream:
                     async for message in receive_stream:
                         if isinstance(message, TaskProgressUpdate):
                             # Notify the channels of the task's progress
-                            await notify_channels(
+                            await progress_notifier.update(
                                 {
                                     'task_id': task.task_id,
                                     'status': 'PROGRESS',
                                     'progress': message.progress,
                                     'message': message.message,
-                                }
+                                },
+                                tg,
                             )
+                        elif isinstance(message, TaskPartialResult):
+                            # Stream the partial result to the channels, the final result is cached once complete
+                            partial = message.result
+                            if isinstance(partial, DataFrame):
+                                partial = json.loads(df_to_json(remove_index(partial)))
+
+                            await notify_channels({'task_id': task.task_id, 'status': 'PARTIAL', 'result': partial})
                         elif isinstance(message, TaskResult):
                             # Resolve the pending task related to the result
                             if message.task_id in self.tasks:
@@ -516,6 +722,7 @@ class TaskManager:
                             ):
                                 await self.store.set(message.reg_entry, key=message.cache_key, value=message.result)
                             # Notify the channels of the task's completion
+                            await progress_notifier.close()
                             await notify_channels(
                                 {'result': message.result, 'status': 'COMPLETE', 'task_id': message.task_id}
                             )
@@ -536,7 +743,7 @@ class TaskManager:
             try:
                 async with create_task_group() as tg:
                     # Handle incoming messages in parallel
-                    tg.start_soon(handle_messages)
+                    tg.start_soon(handle_messages, tg)
 
                     # Handle tasks that return other tasks
                     async with send_stream:
@@ -567,6 +774,7 @@ class TaskManager:
                 await self.set_result(task.task_id, {'error': str(err)})
 
                 # Notify any channels that need to be notified
+                await progress_notifier.close()
                 await notify_channels({'status': 'ERROR', 'task_id': task.task_id}, get_error_for_channel())
             finally:
                 # Remove the task from the running tasks
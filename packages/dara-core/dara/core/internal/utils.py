@@ -233,3 +233,54 @@ def resolve_exception_group(error: Any):
             return resolve_exception_group(error.exceptions[0])
 
     return error
+
+
+def _parse_media_range(media_range: str) -> Tuple[str, float]:
+    """
+    Parse a media range of an Accept header into a (media type, quality) tuple.
+    Malformed quality values make the range unacceptable.
+    """
+    media_type, *params = media_range.split(';')
+    quality = 1.0
+
+    for param in params:
+        name, _, value = param.strip().partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value.strip())
+            except ValueError:
+                quality = 0.0
+
+    return media_type.strip().lower(), quality
+
+
+def negotiate_media_type(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """
+    Pick the media type to respond with given the Accept header of a request.
+
+    Each offered type gets the quality of the most specific media range matching it, so e.g. `text/*;q=0` excludes
+    every text type but `text/plain` can still be accepted explicitly. Types with a quality of 0 are never picked,
+    ties go to the type offered first.
+
+    :param accept: the Accept header of the request, a missing header accepts any type
+    :param offered: the media types the response can be sent as, in order of preference
+    :return: The media type to respond with, None if none of the offered types is acceptable.
+    """
+    if accept is None or accept.strip() == '':
+        return offered[0] if len(offered) > 0 else None
+
+    qualities = dict(_parse_media_range(media_range) for media_range in accept.split(',') if media_range.strip() != '')
+    best_type, best_quality = None, 0.0
+
+    for media_type in offered:
+        main_type = media_type.split('/')[0]
+        # Exact matches take precedence over type/* which takes precedence over */*
+        quality = next(
+            (qualities[candidate] for candidate in (media_type, f'{main_type}/*', '*/*') if candidate in qualities),
+            0.0,
+        )
+
+        if quality > best_quality:
+            best_type, best_quality = media_type, quality
+
+    return best_type
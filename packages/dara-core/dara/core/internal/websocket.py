@@ -15,15 +15,17 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import math
+import itertools
 import uuid
+from collections import OrderedDict
 from contextvars import ContextVar
-from typing import Any, Dict, Literal, Optional, Set, Tuple, Union
+from enum import Enum
+from typing import Any, Dict, Hashable, Iterable, Literal, Optional, Set, Tuple, Union
 from uuid import uuid4
 
 import anyio
-from anyio import Event, create_memory_object_stream, create_task_group
-from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+import orjson
+from anyio import Event, create_task_group
 from exceptiongroup import catch
 from fastapi import HTTPException, Query
 from fastapi.encoders import jsonable_encoder
@@ -34,6 +36,7 @@ from starlette.websockets import WebSocket, WebSocketDisconnect
 from dara.core.auth.definitions import AuthError, TokenData
 from dara.core.auth.utils import decode_token
 from dara.core.logging import dev_logger, eng_logger
+from dara.core.metrics import WEBSOCKET_METRICS_TRACKER
 
 
 # Client message types
@@ -114,6 +117,208 @@ ServerMessage = Union[DaraServerMessage, CustomServerMessage]
 
 WS_CHANNEL: ContextVar[Optional[str]] = ContextVar('ws_channel', default=None)
 
+DEFAULT_MAX_QUEUE_SIZE = 1000
+"""Default maximum number of messages waiting to be sent to a client before it is disconnected"""
+
+SLOW_CLIENT_CLOSE_CODE = 1013
+"""Close code sent to clients disconnected for not keeping up with their messages (Try Again Later)"""
+
+SLOW_CLIENT_CLOSE_REASON = 'Client could not keep up with the messages sent to it'
+
+
+class WsEncoding(str, Enum):
+    """
+    Wire encodings of the messages sent to a client, negotiated when the client connects
+    """
+
+    JSON = 'json'
+    """JSON text frames, supported by every client"""
+
+    MSGPACK = 'msgpack'
+    """MessagePack binary frames, requires the optional msgpack package"""
+
+
+def is_msgpack_available() -> bool:
+    """
+    Check whether the optional msgpack package is installed
+    """
+    try:
+        import msgpack   # pylint: disable=unused-import
+    except ImportError:
+        return False
+
+    return True
+
+
+def _encode_default(value: Any) -> Any:
+    """
+    Fallback for values the encoders cannot serialize natively, delegating to fastapi's encoder so types registered
+    in the encoder registry are serialized the same way as in HTTP responses
+    """
+    return jsonable_encoder(value)
+
+
+class EncodedMessage:
+    """
+    A message to send to clients, encoded at most once per wire encoding and shared between all the clients it is
+    sent to.
+    """
+
+    def __init__(self, data: dict):
+        """
+        :param data: the message as a dictionary
+        """
+        self.data = data
+        self._encoded: Dict[WsEncoding, Union[str, bytes]] = {}
+
+    def encode(self, encoding: WsEncoding = WsEncoding.JSON) -> Union[str, bytes]:
+        """
+        Get the message encoded with the given encoding, JSON text or MessagePack bytes
+
+        :param encoding: the wire encoding to use
+        """
+        if encoding not in self._encoded:
+            if encoding == WsEncoding.MSGPACK:
+                import msgpack
+
+                self._encoded[encoding] = msgpack.packb(self.data, default=_encode_default)
+            else:
+                self._encoded[encoding] = orjson.dumps(
+                    self.data, default=_encode_default, option=orjson.OPT_NON_STR_KEYS
+                ).decode()
+
+        return self._encoded[encoding]
+
+
+def encode_message(message: ServerMessage) -> EncodedMessage:
+    """
+    Prepare a message to be encoded for the clients it is sent to.
+
+    Task notifications are sent without their result, apart from partial results which are streamed to the client.
+
+    :param message: The message to encode
+    """
+    data = message.dict()
+    payload = data['message']
+
+    if (
+        message.type == 'message'
+        and payload.get('task_id') is not None
+        and payload.get('status')
+        and payload.get('status') != 'PARTIAL'
+    ):
+        payload.pop('result', None)
+
+    return EncodedMessage(data)
+
+
+def get_coalesce_key(message: ServerMessage) -> Optional[Hashable]:
+    """
+    Get the key identifying which earlier messages a message supersedes, if any.
+
+    A task progress update supersedes earlier progress updates of the same task, and a store update supersedes
+    earlier updates of the same store, so only the latest of them has to be sent to a client.
+
+    :param message: The message to get the key for
+    """
+    if message.type != 'message':
+        return None
+
+    payload = message.message
+
+    if getattr(payload, 'status', None) == 'PROGRESS' and getattr(payload, 'task_id', None) is not None:
+        return ('progress', payload.task_id)   # type: ignore
+
+    if getattr(payload, 'store_uid', None) is not None:
+        return ('store', payload.store_uid)   # type: ignore
+
+    return None
+
+
+class SlowClientError(Exception):
+    """
+    Raised when a client falls so far behind the messages sent to it that its send queue is full
+    """
+
+
+class SendQueue:
+    """
+    Bounded queue of encoded messages waiting to be sent to a client.
+
+    A message with a coalesce key replaces a message with the same key still waiting in the queue, so a client which
+    is slow to read its messages only receives the latest task progress and store values. If the queue still fills
+    up, it is closed and the client should be disconnected.
+    """
+
+    def __init__(self, channel_id: str, max_size: int = DEFAULT_MAX_QUEUE_SIZE):
+        if max_size < 1:
+            raise ValueError('Max queue size must be at least 1')
+
+        self.channel_id = channel_id
+        self.max_size = max_size
+        self.overflowed = False
+        self._messages: 'OrderedDict[Hashable, Union[str, bytes]]' = OrderedDict()
+        self._counter = itertools.count()
+        self._event: Optional[Event] = None
+
+    def __len__(self):
+        return len(self._messages)
+
+    def put(self, data: Union[str, bytes], key: Optional[Hashable] = None):
+        """
+        Add a message to the queue, dropping the waiting message it supersedes if any.
+
+        Closes the queue if it is full.
+
+        :param data: The encoded message
+        :param key: The coalesce key of the message
+        """
+        if self.overflowed:
+            return
+
+        if key is not None and self._messages.pop(key, None) is not None:
+            WEBSOCKET_METRICS_TRACKER.record_dropped(self.channel_id)
+
+        if len(self._messages) >= self.max_size:
+            self.overflowed = True
+            self._messages.clear()
+        else:
+            self._messages[key if key is not None else next(self._counter)] = data
+
+        WEBSOCKET_METRICS_TRACKER.update_queue_depth(self.channel_id, len(self._messages))
+
+        if self._event is not None:
+            self._event.set()
+
+    def get_nowait(self) -> Union[str, bytes]:
+        """
+        Get the next message from the queue without waiting.
+
+        Raises an anyio.WouldBlock error if the queue is empty, or a SlowClientError if it overflowed.
+        """
+        if self.overflowed:
+            raise SlowClientError(f'Send queue of channel {self.channel_id} is full')
+
+        if len(self._messages) == 0:
+            raise anyio.WouldBlock
+
+        _, data = self._messages.popitem(last=False)
+        WEBSOCKET_METRICS_TRACKER.update_queue_depth(self.channel_id, len(self._messages))
+        return data
+
+    async def get(self) -> Union[str, bytes]:
+        """
+        Wait for the next message in the queue.
+
+        Raises a SlowClientError if the queue overflowed.
+        """
+        while True:
+            try:
+                return self.get_nowait()
+            except anyio.WouldBlock:
+                self._event = Event()
+                await self._event.wait()
+
 
 class WebSocketHandler:
     """
@@ -125,14 +330,14 @@ class WebSocketHandler:
     ID of the channel this handler is associated with.
     """
 
-    send_stream: MemoryObjectSendStream[ServerMessage]
+    encoding: WsEncoding
     """
-    Stream for the application to send messages to the client.
+    Wire encoding of the messages sent to the client.
     """
 
-    receive_stream: MemoryObjectReceiveStream[ServerMessage]
+    send_queue: SendQueue
     """
-    Stream containing messages to send to the client.
+    Queue of encoded messages to send to the client.
     """
 
     pending_responses: Dict[str, Tuple[Event, Optional[Any]]]
@@ -144,11 +349,12 @@ class WebSocketHandler:
     class Config:
         arbitrary_types_allowed = True
 
-    def __init__(self, channel_id: str):
-        send_stream, receive_stream = create_memory_object_stream[ServerMessage](math.inf)
+    def __init__(
+        self, channel_id: str, max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE, encoding: WsEncoding = WsEncoding.JSON
+    ):
         self.channel_id = channel_id
-        self.send_stream = send_stream
-        self.receive_stream = receive_stream
+        self.encoding = encoding
+        self.send_queue = SendQueue(channel_id, max_queue_size)
         self.pending_responses = {}
 
     async def send_message(self, message: ServerMessage):
@@ -157,7 +363,16 @@ class WebSocketHandler:
 
         :param message: The message to send
         """
-        await self.send_stream.send(message)
+        await self.send_encoded(encode_message(message), get_coalesce_key(message))
+
+    async def send_encoded(self, message: EncodedMessage, key: Optional[Hashable] = None):
+        """
+        Send a message already prepared with `encode_message` to the client, in the encoding of the client.
+
+        :param message: The encoded message to send
+        :param key: The coalesce key of the message, see `get_coalesce_key`
+        """
+        self.send_queue.put(message.encode(self.encoding), key)
 
     async def process_client_message(self, message: ClientMessage):
         """
@@ -221,7 +436,7 @@ class WebSocketHandler:
         ev = Event()
         self.pending_responses[message_id] = (ev, None)
         message.message.rchan = message_id
-        await self.send_stream.send(message)
+        await self.send_message(message)
 
         # Wait for the response; this is done in chunks as otherwise Jupyter blocks the event loop
         while not ev.is_set():
@@ -261,8 +476,20 @@ class WebsocketManager:
     Manages WebSocket connections to clients and communication with them.
     """
 
-    def __init__(self):
+    def __init__(self, max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE, msgpack: bool = False):
+        """
+        :param max_queue_size: maximum number of messages waiting to be sent to a client before it is disconnected
+        :param msgpack: whether clients can negotiate MessagePack encoded messages, requires the msgpack package
+        """
+        if msgpack and not is_msgpack_available():
+            raise ValueError(
+                'MessagePack websocket messages are enabled but msgpack is not installed. Please install the msgpack '
+                'package to use this feature.'
+            )
+
         self.handlers: Dict[str, WebSocketHandler] = {}
+        self.max_queue_size = max_queue_size
+        self.msgpack = msgpack
 
     def _construct_message(self, payload: LoosePayload, custom: bool) -> ServerMessage:
         """
@@ -276,13 +503,35 @@ class WebsocketManager:
         else:
             return DaraServerMessage(message=ServerMessagePayload.parse_obj(payload))
 
-    def create_handler(self, channel_id: str) -> WebSocketHandler:
+    def _encode_message(self, payload: LoosePayload, custom: bool) -> Tuple[EncodedMessage, Optional[Hashable]]:
+        """
+        Construct and encode a message to send to the client, returning it with its coalesce key
+
+        :param payload: The payload to send
+        :param custom: Whether the message is a custom message
+        """
+        message = self._construct_message(payload, custom)
+        return encode_message(message), get_coalesce_key(message)
+
+    def negotiate_encoding(self, requested: Optional[str]) -> WsEncoding:
+        """
+        Pick the wire encoding for a client, using the encoding it requested if the server supports it.
+
+        :param requested: The encoding requested by the client, if any
+        """
+        if requested == WsEncoding.MSGPACK.value and self.msgpack:
+            return WsEncoding.MSGPACK
+
+        return WsEncoding.JSON
+
+    def create_handler(self, channel_id: str, encoding: WsEncoding = WsEncoding.JSON) -> WebSocketHandler:
         """
         Create and register a new WebSocketHandler for the given channel_id.
 
         :param channel_id: The channel ID to create a handler for
+        :param encoding: The wire encoding of the messages sent to the client
         """
-        handler = WebSocketHandler(channel_id)
+        handler = WebSocketHandler(channel_id, self.max_queue_size, encoding)
         self.handlers[channel_id] = handler
         return handler
 
@@ -290,12 +539,15 @@ class WebsocketManager:
         """
         Send a message to all connected clients.
 
+        The message is encoded once and the same encoded message is queued for every client.
+
         :param message: The message to send
         :param custom: Whether the message is a custom message
         """
-        async with anyio.create_task_group() as tg:
-            for handler in self.handlers.values():
-                tg.start_soon(handler.send_message, self._construct_message(message, custom))
+        data, key = self._encode_message(message, custom)
+
+        for handler in list(self.handlers.values()):
+            await handler.send_encoded(data, key)
 
     async def send_message_to_user(self, user_id: str, message: LoosePayload, custom=False):
         """
@@ -305,14 +557,24 @@ class WebsocketManager:
         :param message: The message payload to send
         :param custom: Whether the message is a custom message
         """
-        channels = get_user_channels(user_id)
+        await self.send_message_to_channels(get_user_channels(user_id), message, custom)
 
-        if len(channels) == 0:
-            return
+    async def send_message_to_channels(self, channel_ids: Iterable[str], message: LoosePayload, custom=False):
+        """
+        Send a message to the clients associated with the given channel_ids, encoding it once for all of them.
+
+        :param channel_ids: The channel IDs to send the message to
+        :param message: The message payload to send
+        :param custom: Whether the message is a custom message
+        """
+        encoded: Optional[Tuple[EncodedMessage, Optional[Hashable]]] = None
 
-        async with anyio.create_task_group() as tg:
-            for channel in channels:
-                tg.start_soon(self.send_message, channel, message, custom)
+        for channel_id in channel_ids:
+            handler = self.handlers.get(channel_id)
+            if handler:
+                if encoded is None:
+                    encoded = self._encode_message(message, custom)
+                await handler.send_encoded(*encoded)
 
     async def send_message(self, channel_id: str, message: LoosePayload, custom=False):
         """
@@ -347,13 +609,21 @@ class WebsocketManager:
         if channel_id in self.handlers:
             del self.handlers[channel_id]
 
+        WEBSOCKET_METRICS_TRACKER.remove_channel(channel_id)
+
 
-async def ws_handler(websocket: WebSocket, token: Optional[str] = Query(default=None)):
+async def ws_handler(
+    websocket: WebSocket, token: Optional[str] = Query(default=None), encoding: Optional[str] = Query(default=None)
+):
     """
     Websocket handler. Used for live_reloading in dev mode and for notifying the UI of task results.
 
+    The encoding used for the messages sent to the client is negotiated when connecting: the client can request
+    MessagePack with the encoding query parameter, and the encoding picked is sent back in the init message.
+
     :param websocket: The websocket connection
     :param token: The authentication token
+    :param encoding: The wire encoding requested by the client, defaults to JSON
     """
     if token is None:
         raise HTTPException(403, 'Token missing from websocket connection query parameter')
@@ -423,10 +693,12 @@ async def ws_handler(websocket: WebSocket, token: Optional[str] = Query(default=
     ):
         try:
             # Create a handler for this connection
-            handler = ws_mgr.create_handler(channel)
+            handler = ws_mgr.create_handler(channel, ws_mgr.negotiate_encoding(encoding))
 
-            # Send the init message to tell the client it's channel
-            await websocket.send_json({'type': 'init', 'message': {'channel': channel}})
+            # Send the init message to tell the client its channel and the encoding of the messages it will receive
+            await websocket.send_json(
+                {'type': 'init', 'message': {'channel': channel, 'encoding': handler.encoding.value}}
+            )
 
             async with create_task_group() as tg:
 
@@ -455,19 +727,21 @@ async def ws_handler(websocket: WebSocket, token: Optional[str] = Query(default=
                     """
                     Handle messages sent to the client and pass them via the websocket
                     """
-                    async for message in handler.receive_stream:
-                        if (
-                            message.type == 'message'
-                            and isinstance(message.message, ServerMessagePayload)
-                            and getattr(message.message, 'task_id', None) is not None
-                            and getattr(message.message, 'status', None)
-                        ):
-                            data = message.message
-                            # Reconstruct the payload without the result field
-                            message.message = ServerMessagePayload(
-                                **{k: v for k, v in data.dict().items() if k != 'result'}
-                            )
-                        await websocket.send_json(jsonable_encoder(message))
+                    while True:
+                        try:
+                            data = await handler.send_queue.get()
+                        except SlowClientError:
+                            # The client can't keep up with its messages, disconnect it rather than let them pile up
+                            eng_logger.warning(f'Disconnecting websocket {channel}: {SLOW_CLIENT_CLOSE_REASON}')
+                            WEBSOCKET_METRICS_TRACKER.record_slow_client_disconnect()
+                            await websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason=SLOW_CLIENT_CLOSE_REASON)
+                            tg.cancel_scope.cancel()
+                            return
+
+                        if isinstance(data, bytes):
+                            await websocket.send_bytes(data)
+                        else:
+                            await websocket.send_text(data)
 
                 # Start the two tasks to handle sending and receiving messages
                 tg.start_soon(receive_from_client)
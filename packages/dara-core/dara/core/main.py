@@ -24,7 +24,7 @@ from inspect import iscoroutine
 from pathlib import Path
 from typing import Optional
 
-from anyio import create_task_group
+from anyio import CancelScope, create_task_group
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.encoders import ENCODERS_BY_TYPE
 from fastapi.responses import HTMLResponse
@@ -40,8 +40,9 @@ from dara.core.defaults import (
     top_menu_template,
     top_template,
 )
-from dara.core.internal.cache_store import CacheStore
-from dara.core.internal.cgroup import get_cpu_count, set_memory_limit
+from dara.core.internal.cache_store import CacheStore, MemoryGovernor
+from dara.core.internal.cache_store.governor import DEFAULT_MEMORY_FRACTION
+from dara.core.internal.cgroup import get_cpu_count, get_memory_limit, set_memory_limit
 from dara.core.internal.custom_response import CustomResponse
 from dara.core.internal.devtools import send_error_for_session
 from dara.core.internal.encoder_registry import encoder_registry
@@ -61,9 +62,9 @@ from dara.core.internal.registries import (
 from dara.core.internal.registry_lookup import RegistryLookup
 from dara.core.internal.routing import create_router, error_decorator
 from dara.core.internal.settings import get_settings
-from dara.core.internal.tasks import TaskManager
+from dara.core.internal.tasks import PROGRESS_NOTIFY_INTERVAL, TaskManager
 from dara.core.internal.utils import enforce_sso, import_config
-from dara.core.internal.websocket import WebsocketManager
+from dara.core.internal.websocket import DEFAULT_MAX_QUEUE_SIZE, WebsocketManager
 from dara.core.js_tooling.js_utils import (
     BuildCache,
     BuildMode,
@@ -130,8 +131,12 @@ def _start_application(config: Configuration):
 
         # Create a task group for the application so we can kick off tasks in the background
         async with create_task_group() as task_group:
-            ws_manager = WebsocketManager()
-            task_manager = TaskManager(task_group, ws_manager, store)
+            max_queue_size = int(os.environ.get('DARA_WS_MAX_QUEUE_SIZE', DEFAULT_MAX_QUEUE_SIZE))
+            ws_manager = WebsocketManager(
+                max_queue_size=max_queue_size, msgpack=os.environ.get('DARA_WS_MSGPACK') == 'TRUE'
+            )
+            progress_interval = float(os.environ.get('DARA_TASK_PROGRESS_INTERVAL', PROGRESS_NOTIFY_INTERVAL))
+            task_manager = TaskManager(task_group, ws_manager, store, progress_interval=progress_interval)
 
             # Add other internals
             utils_registry.set('TaskGroup', task_group)
@@ -154,10 +159,18 @@ def _start_application(config: Configuration):
                 # Default to number of CPUs - 1 (with minimum of 1)
                 cpu_count = get_cpu_count()
                 max_workers = int(os.environ.get('DARA_POOL_MAX_WORKERS', max(1, cpu_count - 1)))
+                min_idle_workers = min(int(os.environ.get('DARA_POOL_MIN_IDLE_WORKERS', 1)), max_workers)
+                max_tasks_per_worker = os.environ.get('DARA_POOL_MAX_TASKS_PER_WORKER')
+                max_worker_rss = os.environ.get('DARA_POOL_MAX_WORKER_RSS')
+                max_tasks_per_user = os.environ.get('DARA_POOL_MAX_TASKS_PER_USER')
                 dev_logger.info(
                     'Initializing task pool...',
                     {
                         'max_workers': max_workers,
+                        'min_idle_workers': min_idle_workers,
+                        'max_tasks_per_worker': max_tasks_per_worker,
+                        'max_worker_rss': max_worker_rss,
+                        'max_tasks_per_user': max_tasks_per_user,
                         'task_module': config.task_module,
                     },
                 )
@@ -165,11 +178,36 @@ def _start_application(config: Configuration):
                     task_group=task_group,
                     worker_parameters={'task_module': config.task_module},
                     max_workers=max_workers,
+                    min_idle_workers=min_idle_workers,
+                    max_tasks_per_worker=int(max_tasks_per_worker) if max_tasks_per_worker else None,
+                    max_worker_rss=int(max_worker_rss) if max_worker_rss else None,
+                    max_tasks_per_user=int(max_tasks_per_user) if max_tasks_per_user else None,
                 )
                 await task_pool.start(60)   # timeout after 60s
                 utils_registry.set('TaskPool', task_pool)
                 dev_logger.info('Task pool initialized')
 
+            # Bound the total size of cached values, by default to a share of the cgroup memory limit if there is one
+            cache_memory_budget: Optional[int] = None
+            memory_limit = get_memory_limit()
+            if os.environ.get('DARA_CACHE_MEMORY_BUDGET'):
+                cache_memory_budget = int(os.environ['DARA_CACHE_MEMORY_BUDGET'])
+            elif memory_limit is not None:
+                memory_fraction = float(os.environ.get('DARA_CACHE_MEMORY_FRACTION', DEFAULT_MEMORY_FRACTION))
+                cache_memory_budget = int(memory_limit * memory_fraction)
+            store.governor = MemoryGovernor(store, cache_memory_budget) if cache_memory_budget else None
+
+            # Optionally sweep expired cache entries periodically rather than only on access
+            sweeper_scope = CancelScope()
+            cache_sweep_interval = os.environ.get('DARA_CACHE_SWEEP_INTERVAL')
+            if cache_sweep_interval:
+
+                async def sweep_cache():
+                    with sweeper_scope:
+                        await store.sweep_expired(float(cache_sweep_interval))
+
+                task_group.start_soon(sweep_cache)
+
             # App is now ready, call user-defined startup functions
             eng_logger.info(f'Running {len(config.startup_functions)} local startup functions')
             for startup_function in config.startup_functions:
@@ -185,6 +223,7 @@ def _start_application(config: Configuration):
             # SHUTDOWN
             eng_logger.debug('App shutting down, attempting to cancel all tasks and shut down the task pool')
             await task_manager.cancel_all_tasks()
+            sweeper_scope.cancel()
 
             if task_pool is not None:
                 eng_logger.debug('Shutting down task pool...')
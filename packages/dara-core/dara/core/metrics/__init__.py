@@ -16,7 +16,19 @@ limitations under the License.
 """
 
 from dara.core.metrics.cache import CACHE_METRICS_TRACKER
+from dara.core.metrics.pool import POOL_METRICS_TRACKER
 from dara.core.metrics.runtime import RUNTIME_METRICS_TRACKER
+from dara.core.metrics.sizing import EntrySizes, estimate_size, register_sizer
 from dara.core.metrics.utils import total_size
+from dara.core.metrics.websocket import WEBSOCKET_METRICS_TRACKER
 
-__all__ = ['CACHE_METRICS_TRACKER', 'RUNTIME_METRICS_TRACKER', 'total_size']
+__all__ = [
+    'CACHE_METRICS_TRACKER',
+    'POOL_METRICS_TRACKER',
+    'RUNTIME_METRICS_TRACKER',
+    'WEBSOCKET_METRICS_TRACKER',
+    'EntrySizes',
+    'estimate_size',
+    'register_sizer',
+    'total_size',
+]
@@ -17,10 +17,25 @@ limitations under the License.
 
 from typing import Dict, Union
 
-from prometheus_client import Info
+from prometheus_client import Counter, Info
 from pydantic import BaseModel
 
 cache_metric = Info('cache_size', 'Current size of cache stores and registries', labelnames=['registry_name'])
+dataset_cache_hits = Counter('dataset_cache_hits', 'Number of datasets read from the shared dataset cache')
+dataset_cache_misses = Counter(
+    'dataset_cache_misses', 'Number of datasets read from disk into the shared dataset cache'
+)
+dataset_cache_evictions = Counter('dataset_cache_evictions', 'Number of datasets evicted from the shared dataset cache')
+cache_reclaimed_bytes = Counter(
+    'cache_store_reclaimed_bytes', 'Approximate number of bytes of expired entries evicted from the cache store'
+)
+cache_governor_evictions = Counter(
+    'cache_store_governor_evictions', 'Number of entries evicted from the cache store to stay within its memory budget'
+)
+cache_governor_evicted_bytes = Counter(
+    'cache_store_governor_evicted_bytes',
+    'Approximate number of bytes evicted from the cache store to stay within its memory budget',
+)
 
 
 def format_bytes(num: Union[int, float]) -> str:
@@ -56,6 +71,8 @@ class CacheMetricsTracker(BaseModel):
 
     registries: Dict[str, int] = {}
     cache_store: int = 0
+    indexes: int = 0
+    datasets: int = 0
 
     def update_registry(self, name: str, size: int):
         cache_metric.labels(f'{name} Registry').info({'size': format_bytes(size)})
@@ -67,8 +84,25 @@ class CacheMetricsTracker(BaseModel):
         self.cache_store = size
         self._update_total()
 
+    def record_reclaimed(self, size: int):
+        cache_reclaimed_bytes.inc(size)
+
+    def record_governor_evictions(self, count: int, size: int):
+        cache_governor_evictions.inc(count)
+        cache_governor_evicted_bytes.inc(size)
+
+    def update_indexes(self, size: int):
+        cache_metric.labels('Column Indexes').info({'size': format_bytes(size)})
+        self.indexes = size
+        self._update_total()
+
+    def update_datasets(self, size: int):
+        cache_metric.labels('Dataset Cache').info({'size': format_bytes(size)})
+        self.datasets = size
+        self._update_total()
+
     def _update_total(self):
-        total = sum(self.registries.values()) + self.cache_store
+        total = sum(self.registries.values()) + self.cache_store + self.indexes + self.datasets
         total = format_bytes(total)
         cache_metric.labels('Total').info({'size': total})
 
@@ -0,0 +1,67 @@
+"""
+Copyright 2023 Impulse Innovations Limited
+
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from dara.core.metrics.runtime import BUCKETS
+
+
+class PoolMetricsTracker:
+    def __init__(self) -> None:
+        self.worker_recycles = Counter(
+            'task_pool_worker_recycles',
+            'Number of task pool workers retired and replaced after reaching their task or memory limit',
+            labelnames=['reason'],
+        )
+        self.queue_depth = Gauge(
+            'task_pool_queue_depth', 'Number of tasks waiting for a free task pool worker', labelnames=['priority']
+        )
+        self.queue_wait = Histogram(
+            'task_pool_queue_wait',
+            'Time tasks waited between being submitted and a task pool worker picking them up',
+            labelnames=['priority'],
+            buckets=BUCKETS,
+        )
+
+    def record_recycle(self, reason: str):
+        """
+        Record a worker being recycled
+
+        :param reason: limit the worker reached, either 'max_tasks' or 'max_rss'
+        """
+        self.worker_recycles.labels(reason).inc()
+
+    def update_queue_depth(self, priority: str, depth: int):
+        """
+        Update the number of tasks waiting for a worker
+
+        :param priority: priority of the tasks
+        :param depth: number of tasks waiting
+        """
+        self.queue_depth.labels(priority).set(depth)
+
+    def observe_queue_wait(self, priority: str, seconds: float):
+        """
+        Record the time a task waited to be picked up by a worker
+
+        :param priority: priority of the task
+        :param seconds: number of seconds the task waited
+        """
+        self.queue_wait.labels(priority).observe(seconds)
+
+
+POOL_METRICS_TRACKER = PoolMetricsTracker()
@@ -15,6 +15,8 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from typing import Dict
+
 from prometheus_client import Histogram
 
 BUCKETS = (
@@ -67,5 +69,21 @@ class RuntimeMetricsTracker:
         name = self.clean_name(dv_id)
         return self.dv_histogram.labels(name)
 
+    def get_dv_mean_runtimes(self) -> Dict[str, float]:
+        """
+        Get the mean runtime in seconds of each derived variable which has run, keyed by its cleaned id
+        """
+        sums: Dict[str, float] = {}
+        counts: Dict[str, float] = {}
+
+        for metric in self.dv_histogram.collect():
+            for sample in metric.samples:
+                if sample.name.endswith('_sum'):
+                    sums[sample.labels['dv_name']] = sample.value
+                elif sample.name.endswith('_count'):
+                    counts[sample.labels['dv_name']] = sample.value
+
+        return {name: sums.get(name, 0) / count for name, count in counts.items() if count > 0}
+
 
 RUNTIME_METRICS_TRACKER = RuntimeMetricsTracker()
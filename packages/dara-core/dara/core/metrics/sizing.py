@@ -0,0 +1,280 @@
+"""
+Copyright 2023 Impulse Innovations Limited
+
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+from collections import deque
+from itertools import chain, islice
+from sys import getsizeof
+from typing import Any, Callable, Dict, Generic, Hashable, Iterable, Optional, TypeVar, Union
+
+import numpy
+import pyarrow
+from pandas import CategoricalDtype, DataFrame, Index, MultiIndex, Series
+from pydantic import BaseModel
+
+from dara.core.logging import dev_logger
+
+DEFAULT_SAMPLE_SIZE = int(os.environ.get('DARA_SIZE_SAMPLE_SIZE', 100))
+"""
+Number of items sized to estimate the size of larger containers and object columns, the size of the rest is
+extrapolated from them; 0 to size every item
+"""
+
+DEFAULT_OBJECT_SIZE = getsizeof(0)
+"""Size assumed for objects which do not implement __sizeof__"""
+
+
+class SizeEstimator:
+    """
+    Estimates the size of an object graph, counting objects reachable from several places in it once.
+
+    Values are sized by the sizer registered for their type with `register_sizer`, values of other types are
+    sized with getsizeof without looking at their contents.
+    """
+
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        """
+        :param sample_size: number of items sized for larger containers, 0 to size every item
+        """
+        self.sample_size = sample_size
+        self.seen: set = set()
+
+    def sizeof(self, o: Any) -> int:
+        """
+        Estimate the size of an object and its contents, or 0 if it was already counted.
+
+        :param o: object to size
+        """
+        if id(o) in self.seen:
+            return 0
+        self.seen.add(id(o))
+
+        sizer = get_sizer(type(o))
+        if sizer is None:
+            return getsizeof(o, DEFAULT_OBJECT_SIZE)
+        return sizer(o, self)
+
+    def sum_items(self, items: Iterable, count: int) -> int:
+        """
+        Estimate the total size of items of a container.
+        If there are more than `sample_size` items, only that many are sized and the total is extrapolated.
+
+        :param items: items to size
+        :param count: number of items
+        """
+        if self.sample_size <= 0 or count <= self.sample_size:
+            return sum(map(self.sizeof, items))
+
+        # Spread the sample over sequences, other containers can only be sampled from the start
+        if isinstance(items, (list, tuple, numpy.ndarray)):
+            sample = items[:: count // self.sample_size][: self.sample_size]
+        else:
+            sample = list(islice(items, self.sample_size))
+
+        return int(sum(map(self.sizeof, sample)) * count / len(sample))
+
+
+Sizer = Callable[[Any, SizeEstimator], int]
+
+SIZERS: Dict[type, Sizer] = {}
+_sizers_by_type: Dict[type, Optional[Sizer]] = {}
+
+
+def register_sizer(typ: type, sizer: Sizer):
+    """
+    Register a function estimating the size of values of a given type or its subclasses.
+
+    ```
+        register_sizer(MyContainer, lambda value, estimator: getsizeof(value) + estimator.sizeof(value.items))
+    ```
+
+    :param typ: type of values to size
+    :param sizer: function taking a value and the estimator to size its contents with, returning its size in bytes
+    """
+    SIZERS[typ] = sizer
+    _sizers_by_type.clear()
+
+
+def get_sizer(typ: type) -> Optional[Sizer]:
+    """
+    Get the sizer registered for a type or the closest of its base classes.
+
+    :param typ: type of values to size
+    """
+    if typ not in _sizers_by_type:
+        _sizers_by_type[typ] = next((SIZERS[base] for base in typ.__mro__ if base in SIZERS), None)
+    return _sizers_by_type[typ]
+
+
+def _size_collection(o: Any, estimator: SizeEstimator) -> int:
+    return getsizeof(o) + estimator.sum_items(o, len(o))
+
+
+def _size_dict(o: dict, estimator: SizeEstimator) -> int:
+    return getsizeof(o) + estimator.sum_items(chain.from_iterable(o.items()), len(o) * 2)
+
+
+def _size_model(o: BaseModel, estimator: SizeEstimator) -> int:
+    return getsizeof(o) + estimator.sizeof(o.__dict__)
+
+
+def _size_objects(values: numpy.ndarray, estimator: SizeEstimator) -> int:
+    """
+    Size the objects pointed to by an array, which are not included in its nbytes
+    """
+    if values.dtype != object:
+        return 0
+    return estimator.sum_items(values.ravel(), values.size)
+
+
+def _size_values(o: Union[Index, Series], estimator: SizeEstimator) -> int:
+    """
+    Size the objects held by an Index or Series, which are not included in its shallow memory usage.
+    Only object arrays and the categories of categoricals are converted to numpy, so other values are not copied.
+    """
+    if isinstance(o.dtype, CategoricalDtype):
+        return _size_objects(o.dtype.categories.to_numpy(), estimator)
+    if o.dtype == object:
+        return _size_objects(o.to_numpy(), estimator)
+    return 0
+
+
+def _size_array(o: numpy.ndarray, estimator: SizeEstimator) -> int:
+    return o.nbytes + _size_objects(o, estimator)
+
+
+def _size_index(o: Index, estimator: SizeEstimator) -> int:
+    # Levels and codes, converting to numpy would build an array of tuples and MultiIndex.memory_usage builds
+    # its lookup engine. Lookup engines are rebuilt on demand so only the values are counted.
+    if isinstance(o, MultiIndex):
+        return sum(_size_index(level, estimator) for level in o.levels) + sum(codes.nbytes for codes in o.codes)
+    return int(o.nbytes) + _size_values(o, estimator)
+
+
+def _size_series(o: Series, estimator: SizeEstimator) -> int:
+    return int(o.memory_usage(index=False, deep=False)) + _size_values(o, estimator) + estimator.sizeof(o.index)
+
+
+def _size_data_frame(o: DataFrame, estimator: SizeEstimator) -> int:
+    size = int(o.memory_usage(index=False, deep=False).sum()) + estimator.sizeof(o.index)
+    for i, dtype in enumerate(o.dtypes):
+        if dtype == object or isinstance(dtype, CategoricalDtype):
+            size += _size_values(o.iloc[:, i], estimator)
+    return size
+
+
+def _size_arrow(o: Any, estimator: SizeEstimator) -> int:
+    return o.nbytes
+
+
+for _typ in (list, tuple, set, frozenset, deque):
+    register_sizer(_typ, _size_collection)
+register_sizer(dict, _size_dict)
+register_sizer(BaseModel, _size_model)
+register_sizer(numpy.ndarray, _size_array)
+register_sizer(Index, _size_index)
+register_sizer(Series, _size_series)
+register_sizer(DataFrame, _size_data_frame)
+for _typ in (pyarrow.Array, pyarrow.ChunkedArray, pyarrow.RecordBatch, pyarrow.Table):
+    register_sizer(_typ, _size_arrow)
+
+
+def estimate_size(o: object, sample_size: int = DEFAULT_SAMPLE_SIZE) -> int:
+    """
+    Returns a fast estimate of the memory footprint of an object and its contents.
+
+    Unlike total_size, values are sized by per-type sizers: DataFrames, Series and numpy arrays are sized from the
+    buffers they hold, with only a sample of the objects of object columns sized, and only a sample of the items of
+    larger containers is sized.
+
+    :param o: object to size
+    :param sample_size: number of items sized for larger containers, 0 to size every item
+    """
+    if o is None:
+        return 0
+
+    try:
+        return SizeEstimator(sample_size).sizeof(o)
+    except Exception as e:
+        dev_logger.warning('Failed to estimate object size', {'object': o, 'exception': e})
+        return 0
+
+
+KeyT = TypeVar('KeyT', bound=Hashable)
+
+
+class EntrySizes(Generic[KeyT]):
+    """
+    Estimated sizes of the entries of a store, kept per entry so that overwriting or removing an entry does not
+    require sizing its previous value again.
+    """
+
+    def __init__(self, on_change: Optional[Callable[[int], None]] = None):
+        """
+        :param on_change: optional callback invoked with the change in total size whenever it changes
+        """
+        self.sizes: Dict[KeyT, int] = {}
+        self.size = 0
+        self.on_change = on_change
+
+    def _resize(self, delta: int):
+        if delta == 0:
+            return
+
+        self.size += delta
+        if self.on_change is not None:
+            self.on_change(delta)
+
+    def get(self, key: KeyT) -> int:
+        """
+        Get the size of an entry, 0 if it is not tracked.
+
+        :param key: key of the entry
+        """
+        return self.sizes.get(key, 0)
+
+    def set(self, key: KeyT, value: Any) -> int:
+        """
+        Size the new value of an entry, replacing the size of its previous value.
+
+        :param key: key of the entry
+        :param value: new value of the entry
+        :return: The size of the value.
+        """
+        size = estimate_size(value)
+        previous_size = self.sizes.get(key, 0)
+        self.sizes[key] = size
+        self._resize(size - previous_size)
+        return size
+
+    def pop(self, key: KeyT) -> int:
+        """
+        Stop tracking an entry.
+
+        :param key: key of the entry
+        :return: The size of the entry removed, 0 if it was not tracked.
+        """
+        size = self.sizes.pop(key, 0)
+        self._resize(-size)
+        return size
+
+    def clear(self):
+        """
+        Stop tracking all entries.
+        """
+        self.sizes = {}
+        self._resize(-self.size)
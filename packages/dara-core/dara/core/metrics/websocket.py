@@ -0,0 +1,74 @@
+"""
+Copyright 2023 Impulse Innovations Limited
+
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from prometheus_client import Counter, Gauge
+
+
+class WebsocketMetricsTracker:
+    def __init__(self) -> None:
+        self.queue_depth = Gauge(
+            'websocket_send_queue_depth',
+            'Number of messages waiting to be sent to a websocket client',
+            labelnames=['channel'],
+        )
+        self.dropped_messages = Counter(
+            'websocket_dropped_messages',
+            'Number of messages to a websocket client dropped because a newer message superseded them',
+            labelnames=['channel'],
+        )
+        self.slow_client_disconnects = Counter(
+            'websocket_slow_client_disconnects',
+            'Number of websocket clients disconnected for not keeping up with the messages sent to them',
+        )
+
+    def update_queue_depth(self, channel: str, depth: int):
+        """
+        Update the number of messages waiting to be sent to a client
+
+        :param channel: channel of the client
+        :param depth: number of messages waiting
+        """
+        self.queue_depth.labels(channel).set(depth)
+
+    def record_dropped(self, channel: str):
+        """
+        Record a message superseded before being sent to a client
+
+        :param channel: channel of the client
+        """
+        self.dropped_messages.labels(channel).inc()
+
+    def record_slow_client_disconnect(self):
+        """
+        Record a client being disconnected for falling behind
+        """
+        self.slow_client_disconnects.inc()
+
+    def remove_channel(self, channel: str):
+        """
+        Stop reporting metrics for a disconnected channel
+
+        :param channel: channel of the client
+        """
+        for metric in (self.queue_depth, self.dropped_messages):
+            try:
+                metric.remove(channel)
+            except KeyError:
+                pass
+
+
+WEBSOCKET_METRICS_TRACKER = WebsocketMetricsTracker()
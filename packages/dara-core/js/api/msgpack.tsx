@@ -0,0 +1,160 @@
+/* eslint-disable import/prefer-default-export */
+const textDecoder = new TextDecoder();
+
+/**
+ * Decoder for the MessagePack binary frames sent by the server.
+ *
+ * Supports every MessagePack type apart from extension types, which the server never sends. 64-bit integers are
+ * decoded to numbers and map keys to strings, so that decoded messages match their JSON counterpart.
+ */
+class MsgPackDecoder {
+    bytes: Uint8Array;
+
+    view: DataView;
+
+    offset = 0;
+
+    constructor(bytes: Uint8Array) {
+        this.bytes = bytes;
+        this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    }
+
+    /**
+     * Advance the offset by a number of bytes, returning the offset before advancing
+     *
+     * @param size the number of bytes read
+     */
+    advance(size: number): number {
+        const start = this.offset;
+
+        if (start + size > this.bytes.byteLength) {
+            throw new Error('Unexpected end of MessagePack data');
+        }
+
+        this.offset += size;
+        return start;
+    }
+
+    readArray(length: number): unknown[] {
+        const result = new Array(length);
+
+        for (let i = 0; i < length; i++) {
+            result[i] = this.readValue();
+        }
+
+        return result;
+    }
+
+    readBinary(length: number): Uint8Array {
+        const start = this.advance(length);
+        return this.bytes.slice(start, start + length);
+    }
+
+    readMap(length: number): Record<string, unknown> {
+        const result: Record<string, unknown> = {};
+
+        for (let i = 0; i < length; i++) {
+            const key = String(this.readValue());
+            result[key] = this.readValue();
+        }
+
+        return result;
+    }
+
+    readString(length: number): string {
+        const start = this.advance(length);
+        return textDecoder.decode(this.bytes.subarray(start, start + length));
+    }
+
+    readValue(): unknown {
+        const type = this.view.getUint8(this.advance(1));
+
+        // positive fixint
+        if (type <= 0x7f) {
+            return type;
+        }
+        // fixmap
+        if (type <= 0x8f) {
+            return this.readMap(type - 0x80);
+        }
+        // fixarray
+        if (type <= 0x9f) {
+            return this.readArray(type - 0x90);
+        }
+        // fixstr
+        if (type <= 0xbf) {
+            return this.readString(type - 0xa0);
+        }
+        // negative fixint
+        if (type >= 0xe0) {
+            return type - 0x100;
+        }
+
+        switch (type) {
+            case 0xc0:
+                return null;
+            case 0xc2:
+                return false;
+            case 0xc3:
+                return true;
+            case 0xc4:
+                return this.readBinary(this.view.getUint8(this.advance(1)));
+            case 0xc5:
+                return this.readBinary(this.view.getUint16(this.advance(2)));
+            case 0xc6:
+                return this.readBinary(this.view.getUint32(this.advance(4)));
+            case 0xca:
+                return this.view.getFloat32(this.advance(4));
+            case 0xcb:
+                return this.view.getFloat64(this.advance(8));
+            case 0xcc:
+                return this.view.getUint8(this.advance(1));
+            case 0xcd:
+                return this.view.getUint16(this.advance(2));
+            case 0xce:
+                return this.view.getUint32(this.advance(4));
+            case 0xcf:
+                return Number(this.view.getBigUint64(this.advance(8)));
+            case 0xd0:
+                return this.view.getInt8(this.advance(1));
+            case 0xd1:
+                return this.view.getInt16(this.advance(2));
+            case 0xd2:
+                return this.view.getInt32(this.advance(4));
+            case 0xd3:
+                return Number(this.view.getBigInt64(this.advance(8)));
+            case 0xd9:
+                return this.readString(this.view.getUint8(this.advance(1)));
+            case 0xda:
+                return this.readString(this.view.getUint16(this.advance(2)));
+            case 0xdb:
+                return this.readString(this.view.getUint32(this.advance(4)));
+            case 0xdc:
+                return this.readArray(this.view.getUint16(this.advance(2)));
+            case 0xdd:
+                return this.readArray(this.view.getUint32(this.advance(4)));
+            case 0xde:
+                return this.readMap(this.view.getUint16(this.advance(2)));
+            case 0xdf:
+                return this.readMap(this.view.getUint32(this.advance(4)));
+            default:
+                throw new Error(`Unsupported MessagePack type: 0x${type.toString(16)}`);
+        }
+    }
+}
+
+/**
+ * Decode a MessagePack encoded value
+ *
+ * @param bytes the encoded value
+ */
+export function decodeMsgPack(bytes: Uint8Array): unknown {
+    const decoder = new MsgPackDecoder(bytes);
+    const value = decoder.readValue();
+
+    if (decoder.offset !== bytes.byteLength) {
+        throw new Error('Unexpected trailing bytes after MessagePack data');
+    }
+
+    return value;
+}
@@ -3,14 +3,22 @@ import { filter, map, take } from 'rxjs/operators';
 
 import type { ActionImpl, AnyVariable } from '@/types';
 
+import { decodeMsgPack } from './msgpack';
+
 const interAttemptTimeout = 500;
 const maxDisconnectedTime = 10000;
 const interPingInterval = 5000;
 const maxAttempts = Math.round(maxDisconnectedTime / interAttemptTimeout);
 
+/**
+ * Wire encoding of the messages sent by the server, negotiated when connecting
+ */
+type WebSocketEncoding = 'json' | 'msgpack';
+
 interface InitMessage {
     message: {
         channel: 'string';
+        encoding?: WebSocketEncoding;
     };
     type: 'init';
 }
@@ -24,6 +32,7 @@ export enum TaskStatus {
     CANCELED = 'CANCELED',
     COMPLETE = 'COMPLETE',
     ERROR = 'ERROR',
+    PARTIAL = 'PARTIAL',
     PROGRESS = 'PROGRESS',
 }
 
@@ -37,6 +46,15 @@ export interface ProgressNotificationMessage {
     type: 'message';
 }
 
+export interface PartialResultNotificationMessage {
+    message: {
+        result: any;
+        status: TaskStatus.PARTIAL;
+        task_id: string;
+    };
+    type: 'message';
+}
+
 export interface TaskNotificationMessage {
     message: {
         status: TaskStatus;
@@ -104,6 +122,7 @@ export type WebSocketMessage =
     | PingPongMessage
     | TaskNotificationMessage
     | ProgressNotificationMessage
+    | PartialResultNotificationMessage
     | ServerTriggerMessage
     | ServerErrorMessage
     | VariableRequestMessage
@@ -111,6 +130,19 @@ export type WebSocketMessage =
     | BackendStoreMessage
     | CustomMessage;
 
+/**
+ * Decode a message received from the server, either a JSON text frame or a MessagePack binary frame
+ *
+ * @param data the data of the message event
+ */
+function decodeMessage(data: string | ArrayBuffer): WebSocketMessage {
+    if (typeof data === 'string') {
+        return JSON.parse(data) as WebSocketMessage;
+    }
+
+    return decodeMsgPack(new Uint8Array(data)) as WebSocketMessage;
+}
+
 function isInitMessage(message: WebSocketMessage): message is InitMessage {
     return message.type === 'init';
 }
@@ -154,6 +186,7 @@ export interface WebSocketClientInterface {
     channel$: () => Observable<string>;
     customMessages$: () => Observable<CustomMessage>;
     getChannel: () => Promise<string>;
+    partialResults$: (...task_ids: string[]) => Observable<PartialResultNotificationMessage>;
     progressUpdates$: (...task_ids: string[]) => Observable<ProgressNotificationMessage>;
     sendCustomMessage: (kind: string, data: any) => void;
     sendMessage(value: any, channel: string, chunkCount?: number): void;
@@ -208,7 +241,10 @@ export class WebSocketClient implements WebSocketClientInterface {
         // Create the underlying socket instance from the url and token
         const url = new URL(this.#socketUrl);
         url.searchParams.set('token', this.token);
+        // Ask for MessagePack encoded messages, the server falls back to JSON if it does not support them
+        url.searchParams.set('encoding', 'msgpack');
         const socket = new WebSocket(url);
+        socket.binaryType = 'arraybuffer';
 
         // Send heartbeat to ping every few seconds and clear it on error
         this.#pingInterval = setInterval(() => {
@@ -224,14 +260,14 @@ export class WebSocketClient implements WebSocketClientInterface {
 
         // Register the message event listener to start the stream of messages and get the new channel
         socket.addEventListener('message', (ev) => {
-            const msg = JSON.parse(ev.data) as WebSocketMessage;
+            const msg = decodeMessage(ev.data);
             this.messages$.next(msg);
         });
 
         // Update the channel on the class and broadcast the init message to subscribers
         this.channel = new Promise((resolve) => {
             const handler = (ev: MessageEvent<any>): void => {
-                const msg = JSON.parse(ev.data) as WebSocketMessage;
+                const msg = decodeMessage(ev.data);
                 if (msg.type === 'init') {
                     this.#reconnectCount = 0;
                     this.messages$.next(msg);
@@ -343,6 +379,22 @@ export class WebSocketClient implements WebSocketClientInterface {
         );
     }
 
+    /**
+     * Get the observable to receive partial results streamed by given tasks before they complete
+     *
+     * @param task_ids the ids of the task to receive partial results from; partial results of all tasks if none
+     */
+    partialResults$(...task_ids: string[]): Observable<PartialResultNotificationMessage> {
+        return this.messages$.pipe(
+            filter(
+                (msg): msg is PartialResultNotificationMessage =>
+                    isTaskNotification(msg) &&
+                    msg.message.status === TaskStatus.PARTIAL &&
+                    (task_ids.length === 0 || task_ids.includes(msg.message.task_id))
+            )
+        );
+    }
+
     /**
      * Get the observable to receive server trigger messages for a given data variable
      *
@@ -401,7 +453,8 @@ export class WebSocketClient implements WebSocketClientInterface {
                     (msg) =>
                         isTaskNotification(msg) &&
                         msg.message?.task_id === task_id &&
-                        msg.message.status !== TaskStatus.PROGRESS // don't take progress updates
+                        msg.message.status !== TaskStatus.PROGRESS && // don't take progress updates
+                        msg.message.status !== TaskStatus.PARTIAL // or partial results
                 ),
                 map((msg) => {
                     if (isTaskNotification(msg) && msg.message.status === TaskStatus.CANCELED) {
@@ -107,6 +107,7 @@ export {
     useAnyVariable,
     resolveValue,
     useVariableValue,
+    usePartialResult,
     normalizeRequest,
     WebSocketCtx,
     DARA_JWT_TOKEN,
@@ -40,6 +40,7 @@ export {
     useAnyVariable,
     resolveValue,
     useVariableValue,
+    usePartialResult,
 } from './interactivity';
 export { useEventBus, EventBus, EventCapturer } from './event-bus/event-bus';
 export { default as Wrapper } from './wrapper/wrapper';
@@ -1,4 +1,5 @@
 /* eslint-disable react-hooks/exhaustive-deps */
+import { DataType, Precision, Table, Vector, tableFromIPC } from 'apache-arrow';
 import { useCallback, useRef } from 'react';
 import { atom } from 'recoil';
 
@@ -57,6 +58,148 @@ function createDataUrl(path: string, pagination?: Pagination): URL {
     return url;
 }
 
+/**
+ * Media type of the Arrow IPC streaming format, the backend streams DataFrames in this format when it is accepted
+ */
+const ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream';
+
+/**
+ * Accept header for data requests; prefers Arrow but lets the backend fall back to JSON
+ */
+const DATA_ACCEPT_HEADER = `${ARROW_STREAM_MEDIA_TYPE}, application/json;q=0.9`;
+
+/**
+ * Convert a value read from an Arrow vector to the value JSON responses hold for it:
+ * 64-bit integers are read as BigInts and dates as Date objects, JSON holds numbers and epoch milliseconds
+ *
+ * @param value value to convert
+ */
+function toJsonValue(value: unknown): unknown {
+    if (typeof value === 'bigint') {
+        return Number(value);
+    }
+
+    if (value instanceof Date) {
+        return value.getTime();
+    }
+
+    return value;
+}
+
+/**
+ * Read all values of an Arrow column at once, converted to the values JSON responses hold.
+ *
+ * Float columns without nulls are read straight from their buffers, other columns are read with the column iterator,
+ * which walks each chunk once rather than looking up the chunk of every value.
+ *
+ * @param column column to read
+ * @param numRows number of rows of the table
+ */
+function readColumn(column: Vector | null, numRows: number): ArrayLike<unknown> {
+    if (!column) {
+        return new Array(numRows).fill(undefined);
+    }
+
+    if (column.nullCount === 0 && DataType.isFloat(column.type) && column.type.precision !== Precision.HALF) {
+        return column.toArray();
+    }
+
+    return Array.from(column, toJsonValue);
+}
+
+/**
+ * Create an array of records whose rows are only built when they are first accessed.
+ *
+ * Any access to a row - indexing, iterating, spreading or serializing the array - builds it and stores it in the
+ * array, so the result behaves as a plain array of records while a page which is only partially rendered, or not
+ * rendered at all, never builds every row.
+ *
+ * @param numRows number of rows
+ * @param buildRow function building the row at a given position
+ */
+function lazyRecords(numRows: number, buildRow: (row: number) => Record<string, unknown>): DataFrame {
+    const records: DataFrame = new Array(numRows);
+
+    const materialize = (prop: string | symbol): void => {
+        if (typeof prop !== 'string') {
+            return;
+        }
+
+        const row = Number(prop);
+
+        if (Number.isInteger(row) && row >= 0 && row < numRows && String(row) === prop && !(prop in records)) {
+            records[row] = buildRow(row);
+        }
+    };
+
+    const materializeAll = (): void => {
+        for (let row = 0; row < numRows; row++) {
+            materialize(String(row));
+        }
+    };
+
+    return new Proxy(records, {
+        get(target, prop, receiver) {
+            materialize(prop);
+            return Reflect.get(target, prop, receiver);
+        },
+        getOwnPropertyDescriptor(target, prop) {
+            materialize(prop);
+            return Reflect.getOwnPropertyDescriptor(target, prop);
+        },
+        has(target, prop) {
+            materialize(prop);
+            return Reflect.has(target, prop);
+        },
+        ownKeys(target) {
+            materializeAll();
+            return Reflect.ownKeys(target);
+        },
+        // Rows cannot be added once the array is frozen, i.e. by recoil
+        preventExtensions(target) {
+            materializeAll();
+            return Reflect.preventExtensions(target);
+        },
+    });
+}
+
+/**
+ * Convert an Arrow table into records matching the records JSON responses hold.
+ *
+ * Values are converted column by column, and each row is only built from the converted columns when accessed.
+ *
+ * @param table table to convert
+ */
+export function tableToRecords(table: Table): DataFrame {
+    const names = table.schema.fields.map((field) => field.name);
+    const columns = names.map((_, idx) => readColumn(table.getChildAt(idx), table.numRows));
+
+    return lazyRecords(table.numRows, (row) => {
+        const record: Record<string, unknown> = {};
+
+        for (let idx = 0; idx < names.length; idx++) {
+            record[names[idx]] = columns[idx][row];
+        }
+
+        return record;
+    });
+}
+
+/**
+ * Parse a data variable response, decoding Arrow IPC streams if the backend sent one.
+ *
+ * Arrow responses are decoded into records with the same values as the JSON response would hold, see `tableToRecords`.
+ *
+ * @param response response to parse
+ */
+async function parseDataResponse<T>(response: Response): Promise<DataFrame | T> {
+    if (response.headers.get('Content-Type')?.includes(ARROW_STREAM_MEDIA_TYPE)) {
+        return tableToRecords(tableFromIPC(new Uint8Array(await response.arrayBuffer())));
+    }
+
+    return response.json();
+}
+
 /**
  * Retrieve the value of a data variable from the backend
  *
@@ -73,10 +216,14 @@ export async function fetchDataVariable(
 ): Promise<DataFrame> {
     const url = createDataUrl(`/api/core/data-variable/${uid}`, pagination);
 
-    const response = await request(url, { body: JSON.stringify({ filters }), method: HTTP_METHOD.POST }, extras);
+    const response = await request(
+        url,
+        { body: JSON.stringify({ filters }), headers: { Accept: DATA_ACCEPT_HEADER }, method: HTTP_METHOD.POST },
+        extras
+    );
     await handleAuthErrors(response, true);
     await validateResponse(response, 'Failed to fetch data variable');
-    return response.json();
+    return parseDataResponse<DataFrame>(response);
 }
 
 interface TaskResponse {
@@ -113,12 +260,16 @@ export async function fetchDerivedDataVariable(
     const url = createDataUrl(`/api/core/data-variable/${uid}`, pagination);
     const response = await request(
         url,
-        { body: JSON.stringify({ cache_key: cacheKey, filters, ws_channel: wsChannel }), method: HTTP_METHOD.POST },
+        {
+            body: JSON.stringify({ cache_key: cacheKey, filters, ws_channel: wsChannel }),
+            headers: { Accept: DATA_ACCEPT_HEADER },
+            method: HTTP_METHOD.POST,
+        },
         extras
     );
     await handleAuthErrors(response, true);
     await validateResponse(response, 'Failed to fetch data variable');
-    return response.json();
+    return parseDataResponse<TaskResponse | null>(response);
 }
 
 /**
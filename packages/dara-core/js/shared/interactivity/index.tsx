@@ -6,4 +6,5 @@ export { TriggerIndexValue } from './store';
 export { useDataVariable } from './use-data-variable';
 export { combineFilters } from './filtering';
 export { default as useRefreshSelector } from './use-refresh-selector';
+export { default as usePartialResult } from './use-partial-result';
 export { default as useVariableState } from './use-variable-state';
@@ -0,0 +1,33 @@
+import { useContext, useEffect, useState } from 'react';
+
+import { useTaskContext } from '@/shared/context/global-task-context';
+import websocketCtx from '@/shared/context/websocket-context';
+import { DerivedVariable } from '@/types';
+
+/**
+ * Helper hook to get the latest partial result yielded by the task computing a DerivedVariable with
+ * `run_as_task=True` whose function is a generator. DataFrames are received as records.
+ *
+ * The value of the variable itself only updates once the task completes, so this can be used e.g. in a loading
+ * fallback to show the results computed so far. Returns null until a partial result is received.
+ *
+ * @param variable the derived variable to get partial results of
+ */
+export default function usePartialResult<T = any>(variable: DerivedVariable): T | null {
+    const taskContext = useTaskContext();
+    const { client: wsClient } = useContext(websocketCtx);
+    const [partialResult, setPartialResult] = useState<T | null>(null);
+
+    useEffect(() => {
+        // Tasks are registered by the variable selector once started, so match them as results arrive
+        const subscription = wsClient.partialResults$().subscribe((notif) => {
+            if (taskContext.getVariableTasks(variable.uid).includes(notif.message.task_id)) {
+                setPartialResult(notif.message.result);
+            }
+        });
+
+        return () => subscription.unsubscribe();
+    }, [wsClient, taskContext, variable.uid]);
+
+    return partialResult;
+}
@@ -0,0 +1,35 @@
+import { decodeMsgPack } from '@/api/msgpack';
+
+describe('decodeMsgPack', () => {
+    it('decodes scalar values', () => {
+        expect(decodeMsgPack(new Uint8Array([0xc0]))).toBeNull();
+        expect(decodeMsgPack(new Uint8Array([0xc3]))).toBe(true);
+        expect(decodeMsgPack(new Uint8Array([0x7f]))).toBe(127);
+        expect(decodeMsgPack(new Uint8Array([0xff]))).toBe(-1);
+        expect(decodeMsgPack(new Uint8Array([0xcd, 0x01, 0x00]))).toBe(256);
+        expect(decodeMsgPack(new Uint8Array([0xd1, 0xff, 0x7f]))).toBe(-129);
+        expect(decodeMsgPack(new Uint8Array([0xcb, 0x3f, 0xf8, 0, 0, 0, 0, 0, 0]))).toBe(1.5);
+        expect(decodeMsgPack(new Uint8Array([0xa3, 0x61, 0x62, 0x63]))).toBe('abc');
+    });
+
+    it('decodes 64-bit integers to numbers', () => {
+        expect(decodeMsgPack(new Uint8Array([0xcf, 0, 0, 0, 0x01, 0, 0, 0, 0]))).toBe(2 ** 32);
+        expect(decodeMsgPack(new Uint8Array([0xd3, 0xff, 0xff, 0xff, 0xfe, 0xff, 0xff, 0xff, 0xff]))).toBe(
+            -(2 ** 32) - 1
+        );
+    });
+
+    it('decodes nested maps and arrays', () => {
+        // {"type": "message", "message": {"values": [1, null], "1": true}}
+        const bytes = new Uint8Array([
+            0x82, 0xa4, 0x74, 0x79, 0x70, 0x65, 0xa7, 0x6d, 0x65, 0x73, 0x73, 0x61, 0x67, 0x65, 0xa7, 0x6d, 0x65, 0x73,
+            0x73, 0x61, 0x67, 0x65, 0x82, 0xa6, 0x76, 0x61, 0x6c, 0x75, 0x65, 0x73, 0x92, 0x01, 0xc0, 0x01, 0xc3,
+        ]);
+
+        expect(decodeMsgPack(bytes)).toEqual({ message: { '1': true, values: [1, null] }, type: 'message' });
+    });
+
+    it('throws on truncated data', () => {
+        expect(() => decodeMsgPack(new Uint8Array([0x92, 0x01]))).toThrow('Unexpected end of MessagePack data');
+    });
+});
@@ -1,7 +1,9 @@
 import { act, renderHook } from '@testing-library/react';
+import { tableFromArrays, tableToIPC } from 'apache-arrow';
 import { rest } from 'msw';
 
 import { EventCapturer, combineFilters, useDataVariable } from '../../js/shared';
+import { tableToRecords } from '../../js/shared/interactivity/data-variable';
 import { DaraEventMap, DataVariable, DerivedDataVariable, FilterQuery, Pagination, SingleVariable } from '../../js/types';
 import { MockWebSocketClient, Wrapper, server } from './utils';
 import { mockLocalStorage } from './utils/mock-storage';
@@ -119,6 +121,43 @@ describe('useDataVariable', () => {
             expect(responseMeta.order_by).toEqual('col1');
         });
 
+        it('decodes Arrow responses into plain records', async () => {
+            const table = tableFromArrays({
+                __index__: BigInt64Array.from([BigInt(0), BigInt(1)]),
+                col1: BigInt64Array.from([BigInt(5), BigInt(-3)]),
+                col2: Float64Array.from([0.5, 1.5]),
+            });
+
+            server.use(
+                rest.post('/api/core/data-variable/:uid', async (req, res, ctx) => {
+                    return res(
+                        ctx.set('Content-Type', 'application/vnd.apache.arrow.stream'),
+                        ctx.body(tableToIPC(table, 'stream'))
+                    );
+                })
+            );
+
+            const dataVariable: DataVariable = {
+                __typename: 'DataVariable',
+                cache: {
+                    policy: 'keep-all',
+                    cache_type: 'global',
+                },
+                filters: null,
+                uid: 'arrow',
+            };
+
+            const { result } = renderHook(() => useDataVariable(dataVariable), { wrapper: Wrapper });
+            const dataResponse = await result.current();
+
+            // int64 columns are read as numbers rather than BigInts, matching JSON responses
+            expect(dataResponse.data).toEqual([
+                { __index__: 0, col1: 5, col2: 0.5 },
+                { __index__: 1, col1: -3, col2: 1.5 },
+            ]);
+            expect(dataResponse.totalCount).toEqual(10);
+        });
+
         it('callback updates when server trigger is received', () => {
             const dataVariable: DataVariable = {
                 __typename: 'DataVariable',
@@ -318,3 +357,36 @@ describe('useDataVariable', () => {
         });
     });
 });
+
+describe('tableToRecords', () => {
+    it('converts columns to the values JSON responses hold', () => {
+        const table = tableFromArrays({
+            __index__: BigInt64Array.from([BigInt(0), BigInt(1), BigInt(2)]),
+            col1: Float64Array.from([0.5, 1.5, 2.5]),
+            col2: ['a', null, 'c'],
+        });
+
+        const records = tableToRecords(table);
+
+        expect(records).toHaveLength(3);
+        expect(records[1]).toEqual({ __index__: 1, col1: 1.5, col2: null });
+        expect(records.map((record) => record.__index__)).toEqual([0, 1, 2]);
+        expect(JSON.parse(JSON.stringify(records))).toEqual([
+            { __index__: 0, col1: 0.5, col2: 'a' },
+            { __index__: 1, col1: 1.5, col2: null },
+            { __index__: 2, col1: 2.5, col2: 'c' },
+        ]);
+    });
+
+    it('builds rows lazily and can be frozen', () => {
+        const table = tableFromArrays({ col1: Float64Array.from([1, 2, 3]) });
+
+        const records = tableToRecords(table);
+        const first = records[0];
+        // Rows are built once and then kept
+        expect(records[0]).toBe(first);
+
+        Object.freeze(records);
+        expect([...records]).toEqual([{ col1: 1 }, { col1: 2 }, { col1: 3 }]);
+    });
+});
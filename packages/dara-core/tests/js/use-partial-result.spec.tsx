@@ -0,0 +1,61 @@
+import { act, renderHook } from '@testing-library/react';
+
+import { TaskStatus } from '../../js/api/websocket';
+import { usePartialResult } from '../../js/shared';
+import GlobalTaskProvider, { VariableTaskEntry } from '../../js/shared/context/global-task-context';
+import { DerivedVariable, SingleVariable } from '../../js/types';
+import { MockWebSocketClient, Wrapper } from './utils';
+
+const variableA: SingleVariable<number> = {
+    __typename: 'Variable',
+    default: 1,
+    nested: [],
+    uid: 'a',
+};
+
+const derivedVariable: DerivedVariable = {
+    __typename: 'DerivedVariable',
+    deps: [variableA],
+    nested: [],
+    uid: 'dv',
+    variables: [variableA],
+};
+
+const sendPartialResult = (client: MockWebSocketClient, taskId: string, result: any): void => {
+    act(() => {
+        client.receiveMessage({
+            message: { result, status: TaskStatus.PARTIAL, task_id: taskId },
+            type: 'message',
+        });
+    });
+};
+
+describe('usePartialResult', () => {
+    it('returns the latest partial result of the task computing the variable', () => {
+        const client = new MockWebSocketClient('uid');
+        const tasks = new Set(['t_dv']);
+        const variableTaskMap = new Map<string, VariableTaskEntry[]>([['dv', [{ taskId: 't_dv' }]]]);
+
+        const { result } = renderHook(() => usePartialResult(derivedVariable), {
+            wrapper: ({ children }) => (
+                <Wrapper client={client} withTaskCtx={false}>
+                    <GlobalTaskProvider tasks={tasks} variableTaskMap={variableTaskMap}>
+                        {children}
+                    </GlobalTaskProvider>
+                </Wrapper>
+            ),
+        });
+
+        expect(result.current).toBeNull();
+
+        sendPartialResult(client, 't_dv', [{ col1: 1 }]);
+        expect(result.current).toEqual([{ col1: 1 }]);
+
+        // Partial results of other tasks are ignored
+        sendPartialResult(client, 't_other', [{ col1: 5 }]);
+        expect(result.current).toEqual([{ col1: 1 }]);
+
+        sendPartialResult(client, 't_dv', [{ col1: 1 }, { col1: 2 }]);
+        expect(result.current).toEqual([{ col1: 1 }, { col1: 2 }]);
+    });
+});
@@ -6,6 +6,7 @@ import { ActionImpl } from '@/types/core';
 import {
     BackendStoreMessage,
     CustomMessage,
+    PartialResultNotificationMessage,
     ProgressNotificationMessage,
     ServerErrorMessage,
     TaskStatus,
@@ -71,6 +72,16 @@ export default class MockWebSocketClient implements MockWebSocketClientInterface
         );
     }
 
+    partialResults$(...task_ids: string[]): Observable<PartialResultNotificationMessage> {
+        return this.messages$.pipe(
+            filter(
+                (msg: any) =>
+                    msg.message?.status === TaskStatus.PARTIAL &&
+                    (task_ids.length === 0 || task_ids.includes(msg.message.task_id))
+            )
+        ) as Observable<PartialResultNotificationMessage>;
+    }
+
     progressUpdates$(...task_ids: string[]): Observable<ProgressNotificationMessage> {
         return this.messages$.pipe(
             filter((msg: any) => task_ids.includes(msg.message.task_id))
@@ -3,6 +3,23 @@ import os
 import pytest
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        '--benchmark', action='store_true', default=False, help='run benchmarks, i.e. pytest --benchmark -m benchmark'
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless running with --benchmark, they are slow and their timings depend on the machine"""
+    if config.getoption('--benchmark'):
+        return
+
+    skip_benchmark = pytest.mark.skip(reason='benchmark, run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
 @pytest.fixture(scope='session', autouse=True)
 def setup_pool_env():
     """Runs before all tests"""
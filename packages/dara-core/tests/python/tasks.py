@@ -46,6 +46,33 @@ def identity_task(x):
     return x
 
 
+def square(x, offset=0):
+    return x * x + offset
+
+
+def chunks_task(n):
+    for i in range(n):
+        yield DataFrame({'a': [i]}, index=[i])
+
+
+def estimate_task():
+    yield 1
+    yield 2
+    return 'final'
+
+
+async def async_estimate_task():
+    for i in range(3):
+        await anyio.sleep(0.05)
+        yield i
+
+
+def fail_on_value(x, value):
+    if x == value:
+        raise Exception('test exception')
+    return x
+
+
 def log_task(x):
     print('TEST_LOG')
     return x
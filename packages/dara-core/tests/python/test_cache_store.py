@@ -1,11 +1,24 @@
+import time
+from sys import getsizeof
+from typing import ClassVar
+from unittest.mock import patch
+
+import anyio
+import numpy
 import pytest
 from freezegun import freeze_time
+from pandas import Categorical, DataFrame, MultiIndex, RangeIndex, Series
+from prometheus_client import REGISTRY
 
 from dara.core.auth.definitions import SESSION_ID, USER, UserData
 from dara.core.internal.cache_store.cache_store import CacheStore
-from dara.core.internal.cache_store.ttl import TTLCache
+from dara.core.internal.cache_store.governor import MemoryGovernor
+from dara.core.internal.cache_store.ttl import MIN_TOMBSTONES_TO_COMPACT, TTLCache
 from dara.core.internal.cache_store.lru import LRUCache
-from dara.core.base_definitions import Cache, CachedRegistryEntry
+from dara.core.internal.cache_store.max_bytes import MaxBytesCache
+from dara.core.base_definitions import Cache, CachedRegistryEntry, PendingValue
+from dara.core.logging import dev_logger
+from dara.core.metrics import RUNTIME_METRICS_TRACKER, EntrySizes, estimate_size, total_size
 
 pytestmark = pytest.mark.anyio
 
@@ -79,6 +92,57 @@ async def test_lru_cache_pinning():
     assert await lru_cache.get('a') == 1  # "a" should not be evicted since it's still pinned
 
 
+async def test_lru_cache_pinned_entries_outside_eviction_order():
+    lru_cache = LRUCache(policy=Cache.Policy.LRU(max_size=2))
+
+    await lru_cache.set('a', 1, pin=True)
+    await lru_cache.set('b', 2, pin=True)
+    assert lru_cache.head is None and lru_cache.tail is None  # pinned entries are not in the eviction order
+
+    await lru_cache.set('c', 3)
+    assert await lru_cache.get('c') is None  # the only evictable entry is evicted
+
+    # Unpinned entries rejoin the eviction order as most recently used
+    assert await lru_cache.get('a', unpin=True) == 1
+    await lru_cache.set('c', 3)
+    assert await lru_cache.get('a') is None
+    assert await lru_cache.get('b') == 2
+    assert await lru_cache.get('c') == 3
+
+    # Pinning an existing entry takes it out of the eviction order again
+    await lru_cache.set('c', 30, pin=True)
+    assert lru_cache.head is None and lru_cache.tail is None
+    assert await lru_cache.delete('c') is None
+
+
+@pytest.mark.benchmark
+async def test_lru_cache_set_benchmark():
+    """
+    Benchmark set throughput with many pinned entries, which should not slow down evictions
+    """
+
+    async def run(n_pinned: int) -> float:
+        lru_cache = LRUCache(policy=Cache.Policy.LRU(max_size=n_pinned + 1000))
+        for i in range(n_pinned):
+            await lru_cache.set(f'pinned_{i}', i, pin=True)
+
+        start = time.perf_counter()
+        for i in range(100_000):
+            await lru_cache.set(f'key_{i}', i)
+        elapsed = time.perf_counter() - start
+
+        assert len(lru_cache.cache) == n_pinned + 1000
+        return elapsed
+
+    unpinned_time = await run(0)
+    pinned_time = await run(10_000)
+
+    print(
+        f'100k sets: {100_000 / unpinned_time:.0f}/s without pinned entries, '
+        f'{100_000 / pinned_time:.0f}/s with 10k pinned entries'
+    )
+
+
 async def test_most_recent_cache():
     cache = LRUCache(policy=Cache.Policy.MostRecent())
 
@@ -111,6 +175,124 @@ async def test_most_recent_cache():
     assert await cache.get('c') == 3
 
 
+async def test_max_bytes_cache():
+    data = DataFrame({'a': numpy.arange(1000), 'b': numpy.arange(1000, dtype=float)})
+    size = estimate_size(data)
+    cache = MaxBytesCache(policy=Cache.Policy.MaxBytes(max_bytes=size * 2))
+
+    await cache.set('a', data)
+    await cache.set('b', data.copy())
+    assert await cache.get('a') is data
+    assert cache.size == size * 2
+
+    # Least recently used entry is evicted to stay within the budget
+    await cache.set('c', data.copy())
+    assert await cache.get('b') is None
+    assert await cache.get('a') is data
+    assert cache.size == size * 2
+
+    # Updating an entry updates its size, the budget still only fits one more full entry
+    await cache.set('a', data.iloc[:10])
+    assert cache.size < size * 2
+    await cache.set('b', data.copy())
+    assert list(cache.cache.keys()) == ['a', 'b']
+
+    # Pinned entries count towards the budget but are not evicted
+    await cache.set('d', data.copy(), pin=True)
+    assert await cache.get('d') is not None
+    assert list(cache.cache.keys()) == ['b', 'd']
+
+    # Entries larger than the budget are not kept
+    await cache.set('e', numpy.zeros(size * 3, dtype=numpy.uint8))
+    assert await cache.get('e') is None
+    assert await cache.get('d', unpin=True) is not None
+
+    await cache.clear()
+    assert cache.size == 0
+
+
+def test_estimate_size():
+    data = DataFrame({'a': numpy.arange(100_000), 'b': [str(i) for i in range(100_000)]})
+    array = numpy.zeros(1000)
+
+    assert estimate_size(array) == array.nbytes
+    assert estimate_size(data[['a']]) == data[['a']].memory_usage(index=True, deep=False).sum()
+    assert estimate_size(None) == 0
+
+    # Objects of object columns are all sized without sampling, and a sample of them is sized otherwise
+    assert estimate_size(data, sample_size=0) == data.memory_usage(index=True, deep=True).sum()
+    assert estimate_size(data) == pytest.approx(data.memory_usage(index=True, deep=True).sum(), rel=0.05)
+
+    # Containers are walked, data inside them is sized from its buffers
+    assert estimate_size({'data': data, 'array': array}) > estimate_size(data) + array.nbytes
+    items = {str(i): i for i in range(100_000)}
+    assert estimate_size(items) == pytest.approx(total_size(items), rel=0.05)
+
+
+def test_estimate_size_indexes_and_categoricals():
+    # Range indexes are sized without materializing them
+    index = RangeIndex(100_000_000)
+    with patch.object(RangeIndex, 'to_numpy', side_effect=AssertionError):
+        assert estimate_size(index) == index.nbytes
+        assert estimate_size(Series(numpy.zeros(10))) == 80 + RangeIndex(10).nbytes
+
+    # Multi indexes are sized from their levels and codes, only object levels are walked
+    names = numpy.array([f'name {i}' for i in range(10)], dtype=object)
+    multi_index = MultiIndex.from_arrays([numpy.arange(1000), names[numpy.arange(1000) % 10]])
+    with patch.object(MultiIndex, 'to_numpy', side_effect=AssertionError):
+        assert estimate_size(multi_index) == (
+            multi_index.levels[0].nbytes
+            + multi_index.levels[1].nbytes
+            + sum(getsizeof(name) for name in names)
+            + sum(codes.nbytes for codes in multi_index.codes)
+        )
+
+    # Categoricals are sized from their codes and categories, the same in a Series as in a DataFrame
+    categorical = Series(Categorical(names[numpy.arange(1000) % 10]))
+    assert estimate_size(categorical) == (
+        categorical.memory_usage(index=False, deep=False)
+        + sum(getsizeof(name) for name in names)
+        + RangeIndex(1000).nbytes
+    )
+    assert estimate_size(categorical) == estimate_size(DataFrame({'a': categorical}))
+
+
+@pytest.mark.benchmark
+def test_estimate_size_benchmark():
+    """
+    Benchmark sizing a 100k row DataFrame with an object column with estimate_size vs total_size
+    """
+    data = DataFrame({'a': numpy.arange(100_000), 'b': [str(i) for i in range(100_000)]})
+
+    start = time.perf_counter()
+    for _ in range(100):
+        estimate_size(data)
+    estimate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        total_size(data)
+    total_time = time.perf_counter() - start
+
+    print(f'Sizing 100k row DataFrame: estimate_size {estimate_time * 10:.3f}ms, total_size {total_time * 10:.3f}ms')
+
+
+def test_entry_sizes():
+    changes = []
+    sizes = EntrySizes(on_change=changes.append)
+
+    sizes.set('a', numpy.zeros(100))
+    sizes.set('b', numpy.zeros(100))
+    assert sizes.size == 1600
+    sizes.set('a', numpy.zeros(50))
+    assert sizes.size == 1200
+    assert sizes.pop('b') == 800
+    assert sizes.pop('b') == 0
+    sizes.clear()
+    assert sizes.size == 0
+    assert changes == [800, 800, -400, -800, -400]
+
+
 async def test_ttl_cache():
     ttl_cache = TTLCache(policy=Cache.Policy.TTL(ttl=2))
 
@@ -168,6 +350,129 @@ async def test_ttl_cache():
         assert await ttl_cache.get('f') is None  # "f" should be evicted since it's no longer pinned
 
 
+async def test_ttl_cache_tombstones():
+    ttl_cache = TTLCache(policy=Cache.Policy.TTL(ttl=2))
+    n_entries = MIN_TOMBSTONES_TO_COMPACT * 4
+
+    with freeze_time('2023-01-01 12:00:00'):
+        for i in range(n_entries):
+            await ttl_cache.set(str(i), i)
+
+        # Deleting leaves tombstones in the heap rather than rebuilding it
+        for i in range(MIN_TOMBSTONES_TO_COMPACT):
+            assert await ttl_cache.delete(str(i)) == i
+        assert len(ttl_cache.expiration_heap) == n_entries
+        assert ttl_cache.tombstones == MIN_TOMBSTONES_TO_COMPACT
+
+    with freeze_time('2023-01-01 12:00:01'):
+        # Overwriting an entry keeps it alive past the expiry of its previous heap record
+        await ttl_cache.set(str(n_entries - 1), 'new')
+
+        # Pinning an entry takes it out of the expiration heap
+        await ttl_cache.set(str(n_entries - 2), 'pinned', pin=True)
+
+        # Once most of the heap is tombstones it is compacted
+        for i in range(MIN_TOMBSTONES_TO_COMPACT, n_entries // 2 + 1):
+            await ttl_cache.delete(str(i))
+        assert len(ttl_cache.expiration_heap) < n_entries
+        assert len(ttl_cache.expiration_heap) == len(ttl_cache.unpinned_cache) + ttl_cache.tombstones
+
+    with freeze_time('2023-01-01 12:00:02'):
+        assert await ttl_cache.get(str(n_entries - 1)) == 'new'
+        assert await ttl_cache.get(str(n_entries - 2)) == 'pinned'
+        assert await ttl_cache.get(str(n_entries - 3)) is None
+        assert list(ttl_cache.unpinned_cache.keys()) == [str(n_entries - 1)]
+
+
+async def test_cache_store_evict_expired():
+    store = CacheStore()
+    ttl_entry = CachedRegistryEntry(uid='ttl_uid', cache=Cache.Policy.TTL(ttl=2, cache_type=Cache.Type.SESSION))
+    keep_all_entry = CachedRegistryEntry(uid='keep_all_uid', cache=Cache.Policy.KeepAll())
+
+    with freeze_time('2023-01-01 12:00:00'):
+        for session in ['session_1', 'session_2']:
+            SESSION_ID.set(session)
+            await store.set(ttl_entry, key='key', value='x' * 1000)
+            await store.set(ttl_entry, key='pinned', value='pinned', pin=True)
+        await store.set(keep_all_entry, key='key', value='y' * 1000)
+        size = store._size
+
+    # Nothing has expired yet
+    with freeze_time('2023-01-01 12:00:01'):
+        assert await store.evict_expired() == 0
+
+    # Expired entries of every scope are evicted without accessing them
+    with freeze_time('2023-01-01 12:00:03'):
+        reclaimed = await store.evict_expired()
+        assert reclaimed >= 2000
+        assert store._size == size - reclaimed
+
+        for cache in store.registry_stores[ttl_entry.to_store_key()].caches.values():
+            assert list(cache.unpinned_cache.keys()) == []
+            assert list(cache.pinned_cache.keys()) == ['pinned']
+
+        assert await store.get(keep_all_entry, key='key') == 'y' * 1000
+
+
+async def test_cache_store_sweep_expired():
+    store = CacheStore()
+    ttl_entry = CachedRegistryEntry(uid='ttl_uid', cache=Cache.Policy.TTL(ttl=0))
+    await store.set(ttl_entry, key='key', value='value')
+
+    with anyio.move_on_after(0.3):
+        await store.sweep_expired(0.1)
+
+    cache = store.registry_stores[ttl_entry.to_store_key()].caches
+    assert all(len(c.unpinned_cache) == 0 for c in cache.values())
+
+
+async def test_cache_store_max_bytes():
+    store = CacheStore()
+    entry = CachedRegistryEntry(uid='uid', cache=Cache.Policy.MaxBytes(max_bytes=8000))
+
+    await store.set(entry, key='a', value=numpy.zeros(500))
+    await store.set(entry, key='b', value=numpy.zeros(500))
+    assert await store.get(entry, key='a') is not None
+
+    await store.set(entry, key='c', value=numpy.zeros(500))
+    assert await store.get(entry, key='b') is None
+    assert await store.get(entry, key='a') is not None
+    assert Cache.Policy.from_dict(entry.cache.dict()) == entry.cache
+
+    # Values are sized once by the store, the policy reuses that size
+    with patch('dara.core.metrics.sizing.estimate_size', wraps=estimate_size) as store_estimate, patch(
+        'dara.core.internal.cache_store.max_bytes.estimate_size', wraps=estimate_size
+    ) as policy_estimate:
+        await store.set(entry, key='d', value=numpy.zeros(500))
+
+    assert store_estimate.call_count == 1
+    assert policy_estimate.call_count == 0
+    assert store.registry_stores[entry.to_store_key()].caches['global'].size == 8000
+
+
+async def test_cache_store_size():
+    store = CacheStore()
+    entry = CachedRegistryEntry(uid='uid', cache=Cache.Policy.LRU(max_size=2))
+
+    await store.set(entry, key='a', value=numpy.zeros(100))
+    await store.set(entry, key='b', value=numpy.zeros(100))
+    assert store._size == 1600
+
+    # Overwritten, evicted and deleted entries no longer count towards the size
+    await store.set(entry, key='a', value=numpy.zeros(50))
+    assert store._size == 1200
+    await store.set(entry, key='c', value=numpy.zeros(25))
+    assert await store.get(entry, key='b') is None
+    assert store._size == 600
+    await store.delete(entry, key='a')
+    assert store._size == 200
+
+    # Pinned entries are not deleted
+    await store.set(entry, key='d', value=numpy.zeros(25), pin=True)
+    await store.delete(entry, key='d')
+    assert store._size == 400
+
+
 async def test_cache_store_global_api():
     # Sample store, we're not testing cache eviction so just use keep-all here
     store = CacheStore()
@@ -279,3 +584,113 @@ async def test_cache_store_pinning():
     assert await store.get(reg_entry, key='test_key') is None
     assert await store.get(reg_entry, key='test_key_2') is None
     assert await store.get(reg_entry, key='test_key_3') == 'test_value_3'
+
+
+class EvictableEntry(CachedRegistryEntry):
+    evictable: ClassVar[bool] = True
+
+
+async def test_memory_governor():
+    store = CacheStore()
+    store.governor = MemoryGovernor(store, budget=10_000)
+    cheap = EvictableEntry(uid='governor_cheap', cache=Cache.Policy.KeepAll())
+    expensive = EvictableEntry(uid='governor_expensive', cache=Cache.Policy.KeepAll())
+    data = CachedRegistryEntry(uid='governor_data', cache=Cache.Policy.KeepAll())
+    RUNTIME_METRICS_TRACKER.get_dv_histogram(cheap.uid).observe(0.1)
+    RUNTIME_METRICS_TRACKER.get_dv_histogram(expensive.uid).observe(10)
+    evictions = REGISTRY.get_sample_value('cache_store_governor_evictions_total') or 0
+
+    await store.set(data, key='a', value=numpy.zeros(500))
+    await store.set(expensive, key='a', value=numpy.zeros(500))
+    await store.set(cheap, key='a', value=numpy.zeros(500))
+
+    # Over budget, the value cheapest to recompute is evicted first, values which cannot be recomputed are kept
+    assert store._size == 8000
+    assert await store.get(cheap, key='a') is None
+    assert await store.get(expensive, key='a') is not None
+    assert await store.get(data, key='a') is not None
+    assert REGISTRY.get_sample_value('cache_store_governor_evictions_total') - evictions == 1
+
+    # Pinned and pending values are not evicted, so the next best candidate is
+    await store.set_pending(cheap, key='pending')
+    await store.set(cheap, key='pinned', value=numpy.zeros(500), pin=True)
+    assert isinstance(await store.get(cheap, key='pending'), PendingValue)
+    assert await store.get(cheap, key='pinned') is not None
+    assert await store.get(expensive, key='a') is None
+    assert await store.get(data, key='a') is not None
+
+
+@pytest.mark.parametrize('policy', [Cache.Policy.KeepAll(), Cache.Policy.LRU(max_size=10), Cache.Policy.TTL(ttl=3600)])
+async def test_memory_governor_keeps_pinned(policy):
+    store = CacheStore()
+    store.governor = MemoryGovernor(store, budget=10_000)
+    entry = EvictableEntry(uid=f'governor_pinned_{policy.policy}', cache=policy)
+
+    # Pinned values are read later with unpin=True, the unpinned ones are evicted instead
+    await store.set(entry, key='pinned', value=numpy.zeros(500), pin=True)
+    await store.set(entry, key='a', value=numpy.zeros(500))
+    await store.set(entry, key='b', value=numpy.zeros(500))
+
+    assert await store.get(entry, key='pinned', unpin=True) is not None
+    assert await store.get(entry, key='a') is None
+    assert await store.get(entry, key='b') is not None
+
+
+async def test_memory_governor_recency():
+    store = CacheStore()
+    store.governor = MemoryGovernor(store, budget=10_000)
+    entry = EvictableEntry(uid='governor_recency', cache=Cache.Policy.KeepAll())
+
+    with freeze_time('2023-01-01 12:00:00') as frozen_time:
+        await store.set(entry, key='a', value=numpy.zeros(500))
+        await store.set(entry, key='b', value=numpy.zeros(500))
+        frozen_time.tick(60)
+        assert await store.get(entry, key='a') is not None
+        frozen_time.tick(1)
+
+        # The value accessed least recently is evicted first
+        await store.set(entry, key='c', value=numpy.zeros(500))
+        assert await store.get(entry, key='b') is None
+        assert await store.get(entry, key='a') is not None
+        assert await store.get(entry, key='c') is not None
+
+
+async def test_memory_governor_over_budget():
+    store = CacheStore()
+    store.governor = MemoryGovernor(store, budget=10_000)
+    entry = EvictableEntry(uid='governor_over_budget', cache=Cache.Policy.KeepAll())
+    data = CachedRegistryEntry(uid='governor_over_budget_data', cache=Cache.Policy.KeepAll())
+
+    await store.set(entry, key='a', value=numpy.zeros(500))
+
+    with patch.object(dev_logger, 'warning') as warning, patch.object(
+        store.governor, '_get_candidates', wraps=store.governor._get_candidates
+    ) as get_candidates:
+        # Values which cannot be evicted exceed the budget on their own, so nothing is evicted
+        await store.set(data, key='a', value=numpy.zeros(1500))
+        await store.set(entry, key='b', value=numpy.zeros(10))
+        await store.set(entry, key='c', value=numpy.zeros(10))
+
+        assert await store.get(entry, key='a') is not None
+        assert await store.get(entry, key='b') is not None
+        get_candidates.assert_not_called()
+        warning.assert_called_once()
+
+        # Once back under budget the governor evicts again
+        await store.delete(data, key='a')
+        await store.set(data, key='b', value=numpy.zeros(1000))
+        assert await store.get(entry, key='a') is None
+        assert store._size <= 9_000
+        get_candidates.assert_called_once()
+        warning.assert_called_once()
+
+
+def test_memory_governor_budget():
+    with pytest.raises(ValueError):
+        MemoryGovernor(CacheStore(), budget=0)
+
+
+def test_dv_mean_runtimes():
+    RUNTIME_METRICS_TRACKER.get_dv_histogram('runtime-uid').observe(1)
+    RUNTIME_METRICS_TRACKER.get_dv_histogram('runtime-uid').observe(3)
+    assert RUNTIME_METRICS_TRACKER.get_dv_mean_runtimes()['runtime_uid'] == 2
@@ -0,0 +1,226 @@
+import os
+from unittest.mock import patch
+
+import numpy
+import pyarrow
+import pytest
+from pandas import DataFrame, Index, concat
+from prometheus_client import REGISTRY
+
+from dara.core.base_definitions import CacheType
+from dara.core.data_utils import DATASET_CACHE, DataFactory, DatasetCache, get_dataset_filename
+from dara.core.interactivity.filtering import (
+    ClauseQuery,
+    QueryCombinator,
+    QueryOperator,
+    ValueQuery,
+    apply_filters_to_parquet,
+)
+from dara.core.internal.pandas_utils import INDEX, append_index
+from dara.core.metrics.sizing import estimate_size
+
+TEST_DATA = DataFrame(
+    {
+        'col1': [1, 2, 3, 4, 1],
+        'col2': [6.0, 7.0, 8.0, numpy.nan, 10.0],
+        'col3': ['a', 'b', 'a', 'd', 'e'],
+    }
+)
+
+FILTERS = ClauseQuery(
+    combinator=QueryCombinator.OR,
+    clauses=[
+        ValueQuery(column='col1', value='1', operator=QueryOperator.EQ),
+        ValueQuery(column='col3', value='D', operator=QueryOperator.CONTAINS),
+    ],
+)
+
+
+@pytest.fixture
+def factory(tmp_path):
+    return DataFactory(str(tmp_path))
+
+
+@pytest.mark.parametrize('name', ['dataset', 'dataset.csv', 'dataset.feather', 'dataset.arrow'])
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_read_dataset(factory: DataFactory, name, memory_map):
+    """
+    Test that datasets are read back as written, with columns and filters applied
+    """
+    factory.write_dataset(TEST_DATA, name)
+
+    assert factory.read_dataset(name, memory_map=memory_map).equals(TEST_DATA)
+    assert factory.read_dataset(name, columns=['col3', 'col1'], memory_map=memory_map).equals(
+        TEST_DATA[['col3', 'col1']]
+    )
+
+    # Filter columns are only read to filter
+    filtered = factory.read_dataset(name, columns=['col2'], filters=FILTERS, memory_map=memory_map)
+    assert filtered.equals(TEST_DATA.iloc[[0, 3, 4]][['col2']].reset_index(drop=True))
+
+
+def test_read_dataset_keeps_index(factory: DataFactory):
+    """
+    Test that the index of a Parquet dataset is kept when reading a subset of columns and rows
+    """
+    data = TEST_DATA.set_index(Index(['v', 'w', 'x', 'y', 'z'], name='key'))
+    factory.write_dataset(data, 'dataset')
+
+    filtered = factory.read_dataset('dataset', columns=['col1'], filters=FILTERS)
+    assert filtered.equals(data.iloc[[0, 3, 4]][['col1']])
+
+
+def test_read_dataset_memory_mapped(factory: DataFactory):
+    """
+    Test that memory-mapped Arrow datasets are not copied into private memory
+    """
+    factory.write_dataset(TEST_DATA, 'dataset.feather')
+
+    mapped = factory.read_dataset('dataset.feather', memory_map=True)
+    # Points at the mapped file, so cannot be written to
+    assert not mapped['col1'].to_numpy().flags.writeable
+
+    copied = factory.read_dataset('dataset.feather')
+    assert copied['col1'].to_numpy().flags.writeable
+
+
+def test_append_index_memory_mapped(factory: DataFactory):
+    """
+    Test that adding the index column to a memory-mapped dataset does not copy its columns
+    """
+    factory.write_dataset(TEST_DATA, 'dataset.feather')
+    mapped = factory.read_dataset('dataset.feather', memory_map=True)
+
+    indexed = append_index(mapped)
+
+    assert list(indexed.columns) == [INDEX, 'col1', 'col2', 'col3']
+    assert numpy.shares_memory(indexed['col1'].to_numpy(), mapped['col1'].to_numpy())
+    assert INDEX not in mapped.columns
+
+
+@pytest.mark.parametrize('name', ['dataset', 'dataset.parquet', 'dataset.feather'])
+def test_disk_dataset_var(factory: DataFactory, name):
+    """
+    Test that disk dataset variables serve the file the dataset is written to, in either format
+    """
+    factory.write_dataset(TEST_DATA, name)
+
+    with patch('dara.core.data_utils.DataVariable') as data_variable:
+        factory.disk_dataset_var(name)
+
+    path = data_variable.call_args.kwargs['path']
+    assert path == factory.get_dataset_path(get_dataset_filename(name))
+    assert os.path.exists(path)
+
+    filtered, count = apply_filters_to_parquet(path, FILTERS)
+    assert count == 3
+    assert filtered.reset_index(drop=True).equals(append_index(TEST_DATA).iloc[[0, 3, 4]].reset_index(drop=True))
+
+
+def test_read_dataset_closes_schema_file(factory: DataFactory):
+    """
+    Test that the file opened to read the schema of an Arrow dataset is closed
+    """
+    factory.write_dataset(TEST_DATA, 'dataset.feather')
+    open_file = pyarrow.OSFile
+    opened = []
+
+    def _open_file(*args, **kwargs):
+        opened.append(open_file(*args, **kwargs))
+        return opened[-1]
+
+    with patch.object(pyarrow, 'OSFile', side_effect=_open_file):
+        assert factory.read_dataset('dataset.feather').equals(TEST_DATA)
+
+    assert len(opened) == 1
+    assert opened[0].closed
+
+
+def test_read_missing_dataset(factory: DataFactory):
+    assert factory.read_dataset('missing') is None
+    assert factory.read_dataset('missing.feather') is None
+
+
+def get_dataset_cache_metric(event: str) -> float:
+    return REGISTRY.get_sample_value(f'dataset_cache_{event}_total') or 0
+
+
+def test_dataset_cache_shared(factory: DataFactory):
+    """
+    Test that datasets are read from disk once and shared until the file is written again
+    """
+    DATASET_CACHE.clear()
+    factory.write_dataset(TEST_DATA, 'dataset')
+    hits, misses = get_dataset_cache_metric('hits'), get_dataset_cache_metric('misses')
+
+    with patch.object(DataFactory, 'read_dataset', autospec=True, side_effect=DataFactory.read_dataset) as read_dataset:
+        first = factory._read_dataset_cached('dataset', CacheType.GLOBAL, None, None, False)
+        second = factory._read_dataset_cached('dataset.parquet', CacheType.GLOBAL, None, None, False)
+        assert read_dataset.call_count == 1
+
+        # Each caller gets its own shallow copy, so changing its columns does not affect the others
+        assert second is not first
+        assert numpy.shares_memory(second['col1'].to_numpy(), first['col1'].to_numpy())
+        second['col4'] = second['col1'] * 2
+        assert first.equals(TEST_DATA)
+
+        # Different options are cached separately
+        projected = factory._read_dataset_cached('dataset', CacheType.GLOBAL, ['col1'], None, False)
+        assert projected.equals(TEST_DATA[['col1']])
+        assert read_dataset.call_count == 2
+
+        # Writing the dataset drops cached versions of it
+        factory.write_dataset(TEST_DATA.iloc[:2], 'dataset')
+        assert DATASET_CACHE.size == 0
+        assert factory._read_dataset_cached('dataset', CacheType.GLOBAL, None, None, False).equals(TEST_DATA.iloc[:2])
+        assert read_dataset.call_count == 3
+
+    assert get_dataset_cache_metric('hits') - hits == 1
+    assert get_dataset_cache_metric('misses') - misses == 3
+
+    factory.delete_dataset('dataset.parquet')
+    assert DATASET_CACHE.size == 0
+    assert factory._read_dataset_cached('dataset', CacheType.GLOBAL, None, None, False) is None
+
+
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_dataset_cache_sessions_share_buffers(factory: DataFactory, memory_map):
+    """
+    Test that the frames served to different sessions reading the same dataset share its column buffers
+    """
+    DATASET_CACHE.clear()
+    factory.write_dataset(TEST_DATA, 'dataset.feather')
+
+    # Each session resolves the dataset and then adds the index column before filtering it
+    first = append_index(factory._read_dataset_cached('dataset.feather', CacheType.GLOBAL, None, None, memory_map))
+    second = append_index(factory._read_dataset_cached('dataset.feather', CacheType.GLOBAL, None, None, memory_map))
+
+    assert second is not first
+    for col in TEST_DATA.columns:
+        assert numpy.shares_memory(first[col].to_numpy(), second[col].to_numpy())
+
+    factory.delete_dataset('dataset.feather')
+
+
+def test_dataset_cache_eviction():
+    """
+    Test that least recently used datasets are evicted to stay within the byte budget
+    """
+    size = estimate_size(TEST_DATA)
+    cache = DatasetCache(max_bytes=size * 2)
+    evictions = get_dataset_cache_metric('evictions')
+
+    cache.set(('a', 0, 0, None), TEST_DATA)
+    cache.set(('b', 0, 0, None), TEST_DATA)
+    assert cache.get(('a', 0, 0, None)) is TEST_DATA
+
+    cache.set(('c', 0, 0, None), TEST_DATA)
+    assert cache.get(('b', 0, 0, None)) is None
+    assert [key[0] for key in cache.entries] == ['a', 'c']
+    assert cache.size == size * 2
+    assert get_dataset_cache_metric('evictions') - evictions == 1
+
+    # Datasets larger than the budget are not cached
+    cache.set(('d', 0, 0, None), concat([TEST_DATA] * 10))
+    assert cache.get(('d', 0, 0, None)) is None
+    assert len(cache.entries) == 2
@@ -1,13 +1,15 @@
 import datetime
+import json
 import os
 from contextvars import ContextVar
 from typing import Optional, Union
 from unittest.mock import Mock, patch
 
 import jwt
+import pyarrow
 import pytest
 from async_asgi_testclient import TestClient as AsyncClient
-from pandas import DataFrame
+from pandas import DataFrame, to_datetime, to_timedelta
 from tests.python.utils import (
     AUTH_HEADERS,
     TEST_JWT_SECRET,
@@ -28,10 +30,18 @@ from dara.core.definitions import ComponentInstance
 from dara.core.interactivity import DataVariable
 from dara.core.interactivity.actions import UpdateVariable
 from dara.core.interactivity.derived_variable import DerivedVariable
-from dara.core.interactivity.filtering import ClauseQuery, QueryCombinator, ValueQuery
+from dara.core.interactivity.filtering import (
+    COLUMN_INDEXES,
+    ClauseQuery,
+    QueryCombinator,
+    QueryOperator,
+    ValueQuery,
+)
 from dara.core.interactivity.plain_variable import Variable
-from dara.core.internal.pandas_utils import append_index
+from dara.core.internal.pandas_utils import ARROW_STREAM_MEDIA_TYPE, append_index, df_to_arrow, df_to_json
+from dara.core.internal.utils import negotiate_media_type
 from dara.core.main import _start_application
+from dara.core.metrics import CACHE_METRICS_TRACKER
 from dara.core.visual.dynamic_component import py_component
 
 pytestmark = pytest.mark.anyio
@@ -115,6 +125,82 @@ async def test_fetching_global_data_variable():
         assert response.json() == 5
 
 
+async def test_fetching_global_data_variable_arrow():
+    """
+    Test that DataVariable is streamed as Arrow IPC when the client accepts it and falls back to JSON otherwise
+    """
+    builder = ConfigurationBuilder()
+
+    builder.add_page('Test', content=lambda: MockComponent(text=DataVariable(uid='uid', data=TEST_DATA)))
+
+    config = builder._to_configuration()
+
+    app = _start_application(config)
+
+    async with AsyncClient(app) as client:
+        response = await client.post(
+            '/api/core/data-variable/uid?limit=2&offset=1&order_by=-col2',
+            json={'filters': None},
+            headers={**AUTH_HEADERS, 'Accept': f'{ARROW_STREAM_MEDIA_TYPE}, application/json;q=0.9'},
+        )
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == ARROW_STREAM_MEDIA_TYPE
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+        assert table.to_pylist() == FINAL_TEST_DATA.iloc[[2, 1]].to_dict(orient='records')
+
+        # Old clients only accepting JSON get records
+        response = await client.post(
+            '/api/core/data-variable/uid?limit=2&offset=1&order_by=-col2',
+            json={'filters': None},
+            headers={**AUTH_HEADERS, 'Accept': 'application/json'},
+        )
+        assert response.status_code == 200
+        assert response.json() == FINAL_TEST_DATA.iloc[[2, 1]].to_dict(orient='records')
+
+
+async def test_df_to_arrow_units():
+    """
+    Test that timestamps and durations are converted to Arrow in the millisecond units they are serialized in as JSON
+    """
+    df = append_index(
+        DataFrame(
+            {
+                'time': to_datetime(['2021-01-01 00:00:00.123456', '2022-05-05 12:00:00.000000']),
+                'duration': to_timedelta([1.5, 2], unit='s'),
+            }
+        )
+    )
+
+    table = df_to_arrow(df)
+
+    assert table.schema.field('time').type == pyarrow.timestamp('ms')
+    assert table.schema.field('duration').type == pyarrow.duration('ms')
+    assert table.cast(
+        pyarrow.schema([(name, pyarrow.int64()) for name in table.column_names])
+    ).to_pylist() == json.loads(df_to_json(df))
+
+
+@pytest.mark.parametrize(
+    'accept,expected',
+    [
+        (None, 'application/json'),
+        ('*/*', 'application/json'),
+        (f'{ARROW_STREAM_MEDIA_TYPE}, application/json;q=0.9', ARROW_STREAM_MEDIA_TYPE),
+        (f'application/json;q=0.5, {ARROW_STREAM_MEDIA_TYPE}', ARROW_STREAM_MEDIA_TYPE),
+        (f'{ARROW_STREAM_MEDIA_TYPE};q=0, */*', 'application/json'),
+        (f'application/*;q=0.1, {ARROW_STREAM_MEDIA_TYPE};q=0', 'application/json'),
+        (f'application/json, {ARROW_STREAM_MEDIA_TYPE}', 'application/json'),
+        ('text/html', None),
+    ],
+)
+async def test_negotiate_data_media_type(accept, expected):
+    """
+    Test that Arrow is only picked when the Accept header prefers it, taking quality values into account
+    """
+    assert negotiate_media_type(accept, ['application/json', ARROW_STREAM_MEDIA_TYPE]) == expected
+
+
 async def test_fetching_global_data_variable_filters():
     """
     Test that global DataVariable can be fetched from the backend with filters and pagination
@@ -177,6 +263,101 @@ async def test_fetching_global_data_variable_filters():
         assert count_response.json() == 4   # filtered count
 
 
+async def test_fetching_global_data_variable_indexed():
+    """
+    Test that DataVariable builds indexes for index_columns and filters on them use the index
+    """
+    from dara.core.internal.registries import data_variable_registry, utils_registry
+
+    builder = ConfigurationBuilder()
+
+    builder.add_page(
+        'Test',
+        content=lambda: MockComponent(text=DataVariable(uid='uid', data=TEST_DATA, index_columns=['col1', 'col3'])),
+    )
+
+    config = builder._to_configuration()
+
+    app = _start_application(config)
+
+    query = ClauseQuery(
+        combinator=QueryCombinator.AND,
+        clauses=[
+            ValueQuery(column='col3', value='a'),
+            ValueQuery(column='col1', value=[3, 4]),
+        ],
+    )
+
+    async with AsyncClient(app) as client:
+        response = await client.post('/api/core/data-variable/uid', json={'filters': None}, headers=AUTH_HEADERS)
+        assert response.json() == FINAL_TEST_DATA.to_dict(orient='records')
+
+        # Indexes are built for the data held in the store
+        var_entry = data_variable_registry.get('uid')
+        store = utils_registry.get('Store')
+        await DataVariable._update(var_entry, store, TEST_DATA)
+        entry = await store.get(var_entry, key=DataVariable._get_cache_key('uid'))
+        index = COLUMN_INDEXES.get(entry.data, 'col3')[1]
+        assert index is not None
+        assert COLUMN_INDEXES.get(entry.data, 'col1')[0]
+        assert COLUMN_INDEXES.get(entry.data, 'col2') == (False, None)
+        assert CACHE_METRICS_TRACKER.indexes >= index.nbytes
+
+        with patch.object(index, 'equals', wraps=index.equals) as equals:
+            response = await client.post(
+                '/api/core/data-variable/uid', json={'filters': query.dict()}, headers=AUTH_HEADERS
+            )
+            assert equals.call_count == 1
+
+        assert response.status_code == 200
+        assert response.json() == FINAL_TEST_DATA.iloc[[2]].to_dict(orient='records')
+
+
+async def test_fetching_disk_data_variable(tmp_path):
+    """
+    Test that DataVariable stored on disk can be fetched with filters and pagination
+    """
+    path = str(tmp_path / 'data.parquet')
+    TEST_DATA.to_parquet(path, row_group_size=2)
+
+    with pytest.raises(ValueError):
+        DataVariable(data=TEST_DATA, path=path)
+
+    with pytest.raises(ValueError):
+        DataVariable(path=path, cache=CacheType.USER)
+
+    builder = ConfigurationBuilder()
+
+    builder.add_page('Test', content=lambda: MockComponent(text=DataVariable(uid='uid', path=path)))
+
+    config = builder._to_configuration()
+
+    app = _start_application(config)
+
+    # Should return indexes [0, 1, 3, 4]
+    query = ValueQuery(column='col2', value=8, operator=QueryOperator.NE)
+
+    async with AsyncClient(app) as client:
+        response = await client.post('/api/core/data-variable/uid', json={'filters': None}, headers=AUTH_HEADERS)
+        assert response.status_code == 200
+        assert response.json() == FINAL_TEST_DATA.to_dict(orient='records')
+
+        response = await client.post(
+            '/api/core/data-variable/uid?limit=2&offset=1&order_by=-col1',
+            json={'filters': query.dict()},
+            headers=AUTH_HEADERS,
+        )
+        assert response.status_code == 200
+        # sorted by col1 descending: [3, 1, 0, 4]
+        assert response.json() == FINAL_TEST_DATA.iloc[[1, 0]].to_dict(orient='records')
+
+        count_response = await client.post(
+            '/api/core/data-variable/uid/count', json={'filters': query.dict()}, headers=AUTH_HEADERS
+        )
+        assert count_response.status_code == 200
+        assert count_response.json() == 4
+
+
 @patch('dara.core.interactivity.actions.uuid.uuid4', return_value='uid')
 async def test_update_variable_extras_data_variable(_uid):
     """
@@ -1,14 +1,31 @@
+import gc
+import time
+from unittest.mock import patch
+
+import numpy
+import pyarrow.feather
+import pyarrow.parquet
 import pytest
-from pandas import DataFrame, date_range
+from pandas import DataFrame, date_range, to_datetime
 
+from dara.core.interactivity import filtering
 from dara.core.interactivity.filtering import (
+    COLUMN_INDEXES,
+    FILTER_INDEX_CACHE,
+    STRING_COLUMN_CACHE,
     ClauseQuery,
+    DataFrameCache,
     Pagination,
     QueryCombinator,
     QueryOperator,
     ValueQuery,
     apply_filters,
+    apply_filters_to_parquet,
+    build_column_indexes,
+    compile_filter_query,
 )
+from dara.core.internal.pandas_utils import append_index
+from dara.core.metrics import CACHE_METRICS_TRACKER
 
 TEST_DATA = DataFrame(
     {
@@ -279,3 +296,527 @@ def test_nested_clause_query(query, expected):
     assert filtered is not None
     assert filtered.index.tolist() == expected
     assert count == len(expected)
+
+
+def test_sorted_pagination():
+    query = ValueQuery(column='col1', value=3, operator=QueryOperator.LT)
+    pages = [
+        apply_filters(data=TEST_DATA, filters=query, pagination=Pagination(offset=offset, limit=2, orderBy='-col7'))
+        for offset in [0, 2]
+    ]
+
+    # col1 < 3 -> [0, 1, 4], sorted by col7 descending -> [4, 1, 0]
+    assert [page.index.tolist() for page, _ in pages] == [[4, 1], [0]]
+    assert all(count == 3 for _, count in pages)
+
+
+def test_filter_index_cache_reused_between_pages():
+    FILTER_INDEX_CACHE.clear()
+    data = TEST_DATA.copy()
+    query = ValueQuery(column='col3', value='a', operator=QueryOperator.NE)
+
+    with patch.object(filtering, '_sort_positions', wraps=filtering._sort_positions) as sort:
+        first, _ = apply_filters(data=data, filters=query, pagination=Pagination(offset=0, limit=2, orderBy='col2'))
+        second, count = apply_filters(
+            data=data, filters=query, pagination=Pagination(offset=2, limit=2, orderBy='col2')
+        )
+        assert sort.call_count == 1
+
+        # Different ordering or data is computed separately
+        apply_filters(data=data, filters=query, pagination=Pagination(offset=0, limit=2, orderBy='-col2'))
+        apply_filters(data=data.copy(), filters=query, pagination=Pagination(offset=0, limit=2, orderBy='col2'))
+        assert sort.call_count == 3
+
+        # Invalidating the data drops its entries
+        FILTER_INDEX_CACHE.invalidate(data)
+        apply_filters(data=data, filters=query, pagination=Pagination(offset=0, limit=2, orderBy='col2'))
+        assert sort.call_count == 4
+
+    assert first.index.tolist() == [3, 1]
+    assert second.index.tolist() == [4]
+    assert count == 3
+
+
+def test_filter_index_cache_lru_eviction():
+    cache = DataFrameCache(max_size=2)
+    data = TEST_DATA.copy()
+
+    cache.set(data, 'a', None)
+    cache.set(data, 'b', None)
+    cache.get(data, 'a')
+    cache.set(data, 'c', None)
+
+    assert cache.get(data, 'a')[0]
+    assert not cache.get(data, 'b')[0]
+    assert cache.get(data, 'c')[0]
+
+
+def test_filter_index_cache_dropped_with_data():
+    cache = DataFrameCache(max_size=2)
+    data = TEST_DATA.copy()
+    cache.set(data, 'a', None)
+    assert len(cache.entries) == 1
+
+    del data
+    assert len(cache.entries) == 0
+
+
+@pytest.mark.timeout(10)
+def test_filter_index_cache_data_collected_while_locked():
+    """
+    Test that a DataFrame garbage collected while the cache is locked does not deadlock it
+    """
+
+    def _size_of(value):
+        gc.collect()
+        return 0
+
+    cache = DataFrameCache(max_size=None, size_of=_size_of)
+    data = TEST_DATA.copy()
+    # Only collected by the cyclic GC
+    data.attrs['self'] = data
+    cache.set(data, 'a', None)
+    del data
+
+    other = TEST_DATA.copy()
+    cache.set(other, 'a', None)
+
+    assert list(cache.entries) == [(id(other), 'a')]
+    assert len(cache._refs) == 1
+
+
+def test_filter_index_cache_max_bytes():
+    cache = DataFrameCache(max_size=None, size_of=lambda positions: positions.nbytes, max_bytes=1600)
+    data = TEST_DATA.copy()
+
+    cache.set(data, 'a', numpy.arange(100))
+    cache.set(data, 'b', numpy.arange(100))
+    assert cache.size == 1600
+
+    # Least recently used entries are evicted to stay within the byte budget
+    cache.set(data, 'c', numpy.arange(50))
+    assert not cache.get(data, 'a')[0]
+    assert cache.get(data, 'b')[0]
+    assert cache.size == 1200
+
+    # Values larger than the budget are not kept
+    cache.set(data, 'd', numpy.arange(1000))
+    assert len(cache.entries) == 0
+    assert cache.size == 0
+
+    with pytest.raises(ValueError):
+        DataFrameCache(max_size=None, max_bytes=1600)
+
+
+TOP_K_DATA_SIZE = 20_000
+_rng = numpy.random.default_rng(42)
+TOP_K_DATA = DataFrame(
+    {
+        # Lots of ties
+        'ints': _rng.integers(0, 100, TOP_K_DATA_SIZE),
+        'floats': numpy.where(
+            _rng.random(TOP_K_DATA_SIZE) < 0.05, numpy.nan, _rng.integers(0, 50, TOP_K_DATA_SIZE).astype(float)
+        ),
+        'dates': to_datetime(_rng.integers(0, 1000, TOP_K_DATA_SIZE), unit='D').where(
+            _rng.random(TOP_K_DATA_SIZE) > 0.05
+        ),
+    }
+)
+
+
+@pytest.mark.parametrize('order_by', ['ints', '-ints', 'floats', '-floats', 'dates', '-dates'])
+@pytest.mark.parametrize(
+    'offset,limit',
+    [
+        (0, 100),
+        (0, 1),
+        (500, 50),
+        (TOP_K_DATA_SIZE - 100, 100),
+        (TOP_K_DATA_SIZE - 10, 50),
+        (TOP_K_DATA_SIZE - 1500, 100),
+    ],
+)
+def test_top_k_matches_full_sort(order_by, offset, limit):
+    """
+    Test that pages selected with a partial sort are identical to slicing a full stable sort, including ties and NaNs
+    """
+    FILTER_INDEX_CACHE.clear()
+    column = order_by.lstrip('-')
+    expected = TOP_K_DATA.sort_values(column, ascending=not order_by.startswith('-'), kind='stable')
+
+    with patch.object(filtering, '_sort_positions', wraps=filtering._sort_positions) as sort:
+        page, count = apply_filters(
+            data=TOP_K_DATA, pagination=Pagination(offset=offset, limit=limit, orderBy=order_by)
+        )
+        assert sort.call_count == 0
+
+    assert count == TOP_K_DATA_SIZE
+    assert page.index.tolist() == expected.index[offset : offset + limit].tolist()
+
+    # Same with filters applied
+    query = ValueQuery(column='ints', value=60, operator=QueryOperator.LT)
+    filtered = expected[expected['ints'] < 60]
+    page, count = apply_filters(
+        data=TOP_K_DATA, filters=query, pagination=Pagination(offset=0, limit=limit, orderBy=order_by)
+    )
+    assert count == len(filtered)
+    assert page.index.tolist() == filtered.index[:limit].tolist()
+
+
+@pytest.mark.benchmark
+def test_top_k_sort_benchmark():
+    """
+    Benchmark first page loads of a sorted 1M row dataset, partial sort vs full sort
+    """
+    rng = numpy.random.default_rng(0)
+    data = DataFrame({'a': rng.random(1_000_000), 'b': rng.integers(0, 1000, 1_000_000)})
+
+    for order_by in ['a', '-b']:
+        FILTER_INDEX_CACHE.clear()
+        column = order_by.lstrip('-')
+
+        start = time.perf_counter()
+        page, _ = apply_filters(data=data, pagination=Pagination(offset=0, limit=100, orderBy=order_by))
+        top_k_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = data.sort_values(column, ascending=not order_by.startswith('-'), kind='stable')[:100]
+        full_sort_time = time.perf_counter() - start
+
+        print(f'orderBy={order_by}: partial sort {top_k_time * 1000:.1f}ms, full sort {full_sort_time * 1000:.1f}ms')
+        assert page.index.tolist() == expected.index.tolist()
+
+
+def test_contains_reuses_string_column():
+    """
+    Test that CONTAINS filters with different values reuse the same string-cast column
+    """
+    STRING_COLUMN_CACHE.clear()
+    data = TEST_DATA.copy()
+
+    filtered, _ = apply_filters(
+        data=data, filters=ValueQuery(column='col8', value='AT', operator=QueryOperator.CONTAINS)
+    )
+    assert filtered.index.tolist() == [0, 1]
+    hit, string_column = STRING_COLUMN_CACHE.get(data, 'col8')
+    assert hit
+
+    filtered, _ = apply_filters(
+        data=data, filters=ValueQuery(column='col8', value='o', operator=QueryOperator.CONTAINS)
+    )
+    assert filtered.index.tolist() == [2, 3]
+    assert STRING_COLUMN_CACHE.get(data, 'col8')[1] is string_column
+
+
+def test_compiled_filter_plan_cached():
+    """
+    Test that a filter plan is compiled once per filters and column types
+    """
+    query = ClauseQuery(
+        combinator=QueryCombinator.AND,
+        clauses=[
+            ValueQuery(column='col1', value='1', operator=QueryOperator.NE),
+            ClauseQuery(
+                combinator=QueryCombinator.OR,
+                clauses=[
+                    ValueQuery(column='col1', value=3, operator=QueryOperator.GT),
+                    ValueQuery(column='col7', value='0.5', operator=QueryOperator.LT),
+                ],
+            ),
+        ],
+    )
+
+    with patch.object(filtering, 'infer_column_type', wraps=filtering.infer_column_type) as infer:
+        plans = [compile_filter_query(data, query, 'test-plan') for data in [TEST_DATA, TEST_DATA.copy()]]
+        # Types inferred once per column
+        assert infer.call_count == 2
+
+        # Different column types get a different plan
+        compile_filter_query(TEST_DATA.astype({'col1': float}), query, 'test-plan')
+        assert infer.call_count == 4
+
+    assert plans[0] is plans[1]
+    assert plans[0] is not None
+    # col1 != 1 AND (col1 > 3 OR col7 < 0.5) -> [1, 2, 3]
+    assert numpy.flatnonzero(plans[0](TEST_DATA)).tolist() == [1, 2, 3]
+
+
+def test_compiled_filter_plan_deduplicates_filters():
+    """
+    Test that identical filters within a query are compiled and evaluated once
+    """
+    query = ClauseQuery(
+        combinator=QueryCombinator.OR,
+        clauses=[
+            ClauseQuery(
+                combinator=QueryCombinator.AND,
+                clauses=[ValueQuery(column='col3', value='a'), ValueQuery(column='col1', value=1)],
+            ),
+            ClauseQuery(
+                combinator=QueryCombinator.AND,
+                clauses=[ValueQuery(column='col3', value='a'), ValueQuery(column='col2', value=8)],
+            ),
+        ],
+    )
+    plan = compile_filter_query(TEST_DATA, query)
+    assert plan is not None
+    assert len(plan.filters) == 3
+    assert numpy.flatnonzero(plan(TEST_DATA)).tolist() == [0, 2]
+
+
+def test_filter_skipped_on_invalid_value():
+    """
+    Test that clauses whose value cannot be coerced to the column type are not applied
+    """
+    query = ClauseQuery(
+        combinator=QueryCombinator.AND,
+        clauses=[ValueQuery(column='col1', value='not a number'), ValueQuery(column='col3', value='a')],
+    )
+    filtered, count = apply_filters(data=TEST_DATA, filters=query)
+    assert filtered.index.tolist() == [0, 2]
+    assert count == 2
+
+
+INDEXED_DATA = DataFrame(
+    {
+        'num': [1, 2, None, 1, 3, None, 2, 1],
+        'cat': ['a', 'b', None, 'a', 'c', 'b', None, 'a'],
+        'date': to_datetime(['2020-01-01', '2020-01-02', None, '2020-01-01'] * 2),
+    }
+)
+
+
+@pytest.mark.parametrize(
+    'query',
+    [
+        ValueQuery(column='num', value='1', operator=QueryOperator.EQ),
+        ValueQuery(column='num', value=2, operator=QueryOperator.NE),
+        ValueQuery(column='num', value='5', operator=QueryOperator.EQ),
+        ValueQuery(column='num', value=[1, 3], operator=QueryOperator.EQ),
+        ValueQuery(column='num', value=[None, 3], operator=QueryOperator.EQ),
+        ValueQuery(column='cat', value='a', operator=QueryOperator.EQ),
+        ValueQuery(column='cat', value='b', operator=QueryOperator.NE),
+        ValueQuery(column='cat', value=['b', 'c'], operator=QueryOperator.EQ),
+        ValueQuery(column='cat', value=['x'], operator=QueryOperator.EQ),
+        ValueQuery(column='date', value='2020-01-02T00:00:00', operator=QueryOperator.EQ),
+        ClauseQuery(
+            combinator=QueryCombinator.OR,
+            clauses=[
+                ValueQuery(column='cat', value='c', operator=QueryOperator.EQ),
+                ValueQuery(column='num', value='2', operator=QueryOperator.EQ),
+            ],
+        ),
+    ],
+)
+def test_column_index_matches_scan(query):
+    """
+    Test that filters using column indexes return the same rows as scanning the columns
+    """
+    expected, expected_count = apply_filters(data=INDEXED_DATA, filters=query)
+
+    data = INDEXED_DATA.copy()
+    build_column_indexes(data, ['num', 'cat', 'date'])
+
+    filtered, count = apply_filters(data=data, filters=query)
+    assert count == expected_count
+    assert filtered.index.tolist() == expected.index.tolist()
+
+
+def test_column_index_used_for_lookups():
+    """
+    Test that an equality filter on an indexed column does not scan the column
+    """
+    data = INDEXED_DATA.copy()
+    build_column_indexes(data, ['cat', 'missing'])
+
+    hit, index = COLUMN_INDEXES.get(data, 'cat')
+    assert hit
+    assert COLUMN_INDEXES.get(data, 'missing') == (False, None)
+
+    with patch.object(index, 'equals', wraps=index.equals) as equals:
+        filtered, _ = apply_filters(data=data, filters=ValueQuery(column='cat', value='a', operator=QueryOperator.EQ))
+        assert equals.call_count == 1
+
+    assert filtered.index.tolist() == [0, 3, 7]
+
+
+def test_column_index_memory_reported():
+    """
+    Test that memory used by column indexes is reported and released with the data
+    """
+    COLUMN_INDEXES.clear()
+    assert CACHE_METRICS_TRACKER.indexes == 0
+
+    data = DataFrame({'col': numpy.arange(1000) % 10})
+    build_column_indexes(data, ['col'])
+    size = CACHE_METRICS_TRACKER.indexes
+    assert size == COLUMN_INDEXES.get(data, 'col')[1].nbytes
+    # int32 positions + 11 offsets + 10 unique values
+    assert size >= 1000 * 4
+
+    # Rebuilding the index replaces the previous one
+    build_column_indexes(data, ['col'])
+    assert CACHE_METRICS_TRACKER.indexes == size
+
+    del data
+    assert CACHE_METRICS_TRACKER.indexes == 0
+
+
+PARQUET_DATA = DataFrame(
+    {
+        'num': numpy.arange(1000),
+        'float': numpy.where(numpy.arange(1000) % 7 == 0, numpy.nan, numpy.arange(1000) % 13),
+        'cat': numpy.array(['cat', 'rat', 'dog', 'bird'])[numpy.arange(1000) % 4],
+        'date': date_range('2020-01-01', periods=1000, freq='D'),
+    }
+)
+
+
+@pytest.fixture
+def parquet_path(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    PARQUET_DATA.to_parquet(path, row_group_size=100)
+    return path
+
+
+@pytest.fixture
+def feather_path(tmp_path):
+    path = str(tmp_path / 'data.feather')
+    pyarrow.feather.write_feather(PARQUET_DATA, path, compression='uncompressed', chunksize=100)
+    return path
+
+
+@pytest.mark.parametrize(
+    'filters',
+    [
+        None,
+        ValueQuery(column='num', value='900', operator=QueryOperator.GT),
+        ValueQuery(column='date', value='2020-02-01T00:00:00', operator=QueryOperator.LT),
+        ValueQuery(column='num', value=[5, 550, 999], operator=QueryOperator.EQ),
+        ClauseQuery(
+            combinator=QueryCombinator.OR,
+            clauses=[
+                ValueQuery(column='float', value='3', operator=QueryOperator.EQ),
+                ValueQuery(column='cat', value='IR', operator=QueryOperator.CONTAINS),
+            ],
+        ),
+        ClauseQuery(
+            combinator=QueryCombinator.AND,
+            clauses=[
+                ValueQuery(column='num', value=[100, 250], operator=QueryOperator.BT),
+                ValueQuery(column='cat', value='dog', operator=QueryOperator.NE),
+            ],
+        ),
+    ],
+)
+@pytest.mark.parametrize(
+    'pagination',
+    [
+        None,
+        Pagination(offset=10, limit=20),
+        Pagination(offset=5, limit=10, orderBy='-float'),
+        Pagination(offset=30, limit=10, orderBy='cat'),
+        Pagination(index='3'),
+    ],
+)
+@pytest.mark.parametrize('path_fixture', ['parquet_path', 'feather_path'])
+def test_parquet_filters_match_in_memory(request, path_fixture, filters, pagination):
+    """
+    Test that filtering and paginating a Parquet or Arrow file returns the same rows as doing so in memory
+    """
+    expected, expected_count = apply_filters(append_index(PARQUET_DATA), filters, pagination)
+    filtered, count = apply_filters_to_parquet(request.getfixturevalue(path_fixture), filters, pagination)
+
+    assert count == expected_count
+    assert filtered.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+def test_parquet_row_groups_pruned(parquet_path):
+    """
+    Test that only row groups which can match the filters are read, and only filtered columns are read from them
+    """
+    filters = ClauseQuery(
+        combinator=QueryCombinator.AND,
+        clauses=[
+            ValueQuery(column='num', value='850', operator=QueryOperator.GT),
+            ValueQuery(column='cat', value='dog', operator=QueryOperator.EQ),
+        ],
+    )
+
+    with patch.object(filtering, '_read_row_group', wraps=filtering._read_row_group) as read_row_group:
+        filtered, count = apply_filters_to_parquet(parquet_path, filters, Pagination(offset=0, limit=5))
+
+    # 2 row groups scanned for the filter columns, then the first one read in full for the page
+    assert [(call.args[0][1], *call.args[1:]) for call in read_row_group.call_args_list] == [
+        (800, ['cat', 'num']),
+        (900, ['cat', 'num']),
+        (800,),
+    ]
+    assert count == 37
+    assert filtered['num'].tolist() == [854, 858, 862, 866, 870]
+
+
+@pytest.mark.parametrize(
+    'filters',
+    [
+        ValueQuery(column='day', value='2020-01-10T00:00:00', operator=QueryOperator.GT),
+        ValueQuery(column='day', value=['2020-01-01T00:00:00', '2020-03-01T00:00:00'], operator=QueryOperator.BT),
+        ValueQuery(column='tz', value='2020-01-10T00:00:00Z', operator=QueryOperator.LT),
+        ValueQuery(column='num', value=['5', '150'], operator=QueryOperator.EQ),
+    ],
+)
+def test_parquet_pushdown_matches_filter_plan(tmp_path, filters):
+    """
+    Test that row groups are only pruned for filters the filter plan compares the same way, i.e. not for dates
+    read as objects, timezone-aware timestamps or `isin` values which would need coercing
+    """
+    data = DataFrame(
+        {
+            'num': numpy.arange(200),
+            'day': date_range('2020-01-01', periods=200, freq='D').date,
+            'tz': date_range('2020-01-01', periods=200, freq='D', tz='UTC'),
+        }
+    )
+    path = str(tmp_path / 'data.parquet')
+    data.to_parquet(path, row_group_size=20)
+
+    assert filtering.to_arrow_expression(filters, pyarrow.parquet.read_schema(path)) is None
+
+    expected, expected_count = apply_filters(append_index(data), filters)
+    filtered, count = apply_filters_to_parquet(path, filters)
+
+    assert count == expected_count
+    assert filtered.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+def test_parquet_positions_cached(parquet_path):
+    """
+    Test that positions of the filtered and sorted rows are cached until the dataset is rewritten
+    """
+    filters = ValueQuery(column='num', value='850', operator=QueryOperator.GT)
+
+    with patch.object(filtering, '_read_row_group', wraps=filtering._read_row_group) as read_row_group:
+        first, count = apply_filters_to_parquet(parquet_path, filters, Pagination(offset=0, limit=5, orderBy='-num'))
+        assert count == 149
+        assert first['num'].tolist() == [999, 998, 997, 996, 995]
+
+        # Only the row group holding the next page is read
+        read_row_group.reset_mock()
+        second, count = apply_filters_to_parquet(parquet_path, filters, Pagination(offset=5, limit=5, orderBy='-num'))
+        assert count == 149
+        assert second['num'].tolist() == [994, 993, 992, 991, 990]
+        assert [call.args[1:] for call in read_row_group.call_args_list] == [()]
+
+        # Filtered positions are reused without sorting
+        read_row_group.reset_mock()
+        unsorted, count = apply_filters_to_parquet(parquet_path, filters, Pagination(offset=0, limit=5))
+        assert count == 149
+        assert unsorted['num'].tolist() == [851, 852, 853, 854, 855]
+        assert [call.args[1:] for call in read_row_group.call_args_list] == [()]
+
+    # Rewriting the dataset invalidates the cached positions
+    time.sleep(0.01)
+    PARQUET_DATA.iloc[::-1].to_parquet(parquet_path, row_group_size=100)
+    rewritten, count = apply_filters_to_parquet(parquet_path, filters, Pagination(offset=0, limit=5))
+    assert count == 149
+    assert rewritten['num'].tolist() == [999, 998, 997, 996, 995]
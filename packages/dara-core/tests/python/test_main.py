@@ -1974,7 +1974,7 @@ async def test_websocket_connection(uid):
         async with _async_ws_connect(client) as websocket:
             # Check that the init method is sent correctly
             data = await websocket.receive_json()
-            assert data == {'message': {'channel': 'uid'}, 'type': 'init'}
+            assert data == {'message': {'channel': 'uid', 'encoding': 'json'}, 'type': 'init'}
 
             # Check that a ping message is replied to with a pong
             await websocket.send_json({'type': 'ping'})
@@ -1,8 +1,16 @@
+import gc
+import threading
+import time
 from multiprocessing import active_children
+from multiprocessing.shared_memory import SharedMemory
 from typing import Any, Optional
+from unittest.mock import Mock, patch
 
+import numpy
 import pytest
 from anyio import create_task_group
+from pandas import DataFrame
+from prometheus_client import REGISTRY
 
 from dara.core.internal.pool import TaskPool
 from dara.core.internal.pool.channel import Channel
@@ -11,17 +19,26 @@ from dara.core.internal.pool.definitions import (
     SubprocessException,
     TaskDefinition,
     TaskPayload,
+    TaskPriority,
     WorkerParameters,
     WorkerStatus,
     is_acknowledgement,
-    is_log,
+    is_batch,
     is_problem,
     is_progress,
     is_result,
 )
+from dara.core.internal.pool.scheduling import TaskScheduler
 from dara.core.internal.pool.task_pool import shutdown
-from dara.core.internal.pool.utils import read_from_shared_memory, stop_process_async
-from dara.core.internal.pool.worker import WorkerProcess
+from dara.core.internal.pool.utils import (
+    BUFFER_ALIGNMENT,
+    _released_shared_memory,
+    close_released_shared_memory,
+    read_from_shared_memory,
+    stop_process_async,
+    store_in_shared_memory,
+)
+from dara.core.internal.pool.worker import MessageBuffer, WorkerProcess
 
 from tests.python.utils import sleep_for, wait_assert, wait_for
 
@@ -189,7 +206,7 @@ async def test_worker_emits_logs():
     )
     channel.pool_api.dispatch(task_def)
 
-    # There should be 3 messages - 1 acknowledgement, log, result each; order not deterministing because of the log
+    # There should be 3 messages - 1 acknowledgement, batch with the log, result each; order not deterministing because of the log
     logs_found = 0
     ack_found = 0
     res_found = 0
@@ -198,8 +215,8 @@ async def test_worker_emits_logs():
         msg = await wait_for(lambda: channel.pool_api.get_worker_message(), timeout=3)
         assert msg is not None
 
-        if is_log(msg):
-            assert msg['log'] == 'TEST_LOG'
+        if is_batch(msg):
+            assert msg['messages'] == [{'task_uid': task_def.uid, 'log': 'TEST_LOG'}]
             logs_found += 1
 
         if is_acknowledgement(msg):
@@ -233,18 +250,97 @@ async def test_worker_emits_progress():
 
     await wait_assert(lambda: assert_task_acknowledged(channel, task_def.uid, worker.process.pid), timeout=3)
 
-    # There should be 5 progress updates
-    for i in range(1, 6):
-        progress_update = await wait_for(channel.pool_api.get_worker_message, timeout=2)
-        assert progress_update is not None
-        assert is_progress(progress_update)
-        assert progress_update['progress'] == (i / 5) * 100
-        assert progress_update['message'] == f'Track1 step {i}'
+    # Progress updates are throttled to the latest one in each batch, the last one is sent before the result
+    progress_updates = []
+    result = None
+    while result is None:
+        msg = await wait_for(channel.pool_api.get_worker_message, timeout=2)
+        assert msg is not None
 
-    await wait_assert(lambda: assert_task_result(channel, task_def.uid, 'result'), timeout=3)
+        if is_result(msg):
+            result = read_from_shared_memory(msg['result'])
+        else:
+            assert is_batch(msg)
+            assert len(msg['messages']) == 1
+            assert is_progress(msg['messages'][0])
+            progress_updates.append(msg['messages'][0])
+
+    assert result == 'result'
+    assert 1 <= len(progress_updates) <= 5
+    assert [update['progress'] for update in progress_updates] == sorted(
+        update['progress'] for update in progress_updates
+    )
+    assert progress_updates[-1]['message'] == 'Track1 step 5'
     await cleanup_worker(worker)
 
 
+async def test_message_buffer():
+    """
+    Test that logs are buffered by line and progress updates are throttled to the latest one
+    """
+    channel = Channel()
+    message_buffer = MessageBuffer(channel)
+
+    message_buffer.log('task', 'first')
+    message_buffer.log('task', '\n')
+    message_buffer.log('task', 'second\nthi')
+    message_buffer.send_progress('task', 10, 'Step 1')
+    message_buffer.send_progress('task', 20, 'Step 2')
+    message_buffer.flush()
+
+    batch = await wait_for(channel.pool_api.get_worker_message, timeout=2)
+    assert batch == {
+        'messages': [
+            {'task_uid': 'task', 'log': 'first\nsecond'},
+            {'task_uid': 'task', 'progress': 20, 'message': 'Step 2'},
+        ]
+    }
+
+    # Incomplete lines are only sent on the final flush
+    message_buffer.flush()
+    message_buffer.log('task', 'rd')
+    message_buffer.flush(final=True)
+
+    batch = await wait_for(channel.pool_api.get_worker_message, timeout=2)
+    assert batch == {'messages': [{'task_uid': 'task', 'log': 'third'}]}
+
+
+async def test_message_buffer_flush_progress_waits_for_flush():
+    """
+    Test that flushing progress waits for a flush already sending progress, so that it is sent before the result
+    """
+    sent = []
+    sending = threading.Event()
+    release = threading.Event()
+
+    def send_batch(messages):
+        if threading.current_thread() is not threading.main_thread():
+            sending.set()
+            release.wait(2)
+        sent.append(messages)
+
+    channel = Mock()
+    channel.worker_api.send_batch.side_effect = send_batch
+    message_buffer = MessageBuffer(channel)
+
+    # A background flush collects the progress update and is still sending it when the task finishes
+    message_buffer.send_progress('task', 50, 'Halfway')
+    flush_thread = threading.Thread(target=message_buffer.flush)
+    flush_thread.start()
+    assert sending.wait(2)
+
+    flush_progress_thread = threading.Thread(target=lambda: (message_buffer.flush_progress(), sent.append('result')))
+    flush_progress_thread.start()
+    flush_progress_thread.join(0.2)
+    assert flush_progress_thread.is_alive()
+
+    release.set()
+    flush_thread.join(2)
+    flush_progress_thread.join(2)
+
+    assert sent == [[{'task_uid': 'task', 'progress': 50, 'message': 'Halfway'}], 'result']
+
+
 async def test_worker_async_task_success():
     """
     Test the happy path for an async task - the task is acknowledged and result sent back
@@ -395,6 +491,231 @@ async def test_pool_task_large_dataset():
             assert result == input_data
 
 
+async def test_pool_task_large_dataframe():
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=2, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            input_data = DataFrame({'a': numpy.arange(1_000_000), 'b': numpy.random.rand(1_000_000)})
+            task = pool.submit('test', 'identity_task', (input_data,))
+            result = await task
+            assert result.equals(input_data)
+
+
+@pytest.mark.benchmark
+async def test_pool_task_overhead():
+    """
+    Micro-benchmark of the per-task overhead of the pool, running trivial tasks one after another
+    """
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=1, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            n_tasks = 50
+            start = time.perf_counter()
+            for i in range(n_tasks):
+                assert await pool.submit(f'test_{i}', 'add', (i, 1)) == i + 1
+            overhead = (time.perf_counter() - start) / n_tasks
+
+            print(f'Per-task overhead: {overhead * 1000:.2f}ms')
+
+
+@pytest.mark.benchmark
+async def test_pool_burst_latency():
+    """
+    Benchmark of the pool startup and of running a burst of tasks with a warm floor of idle workers
+    """
+    async with create_task_group() as tg:
+        start = time.perf_counter()
+        async with TaskPool(task_group=tg, max_workers=4, min_idle_workers=4, worker_parameters=WORKER_PARAMS) as pool:
+            print(f'Pool startup: {time.perf_counter() - start:.2f}s')
+            # All workers are ready before any task is submitted
+            assert_workers_started(pool, 4)
+
+            start = time.perf_counter()
+            tasks = [pool.submit(f'test_{i}', 'add', (i, 1), {'delay': 0.5}) for i in range(4)]
+            results = [await task for task in tasks]
+            burst_latency = time.perf_counter() - start
+
+            print(f'Burst latency: {burst_latency:.2f}s')
+            assert results == [1, 2, 3, 4]
+
+
+async def test_pool_min_idle_workers():
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=4, min_idle_workers=2, worker_parameters=WORKER_PARAMS) as pool:
+            assert_workers_started(pool, 2)
+
+            # Floor of idle workers is kept on top of the workers busy with tasks
+            task = pool.submit('test_uid', 'add', (1, 2), {'delay': 1})
+            assert pool.desired_workers == 3
+            await wait_assert(lambda: len(pool.workers) == 3, timeout=3)
+            assert await task == 3
+
+    with pytest.raises(ValueError):
+        TaskPool(task_group=tg, max_workers=4, min_idle_workers=0, worker_parameters=WORKER_PARAMS)
+
+
+def get_recycle_metric(reason: str) -> float:
+    return REGISTRY.get_sample_value('task_pool_worker_recycles_total', {'reason': reason}) or 0
+
+
+@pytest.mark.parametrize(
+    'limits,reason',
+    [({'max_tasks_per_worker': 2}, 'max_tasks'), ({'max_worker_rss': 1}, 'max_rss')],
+)
+async def test_pool_recycles_workers(limits, reason):
+    recycles = get_recycle_metric(reason)
+
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=1, worker_parameters=WORKER_PARAMS, **limits) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+            worker_pid = next(iter(pool.workers))
+
+            assert await pool.submit('test_uid_1', 'add', (1, 2)) == 3
+            assert await pool.submit('test_uid_2', 'add', (2, 3)) == 5
+
+            # Worker retired after finishing its task and was replaced by a new one
+            await wait_assert(lambda: worker_pid not in pool.workers and assert_workers_started(pool, 1), timeout=5)
+            assert await pool.submit('test_uid_3', 'add', (3, 4)) == 7
+
+    assert get_recycle_metric(reason) > recycles
+
+
+async def test_pool_worker_exits_after_result():
+    """
+    Test that a worker exiting right after sending the result of its last task does not fail the task,
+    even if the pool only receives the result once the worker has exited
+    """
+    async with create_task_group() as tg:
+        async with TaskPool(
+            task_group=tg, max_workers=1, worker_parameters=WORKER_PARAMS, max_tasks_per_worker=1
+        ) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+            worker = next(iter(pool.workers.values()))
+
+            # Patch the class, the channel is pickled when the worker is replaced
+            pool_api = type(pool._channel.pool_api)
+            get_worker_messages = pool_api.get_worker_messages
+            held_back = []
+
+            def get_worker_messages_after_exit(self, timeout: Optional[float] = None):
+                # Hold back the result until the worker has exited, as if it had not arrived yet
+                messages = held_back + get_worker_messages(self, timeout)
+                held_back.clear()
+
+                if worker.process.is_alive() and any(is_result(msg) for msg in messages):
+                    held_back.extend(messages)
+                    worker.process.join(5)
+                    return []
+
+                return messages
+
+            with patch.object(pool_api, 'get_worker_messages', get_worker_messages_after_exit):
+                assert await pool.submit('test_uid_1', 'add', (1, 2)) == 3
+                assert not worker.process.is_alive()
+
+
+def make_task(uid: str, user: Optional[str], priority: TaskPriority = TaskPriority.INTERACTIVE) -> TaskDefinition:
+    return TaskDefinition(
+        uid=uid, payload=TaskPayload(function_name='add', args=(), kwargs={}), priority=priority, user=user
+    )
+
+
+def test_scheduler_order():
+    """
+    Test that tasks are picked by priority, then in turns between users
+    """
+    scheduler = TaskScheduler()
+    for task in [
+        make_task('background', 'user_c', TaskPriority.BACKGROUND),
+        make_task('a_1', 'user_a'),
+        make_task('a_2', 'user_a'),
+        make_task('a_3', 'user_a'),
+        make_task('b_1', 'user_b'),
+        make_task('b_2', 'user_b'),
+    ]:
+        scheduler.push(task)
+
+    assert len(scheduler) == 6
+    assert REGISTRY.get_sample_value('task_pool_queue_depth', {'priority': 'interactive'}) == 5
+    assert REGISTRY.get_sample_value('task_pool_queue_depth', {'priority': 'background'}) == 1
+
+    order = []
+    while (task := scheduler.pop({})) is not None:
+        order.append(task.uid)
+
+    assert order == ['a_1', 'b_1', 'a_2', 'b_2', 'a_3', 'background']
+    assert REGISTRY.get_sample_value('task_pool_queue_depth', {'priority': 'interactive'}) == 0
+
+
+def test_scheduler_user_cap():
+    """
+    Test that users at their concurrency cap are skipped, apart from tasks without a user
+    """
+    scheduler = TaskScheduler(max_tasks_per_user=1)
+    task_a, task_b, task_anonymous = make_task('a', 'user_a'), make_task('b', 'user_b'), make_task('c', None)
+    for task in [task_a, task_b, task_anonymous]:
+        scheduler.push(task)
+
+    assert scheduler.pop({'user_a': 1, None: 5}) is task_b
+    assert scheduler.pop({'user_a': 1, 'user_b': 1, None: 5}) is task_anonymous
+    assert scheduler.pop({'user_a': 1, 'user_b': 1}) is None
+
+    # Removed tasks are not picked anymore
+    assert scheduler.remove(task_a)
+    assert not scheduler.remove(task_a)
+    assert scheduler.pop({}) is None
+
+
+async def test_pool_fair_share():
+    """
+    Test that a user submitting many tasks does not hold up the tasks of other users
+    """
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=1, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            heavy_tasks = [pool.submit(f'heavy_{i}', 'add', (i, 1), {'delay': 0.5}, user='heavy') for i in range(4)]
+            background_task = pool.submit('background', 'add', (1, 1), priority=TaskPriority.BACKGROUND, user='light')
+            light_task = pool.submit('light', 'add', (1, 2), user='light')
+
+            # Light user's task does not wait for all of the heavy user's tasks
+            assert await light_task == 3
+            assert not heavy_tasks[2].event.is_set()
+
+            # Background tasks run once no interactive tasks are waiting
+            assert await background_task == 2
+            assert all(task.event.is_set() for task in heavy_tasks)
+
+
+def test_shared_memory_zero_copy():
+    """
+    Test that arrays are read back from shared memory without copies and the memory is released once unused
+    """
+    array = numpy.arange(1_000_000)
+    pointer = store_in_shared_memory({'array': array, 'value': 'test'})
+    name, _, buffers = pointer
+    assert len(buffers) == 1
+
+    result = read_from_shared_memory(pointer)
+    assert result['value'] == 'test'
+    assert numpy.array_equal(result['array'], array)
+    # A writable view of the shared memory, aligned for vectorized operations
+    assert not result['array'].flags.owndata
+    assert result['array'].flags.writeable
+    assert result['array'].ctypes.data % BUFFER_ALIGNMENT == 0
+
+    # Name is unlinked straight away
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)
+
+    del result
+    gc.collect()
+    close_released_shared_memory()
+    assert len(_released_shared_memory) == 0
+
+
 async def test_pool_queues_task_when_no_worker_available():
     async with create_task_group() as tg:
         async with TaskPool(task_group=tg, max_workers=1, worker_parameters=WORKER_PARAMS) as pool:
@@ -439,13 +760,88 @@ async def test_pool_emits_progress_messages():
                 result = await task
                 assert result == 'result'
 
-                assert len(msgs) == 5
-                for i in range(1, 6):
-                    assert msgs[i - 1] == (float(i * 20), f'Track1 step {i}')
+                # Updates are throttled, the last one always arrives
+                assert 1 <= len(msgs) <= 5
+                assert all(msg in [(float(i * 20), f'Track1 step {i}') for i in range(1, 6)] for msg in msgs)
+                assert msgs[-1] == (100.0, 'Track1 step 5')
 
             assert len(pool._progress_subscribers) == 0
 
 
+async def test_pool_map():
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=2, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            progress = []
+
+            async def on_progress(progress_value: float, message: str):
+                progress.append((progress_value, message))
+
+            with pool.on_progress('test_map', on_progress):
+                result = await pool.map('test_map', 'square', range(10), {'offset': 1}, chunk_size=3)
+
+            assert result == [x * x + 1 for x in range(10)]
+
+            # Progress of all 4 chunks is reported together
+            assert 4 <= len(progress) <= 10
+            assert progress[-1] == (100, 'Processed 10 of 10 items')
+            assert [value for value, _ in progress] == sorted(value for value, _ in progress)
+
+            assert await pool.map('test_empty_map', 'square', []) == []
+            assert len(pool.tasks) == 0
+
+
+async def test_pool_map_exception():
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=2, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            with pytest.raises(Exception) as e:
+                await pool.map('test_map', 'fail_on_value', range(10), {'value': 5}, chunk_size=2)
+
+            assert e.match('test exception')
+
+            # Remaining chunks are cancelled
+            await wait_assert(lambda: len(pool.tasks) == 0, timeout=3)
+
+
+@pytest.mark.parametrize(
+    'function_name,args,expected_partials,expected_result',
+    [
+        ('estimate_task', (), [1, 2], 'final'),
+        ('async_estimate_task', (), [0, 1, 2], [0, 1, 2]),
+        (
+            'chunks_task',
+            (3,),
+            [DataFrame({'a': [i]}, index=[i]) for i in range(3)],
+            DataFrame({'a': [0, 1, 2]}),
+        ),
+    ],
+)
+async def test_pool_streams_partial_results(function_name, args, expected_partials, expected_result):
+    async with create_task_group() as tg:
+        async with TaskPool(task_group=tg, max_workers=2, worker_parameters=WORKER_PARAMS) as pool:
+            await wait_assert(lambda: assert_workers_started(pool, 1), timeout=3)
+
+            partials = []
+
+            async def on_partial_result(partial: Any):
+                partials.append(partial)
+
+            with pool.on_partial_result('test_uid', on_partial_result):
+                result = await pool.submit('test_uid', function_name, args)
+
+            # Partial results arrive before the task completes, the result accumulates them
+            assert len(partials) == len(expected_partials)
+            if isinstance(expected_result, DataFrame):
+                assert all(partial.equals(expected) for partial, expected in zip(partials, expected_partials))
+                assert result.equals(expected_result)
+            else:
+                assert partials == expected_partials
+                assert result == expected_result
+
+
 async def test_pool_sync_task_exception():
     async with create_task_group() as tg:
         async with TaskPool(task_group=tg, max_workers=2, worker_parameters=WORKER_PARAMS) as pool:
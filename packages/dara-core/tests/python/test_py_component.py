@@ -908,18 +908,16 @@ async def test_single_dv_track_progress():
             task_id = data.get('task_id')
             assert task_id is not None
 
-            # Expect 5 progress updates in order
-            for i in range(1, 6):
+            # Progress updates are throttled by the worker so expect up to 5 in order, ending with the last step
+            progress_updates = []
+            while len(progress_updates) == 0 or progress_updates[-1]['message'] != 'Track1 step 5':
                 progress_update = await websocket.receive_json()
-                assert progress_update == {
-                    'message': {
-                        'progress': (i / 5) * 100,
-                        'message': f'Track1 step {i}',
-                        'status': 'PROGRESS',
-                        'task_id': task_id,
-                    },
-                    'type': 'message',
-                }
+                assert progress_update['message']['status'] == 'PROGRESS'
+                assert progress_update['message']['task_id'] == task_id
+                progress_updates.append(progress_update['message'])
+
+            assert 1 <= len(progress_updates) <= 5
+            assert progress_updates[-1]['progress'] == 100.0
 
             # Listen on the websocket channel for two notifications of underlying DV task completion
             complete_messages = await get_ws_messages(websocket)
@@ -997,10 +995,9 @@ async def test_multiple_dv_track_progress():
                 x.get('message').get('task_id') for x in messages if x.get('message').get('status') == 'COMPLETE'
             ]
 
-            # We can't check their order since they are concurrent so just check all progress updates arrived
-            for i in range(1, 6):
-                assert f'Track1 step {i}' in progress_updates
-                assert f'Track2 step {i}' in progress_updates
+            # We can't check their order since they are concurrent; updates are throttled so check the final steps arrived
+            assert 'Track1 step 5' in progress_updates
+            assert 'Track2 step 5' in progress_updates
 
             #  task_id should be completed
             assert task_id in completion_messages
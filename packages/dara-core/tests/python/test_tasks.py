@@ -1,17 +1,28 @@
 import asyncio
+import json
 from unittest.mock import AsyncMock, patch
 
 import anyio
 import pytest
 from anyio import create_task_group
+from pandas import DataFrame
 
 from dara.core.base_definitions import Cache
-from dara.core.internal.pool import TaskPool
+from dara.core.interactivity import DerivedVariable, Variable
+from dara.core.internal.pool import TaskPool, TaskPriority
 from dara.core.internal.cache_store import CacheStore
-from dara.core.internal.tasks import Task, TaskManager, TaskResultEntry, CachedRegistryEntry
+from dara.core.internal.tasks import (
+    MapTask,
+    MetaTask,
+    ProgressNotifier,
+    Task,
+    TaskManager,
+    TaskResultEntry,
+    CachedRegistryEntry,
+)
 from dara.core.internal.websocket import WebsocketManager
 
-from tests.python.tasks import calc_task, track_task
+from tests.python.tasks import calc_task, chunks_task, square, track_task
 
 pytestmark = pytest.mark.anyio
 
@@ -37,6 +48,47 @@ async def test_async_creating_task_with_function():
     await task.cancel()
 
 
+async def test_map_task():
+    task = MapTask(square, range(20), kwargs={'offset': 2}, chunk_size=4)
+    result = await task.run()
+    assert result == [x * x + 2 for x in range(20)]
+
+
+async def test_derived_variable_task_priority():
+    """Test that tasks of derived variables, and the tasks processing their sub-task results, have their priority"""
+    from dara.core.internal.registries import derived_variable_registry, utils_registry
+
+    store: CacheStore = utils_registry.get('Store')
+    pool: TaskPool = utils_registry.get('TaskPool')
+
+    dv = DerivedVariable(
+        calc_task, variables=[Variable(1), Variable(2)], run_as_task=True, priority=TaskPriority.BACKGROUND
+    )
+    var_entry = derived_variable_registry.get(str(dv.uid))
+
+    async with create_task_group() as tg:
+        task_mgr = TaskManager(tg, WebsocketManager(), store)
+        task = (await DerivedVariable.get_value(var_entry, store, task_mgr, [1, 2]))['value']
+
+    assert isinstance(task, Task)
+    assert task.priority == TaskPriority.BACKGROUND
+
+    meta_task = MetaTask(
+        calc_task, [Task(calc_task, [1, 2]), 3], process_as_task=True, priority=TaskPriority.BACKGROUND
+    )
+
+    with patch.object(pool, 'submit', wraps=pool.submit) as submit:
+        assert await task.run() == '3'
+        assert await meta_task.run() == '6'
+
+    # The sub-task keeps its own priority, the task processing its result has the priority of the meta task
+    assert [call.kwargs['priority'] for call in submit.call_args_list] == [
+        TaskPriority.BACKGROUND,
+        TaskPriority.INTERACTIVE,
+        TaskPriority.BACKGROUND,
+    ]
+
+
 @patch('dara.core.base_definitions.uuid.uuid4', return_value='uid')
 async def test_task_manager_run_task(_uid):
     """Test that we can run a task via the TaskManager and notify the websocket manager of the result"""
@@ -59,7 +111,7 @@ async def test_task_manager_run_task(_uid):
         assert pending_task.event.is_set() == False
 
         # No messages sent to websocket
-        assert handler.receive_stream.statistics().current_buffer_used == 0
+        assert len(handler.send_queue) == 0
 
         # Stored value is the pending task
         assert await store.get(reg_entry, key='uid') == pending_task
@@ -77,8 +129,35 @@ async def test_task_manager_run_task(_uid):
         assert await store.get(reg_entry, key='uid') == '3'
 
         # Check ws message is received
-        ws_msg = await handler.receive_stream.receive()
-        assert ws_msg.message.dict() == {'result': '3', 'status': 'COMPLETE', 'task_id': 'uid'}
+        # The result is not sent to the client, it is fetched separately
+        ws_msg = json.loads(await handler.send_queue.get())
+        assert ws_msg['message'] == {'status': 'COMPLETE', 'task_id': 'uid'}
+
+
+@patch('dara.core.base_definitions.uuid.uuid4', return_value='uid')
+async def test_task_manager_run_task_partial_results(_uid):
+    """Test that partial results yielded by a task are streamed to the websocket while the final result is cached"""
+    reg_entry = CachedRegistryEntry(uid='test_uid', cache=Cache.Policy.KeepAll())
+    task = Task(chunks_task, [2], cache_key='uid', reg_entry=reg_entry)
+
+    async with create_task_group() as tg:
+        store = CacheStore()
+        ws_mgr = WebsocketManager()
+        task_manager = TaskManager(tg, ws_mgr, store)
+        handler = ws_mgr.create_handler('chan')
+
+        pending_task = await task_manager.run_task(task, 'chan')
+        result = await pending_task.run()
+        assert result.equals(DataFrame({'a': [0, 1]}))
+
+        for i in range(2):
+            ws_msg = json.loads(await handler.send_queue.get())
+            assert ws_msg['message'] == {'result': [{'a': i}], 'status': 'PARTIAL', 'task_id': 'uid'}
+
+        # Cache is updated with the accumulated result before the completion is notified
+        ws_msg = json.loads(await handler.send_queue.get())
+        assert ws_msg['message']['status'] == 'COMPLETE'
+        assert (await store.get(reg_entry, key='uid')).equals(result)
 
 
 @patch('dara.core.base_definitions.uuid.uuid4', return_value='uid')
@@ -99,35 +178,64 @@ async def test_task_manager_run_task_track_progress(_uid):
         handler = ws_mgr.create_handler(return_channel)
 
         pending_task = await task_manager.run_task(task, return_channel)
-        assert handler.receive_stream.statistics().current_buffer_used == 0
+        assert len(handler.send_queue) == 0
 
         result = await pending_task.run()
         assert result == 'result'
 
-        messages_count = handler.receive_stream.statistics().current_buffer_used
+        messages_count = len(handler.send_queue)
         messages = []
         for i in range(messages_count):
-            messages.append(handler.receive_stream.receive_nowait().message.dict())
+            messages.append(json.loads(handler.send_queue.get_nowait())['message'])
+
+        # at least 1 step + result, progress updates are throttled by the worker
+        assert len(messages) >= 2
 
-        # at lesat 5 steps + result
-        assert len(messages) >= 6
+        expected_updates = [
+            {'progress': (i / 5) * 100, 'message': f'Track1 step {i}', 'status': 'PROGRESS', 'task_id': 'uid'}
+            for i in range(1, 6)
+        ]
+        progress_updates = [message for message in messages if message['status'] == 'PROGRESS']
+        assert all(update in expected_updates for update in progress_updates)
 
-        for i in range(1, 6):
-            # Check that the call happened at some point - we're not interested in the order
-            assert {
-                'progress': (i / 5) * 100,
-                'message': f'Track1 step {i}',
-                'status': 'PROGRESS',
-                'task_id': 'uid',
-            } in messages
+        # The last step always arrives
+        assert expected_updates[-1] in progress_updates
 
-        # Check that the result is sent
-        assert {'result': 'result', 'status': 'COMPLETE', 'task_id': 'uid'} in messages
+        # Check that the completion is sent
+        assert {'status': 'COMPLETE', 'task_id': 'uid'} in messages
 
         # Check fetching the result from the store
         assert await task_manager.get_result('uid') == 'result'
 
 
+async def test_progress_notifier():
+    """Test that progress notifications are coalesced to at most one per interval, keeping the latest"""
+    sent = []
+
+    async def notify(message: dict):
+        sent.append(message['progress'])
+
+    notifier = ProgressNotifier(notify, interval=0.2)
+
+    async with create_task_group() as tg:
+        # The first update goes out straight away, the rest within the interval are coalesced
+        for i in range(100):
+            await notifier.update({'progress': i}, tg)
+        assert sent == [0]
+
+        await anyio.sleep(0.3)
+        assert sent == [0, 99]
+
+        # A terminal notification sends the pending update without waiting for the interval
+        await notifier.update({'progress': 100}, tg)
+        await notifier.close()
+        assert sent == [0, 99, 100]
+
+    # Nothing left to send
+    await notifier.close()
+    assert sent == [0, 99, 100]
+
+
 @patch('dara.core.base_definitions.uuid.uuid4', return_value='uid')
 async def test_task_manager_cancel_task(_uid):
     """Test that we can cancel a running task via the TaskManager"""
@@ -143,7 +251,7 @@ async def test_task_manager_cancel_task(_uid):
         handler = ws_mgr.create_handler(return_channel)
 
         pending_task = await task_manager.run_task(task, return_channel)
-        assert handler.receive_stream.statistics().current_buffer_used == 0
+        assert len(handler.send_queue) == 0
 
         # Yield to let the task start
         await anyio.sleep(0.1)
@@ -156,7 +264,7 @@ async def test_task_manager_cancel_task(_uid):
 
         assert 'cancel' in str(e.value)
 
-        assert (await handler.receive_stream.receive()).message.dict() == {'status': 'CANCELED', 'task_id': 'uid'}
+        assert json.loads(await handler.send_queue.get())['message'] == {'status': 'CANCELED', 'task_id': 'uid'}
 
 
 @patch('dara.core.base_definitions.uuid.uuid4', return_value='uid')
@@ -187,7 +295,7 @@ async def test_task_manager_cancel_task_with_subs(_uid):
         await task_manager.cancel_task(task.task_id)
 
         # Check that the WS wasn't called, but that a subscriber was subtracted
-        assert handler.receive_stream.statistics().current_buffer_used == 0
+        assert len(handler.send_queue) == 0
         assert (await store.get(reg_entry, 'cache_key')).subscribers == 1
 
         # Cancel the task
@@ -198,7 +306,7 @@ async def test_task_manager_cancel_task_with_subs(_uid):
         assert 'cancel' in str(e.value)
 
         # Now the task should be canceled
-        assert (await handler.receive_stream.receive()).message.dict() == {'status': 'CANCELED', 'task_id': 'uid'}
+        assert json.loads(await handler.send_queue.get())['message'] == {'status': 'CANCELED', 'task_id': 'uid'}
 
         # Check that now the pending task should be removed
         assert await store.get(reg_entry, 'cache_key') is None
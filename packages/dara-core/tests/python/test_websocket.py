@@ -1,9 +1,15 @@
 import asyncio
+import json
 import os
+import time
+import zlib
+from unittest.mock import patch
 
 import anyio
 import pytest
 from async_asgi_testclient import TestClient as AsyncTestClient
+from fastapi.encoders import jsonable_encoder
+from prometheus_client import REGISTRY
 from tests.python.tasks import exception_task
 from tests.python.utils import (
     AUTH_HEADERS,
@@ -27,7 +33,11 @@ from dara.core.internal.websocket import (
     DaraServerMessage,
     ServerMessagePayload,
     WebSocketHandler,
+    SendQueue,
+    SlowClientError,
     WebsocketManager,
+    WsEncoding,
+    encode_message,
 )
 from dara.core.main import _start_application
 
@@ -153,6 +163,233 @@ async def test_websocket_broadcast():
                     assert messages2[0].get('message') == {'message': 'broadcast message'}
 
 
+def test_encode_message():
+    """
+    Test that task notifications are encoded without their result, apart from partial results
+    """
+    complete = encode_message(DaraServerMessage(message={'task_id': 'uid', 'status': 'COMPLETE', 'result': 'value'}))
+    assert json.loads(complete.encode()) == {'type': 'message', 'message': {'task_id': 'uid', 'status': 'COMPLETE'}}
+
+    partial = encode_message(DaraServerMessage(message={'task_id': 'uid', 'status': 'PARTIAL', 'result': [1, 2]}))
+    assert json.loads(partial.encode())['message']['result'] == [1, 2]
+
+    # Values orjson cannot serialize fall back to the fastapi encoder
+    variable = Variable(default=1, uid='var')
+    message = encode_message(DaraServerMessage(message={'value': {1, 2}, 'variable': variable}))
+    assert json.loads(message.encode())['message'] == {'value': [1, 2], 'variable': jsonable_encoder(variable)}
+
+
+async def test_websocket_broadcast_encodes_once():
+    """
+    Test that a broadcast message is encoded once and the same encoded message is queued for every client
+    """
+    ws_mgr = WebsocketManager()
+    handlers = [ws_mgr.create_handler(f'channel_{i}') for i in range(3)]
+    payload = {'store_uid': 'store', 'value': [{'id': 1, 'name': 'row 1'}]}
+
+    with patch('dara.core.internal.websocket.encode_message', wraps=encode_message) as encode:
+        await ws_mgr.broadcast(payload)
+
+    assert encode.call_count == 1
+    messages = [handler.send_queue.get_nowait() for handler in handlers]
+    assert all(message is messages[0] for message in messages)
+    assert json.loads(messages[0]) == {'type': 'message', 'message': payload}
+
+
+@pytest.mark.benchmark
+async def test_websocket_broadcast_benchmark():
+    """
+    Benchmark broadcasting a store update to many connected clients, encoding once vs encoding per client
+    """
+    n_clients = 2000
+    ws_mgr = WebsocketManager()
+    handlers = [ws_mgr.create_handler(f'channel_{i}') for i in range(n_clients)]
+    payload = {
+        'store_uid': 'store',
+        'value': [{'id': i, 'name': f'row {i}', 'value': i / 3} for i in range(100)],
+    }
+
+    start = time.perf_counter()
+    for _ in handlers:
+        json.dumps(jsonable_encoder(ws_mgr._construct_message(payload, False)))
+    per_client_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await ws_mgr.broadcast(payload)
+    broadcast_time = time.perf_counter() - start
+
+    print(
+        f'{n_clients} clients: encode once {broadcast_time * 1000:.1f}ms, '
+        f'encode per client {per_client_time * 1000:.1f}ms'
+    )
+
+    messages = [handler.send_queue.get_nowait() for handler in handlers]
+    assert json.loads(messages[0]) == {'type': 'message', 'message': payload}
+
+
+async def test_websocket_msgpack_encoding():
+    """
+    Test that clients can negotiate MessagePack encoded messages, and are otherwise sent JSON
+    """
+    msgpack = pytest.importorskip('msgpack')
+
+    assert WebsocketManager().negotiate_encoding('msgpack') == WsEncoding.JSON
+
+    ws_mgr = WebsocketManager(msgpack=True)
+    assert ws_mgr.negotiate_encoding(None) == WsEncoding.JSON
+    assert ws_mgr.negotiate_encoding('unknown') == WsEncoding.JSON
+
+    json_handler = ws_mgr.create_handler('json', ws_mgr.negotiate_encoding(None))
+    msgpack_handler = ws_mgr.create_handler('msgpack', ws_mgr.negotiate_encoding('msgpack'))
+
+    await ws_mgr.broadcast({'store_uid': 'store', 'value': {'a': [1, 2.5, 'c', None]}})
+
+    expected = {'type': 'message', 'message': {'store_uid': 'store', 'value': {'a': [1, 2.5, 'c', None]}}}
+    assert json.loads(json_handler.send_queue.get_nowait()) == expected
+    assert msgpack.unpackb(msgpack_handler.send_queue.get_nowait()) == expected
+
+
+async def test_websocket_msgpack_connection(monkeypatch):
+    """
+    Test that a client requesting MessagePack is told so in the init message and then sent binary messages
+    """
+    msgpack = pytest.importorskip('msgpack')
+    monkeypatch.setenv('DARA_WS_MSGPACK', 'TRUE')
+
+    builder = ConfigurationBuilder()
+    basic_auth = BasicAuthConfig(username='test', password='test')
+    config = create_app(builder)
+    config.auth_config = basic_auth
+    app = _start_application(config)
+
+    token = basic_auth.get_token(SessionRequestBody(username='test', password='test')).get('token')
+
+    async with AsyncTestClient(app) as client:
+        async with client.websocket_connect(f'/api/core/ws?token={token}&encoding=msgpack') as ws:
+            init = await ws.receive_json()
+            assert init['message']['encoding'] == 'msgpack'
+
+            ws_mgr: WebsocketManager = utils_registry.get('WebsocketManager')
+            await ws_mgr.broadcast({'message': 'broadcast message'})
+
+            data = await ws.receive_bytes()
+            assert msgpack.unpackb(data) == {'type': 'message', 'message': {'message': 'broadcast message'}}
+
+
+@pytest.mark.benchmark
+def test_websocket_encoding_benchmark():
+    """
+    Benchmark payload size and encode time of a large store update with each encoding, with and without the
+    permessage-deflate compression applied by the server
+    """
+    pytest.importorskip('msgpack')
+
+    payload = {
+        'store_uid': 'store',
+        'value': [{'id': i, 'name': f'row {i}', 'value': i / 3, 'flag': i % 2 == 0} for i in range(10_000)],
+    }
+    message = DaraServerMessage(message=payload)
+    sizes = {}
+
+    for encoding in WsEncoding:
+        start = time.perf_counter()
+        encoded = encode_message(message).encode(encoding)
+        encode_time = time.perf_counter() - start
+
+        # permessage-deflate compresses each message with raw deflate
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        compressed = (
+            compressor.compress(encoded if isinstance(encoded, bytes) else encoded.encode()) + compressor.flush()
+        )
+        sizes[encoding] = (len(encoded), len(compressed))
+
+        print(
+            f'{encoding.value}: {len(encoded) / 1024:.0f}KB, {len(compressed) / 1024:.0f}KB deflated, '
+            f'encoded in {encode_time * 1000:.1f}ms'
+        )
+
+    for raw_size, compressed_size in sizes.values():
+        assert compressed_size < raw_size
+
+    assert sizes[WsEncoding.MSGPACK][0] < sizes[WsEncoding.JSON][0]
+
+
+async def test_send_queue_coalesces_superseded_messages():
+    """
+    Test that only the latest progress update of a task and the latest value of a store wait in a send queue
+    """
+    ws_mgr = WebsocketManager()
+    handler = ws_mgr.create_handler('coalesce')
+
+    for i in range(1, 4):
+        await ws_mgr.send_message('coalesce', {'task_id': 'task', 'status': 'PROGRESS', 'progress': i * 10})
+        await ws_mgr.send_message('coalesce', {'store_uid': 'store', 'value': i})
+        await ws_mgr.send_message('coalesce', {'action': i})
+
+    await ws_mgr.send_message('coalesce', {'task_id': 'task', 'status': 'COMPLETE'})
+
+    messages = [json.loads(handler.send_queue.get_nowait())['message'] for _ in range(len(handler.send_queue))]
+    assert messages == [
+        {'action': 1},
+        {'action': 2},
+        {'task_id': 'task', 'status': 'PROGRESS', 'progress': 30},
+        {'store_uid': 'store', 'value': 3},
+        {'action': 3},
+        {'task_id': 'task', 'status': 'COMPLETE'},
+    ]
+    assert REGISTRY.get_sample_value('websocket_dropped_messages_total', {'channel': 'coalesce'}) == 4
+    assert REGISTRY.get_sample_value('websocket_send_queue_depth', {'channel': 'coalesce'}) == 0
+
+    ws_mgr.remove_handler('coalesce')
+    assert REGISTRY.get_sample_value('websocket_dropped_messages_total', {'channel': 'coalesce'}) is None
+
+
+async def test_send_queue_wakes_reader():
+    """
+    Test that a reader waiting on an empty send queue receives the next message
+    """
+    queue = SendQueue('reader')
+    result = None
+
+    async def read():
+        nonlocal result
+        result = await queue.get()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(read)
+        await anyio.sleep(0.01)
+        queue.put('message')
+
+    assert result == 'message'
+
+
+async def test_send_queue_overflow():
+    """
+    Test that a send queue which fills up is closed so the client can be disconnected
+    """
+    queue = SendQueue('overflow', max_size=2)
+    queue.put('first')
+    queue.put('second')
+    assert queue.get_nowait() == 'first'
+
+    queue.put('third')
+    assert len(queue) == 2
+
+    queue.put('fourth')
+    with pytest.raises(SlowClientError):
+        await queue.get()
+
+    # Messages are dropped once the queue overflowed
+    assert len(queue) == 0
+    queue.put('fifth')
+    assert len(queue) == 0
+    with pytest.raises(SlowClientError):
+        queue.get_nowait()
+
+    with pytest.raises(ValueError):
+        SendQueue('invalid', max_size=0)
+
+
 async def test_websocket_send_to_user():
     builder = ConfigurationBuilder()
 